@@ -1,36 +1,78 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from app.cache import UserCache
+from app.metrics import Metrics
+from app.group_commit import GroupCommit
+from app.admission import AdmissionControl
+from app.routing import RoutingSession
 import os 
 
 # Iniciando as extensões 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+user_cache = UserCache()
+metrics = Metrics()
+group_commit = GroupCommit()
+admission = AdmissionControl()
 
-def create_app(): 
+#O Flask-Migrate importa o Alembic (~100 ms) e só é usado pelo flask db:
+#app.migrate é criado no primeiro acesso
+def __getattr__(name):
+    if name == 'migrate':
+        global migrate
+        from flask_migrate import Migrate
+        migrate = Migrate(db=db)
+        return migrate
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+#Garante que a pasta do banco SQLite existe
+def ensure_database_dir(app):
+    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if db_uri.startswith('sqlite:///') and ':memory:' not in db_uri:
+        os.makedirs(os.path.dirname(os.path.abspath(db_uri[len('sqlite:///'):])), exist_ok=True)
+
+def create_app(config_name=None, config_overrides=None): 
     # Criando a aplicação
     app = Flask(__name__)
 
-    # Configurando o banco de dados
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    instance_dir = os.path.join(basedir, "..", "instance")
-    os.makedirs(instance_dir, exist_ok=True)   # 👈 garante que a pasta existe!
+    # Carregando o perfil de configuração (development, production, testing)
+    from config import config
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'default')
+    app.config.from_object(config[config_name])
+    if config_overrides:
+        app.config.update(config_overrides)
 
-    db_path = os.path.join(instance_dir, "users.db")
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
+    # Com SCHEMA_AUTO_CREATE desligado (padrão em produção) o esquema vem das
+    # migrações: nada de makedirs, create_all ou inspeção do banco na subida
+    schema_auto_create = app.config['SCHEMA_AUTO_CREATE']
+    if schema_auto_create:
+        ensure_database_dir(app)
     
-    # Iniciando as extensões
+    # Iniciando as extensões (o Flask-Migrate só é carregado pelo flask db)
     db.init_app(app)
-    migrate.init_app(app, db)
+    user_cache.init_app(app)
+    metrics.init_app(app)
+    group_commit.init_app(app)
+    admission.init_app(app)
+
+    # Aplicando os PRAGMAs do perfil em cada conexão e a instrumentação de SQL
+    from app.engine import configure_engines
+    from app import instrumentation
+    with app.app_context():
+        configure_engines(app, db.engines)
+        instrumentation.init_app(app, db.engines)
     
     # Registrando blueprints
     from app.controllers.user_controller import user_bp
     app.register_blueprint(user_bp, url_prefix='/api')
+
+    # Registrando os comandos de CLI (flask users ..., flask db ...)
+    from app.cli import db_cli, users_cli
+    app.cli.add_command(users_cli)
+    app.cli.add_command(db_cli)
     
-    # Criando as tabelas do banco de dados
-    with app.app_context():
-        db.create_all()
+    # Criando as tabelas do banco de dados (só no primário; a réplica é somente leitura)
+    if schema_auto_create:
+        with app.app_context():
+            db.create_all(bind_key=None)
     
     return app
@@ -0,0 +1,217 @@
+"""
+Controle de admissão das rotas de /api/users
+
+Cada classe de rota tem um limite de requisições simultâneas: leitura (rotas
+marcadas com @read_replica) e escrita (as demais). Acima do limite a requisição
+espera em uma fila limitada, por no máximo ADMISSION_QUEUE_TIMEOUT_MS. Com a
+fila cheia ou o prazo vencido ela recebe 503 com Retry-After na hora, em vez de
+ocupar uma thread com um trabalho que o cliente já desistiu de esperar.
+
+No modo ASGI (app/asgi.py) a admissão é feita no event loop, com os mesmos
+limites e contadores; as requisições repassadas ao WSGI já chegam admitidas.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, jsonify, request
+
+from app.metrics import Counter
+
+READ = 'read'
+WRITE = 'write'
+
+# Resultados da admissão
+ADMITTED = 'admitted'
+QUEUED = 'queued'  # admitida depois de esperar na fila
+QUEUE_FULL = 'queue_full'
+TIMEOUT = 'timeout'
+SHED = (QUEUE_FULL, TIMEOUT)
+
+# Marca no environ das requisições já admitidas pelo modo ASGI
+ADMITTED_ENVIRON_KEY = 'app.admission.admitted'
+
+SHED_MESSAGE = 'Servidor sobrecarregado, tente novamente em instantes'
+
+
+class ConcurrencyLimiter:
+    """Até limit requisições simultâneas; as excedentes esperam em ordem de chegada"""
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            # Com gente na fila, quem chega não passa na frente
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return ADMITTED
+            if self.waiting >= self.queue_size:
+                return QUEUE_FULL
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # O aviso que esta espera recebeu (se recebeu) passa para a próxima
+                        self._condition.notify()
+                        return TIMEOUT
+                    self._condition.wait(remaining)
+                self.active += 1
+                return QUEUED
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AsyncConcurrencyLimiter:
+    """Versão para o event loop: a vaga liberada passa direto para o primeiro da fila"""
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return ADMITTED
+        if len(self._waiters) >= self.queue_size:
+            return QUEUE_FULL
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            # A vaga pode ter chegado junto com o prazo: nesse caso ela é nossa
+            if waiter.done() and not waiter.cancelled():
+                return QUEUED
+            return TIMEOUT
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return QUEUED
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class _AdmissionState:
+    def __init__(self, app, blueprints):
+        config = app.config
+        self.blueprints = set(blueprints)
+        self.retry_after = str(config['ADMISSION_RETRY_AFTER'])
+        self.settings = {
+            READ: (config['ADMISSION_READ_LIMIT'], config['ADMISSION_READ_QUEUE_SIZE']),
+            WRITE: (config['ADMISSION_WRITE_LIMIT'], config['ADMISSION_WRITE_QUEUE_SIZE']),
+        }
+        self.timeout = config['ADMISSION_QUEUE_TIMEOUT_MS'] / 1000
+        self.limiters = self.create_limiters(ConcurrencyLimiter)
+        self.queued = Counter('admission_requests_queued_total',
+                              'Requisições que esperaram na fila de admissão.', ('route_class',))
+        self.shed = Counter('admission_requests_shed_total',
+                            'Requisições rejeitadas com 503 pelo controle de admissão.', ('route_class', 'reason'))
+
+    def create_limiters(self, limiter_class):
+        return {route_class: limiter_class(limit, queue_size, self.timeout)
+                for route_class, (limit, queue_size) in self.settings.items()}
+
+    def covers(self, endpoint):
+        return endpoint is not None and endpoint.rpartition('.')[0] in self.blueprints
+
+    @staticmethod
+    def route_class(view):
+        return READ if getattr(view, 'read_only', False) else WRITE
+
+    def record(self, route_class, outcome):
+        if outcome in (QUEUED, TIMEOUT):
+            self.queued.inc((route_class,))
+        if outcome in SHED:
+            self.shed.inc((route_class, outcome))
+
+    def shed_payload(self):
+        return {'success': False, 'message': SHED_MESSAGE}
+
+
+def _make_hooks(state):
+    def before_request():
+        if request.environ.get(ADMITTED_ENVIRON_KEY):
+            return None
+
+        route_class = state.route_class(current_app.view_functions.get(request.endpoint))
+        limiter = state.limiters[route_class]
+        outcome = limiter.acquire()
+        state.record(route_class, outcome)
+        if outcome in SHED:
+            response = jsonify(state.shed_payload())
+            response.status_code = 503
+            response.headers['Retry-After'] = state.retry_after
+            return response
+        g.admission_limiter = limiter
+
+    def teardown_request(exc):
+        limiter = g.pop('admission_limiter', None)
+        if limiter is not None:
+            limiter.release()
+
+    return before_request, teardown_request
+
+
+class AdmissionControl:
+    """Extensão Flask que limita as requisições simultâneas dos blueprints medidos"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, blueprints=('users',)):
+        app.config.setdefault('ADMISSION_CONTROL', True)
+        app.config.setdefault('ADMISSION_READ_LIMIT', 64)
+        app.config.setdefault('ADMISSION_WRITE_LIMIT', 16)
+        app.config.setdefault('ADMISSION_READ_QUEUE_SIZE', 128)
+        app.config.setdefault('ADMISSION_WRITE_QUEUE_SIZE', 64)
+        app.config.setdefault('ADMISSION_QUEUE_TIMEOUT_MS', 1000)
+        app.config.setdefault('ADMISSION_RETRY_AFTER', 1)
+
+        state = None
+        if app.config['ADMISSION_CONTROL']:
+            state = _AdmissionState(app, blueprints)
+            # Registrado depois das métricas: as respostas 503 também são medidas
+            before_request, teardown_request = _make_hooks(state)
+            for blueprint in blueprints:
+                app.before_request_funcs.setdefault(blueprint, []).append(before_request)
+                app.teardown_request_funcs.setdefault(blueprint, []).append(teardown_request)
+
+            metrics = app.extensions.get('metrics')
+            if metrics is not None:
+                metrics.registry.register(state.queued)
+                metrics.registry.register(state.shed)
+        app.extensions['admission'] = state
+
+    @property
+    def state(self):
+        return current_app.extensions.get('admission')
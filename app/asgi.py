@@ -0,0 +1,362 @@
+"""
+Modo ASGI (asyncio) da API de usuários
+
+run.py serve a aplicação WSGI, em que cada requisição ocupa uma thread durante
+toda a espera pelo SQLite. Aqui as rotas de /api/users são atendidas sobre o
+engine assíncrono do SQLAlchemy (aiosqlite): uma conexão aberta custa uma
+corrotina, não uma thread.
+
+A aplicação Flask continua sendo a fonte da configuração, das extensões (cache,
+group commit) e do mapa de rotas. As operações são as mesmas dos controllers
+(app.services.users), executadas com AsyncSession.run_sync: o código síncrono
+roda em um greenlet e cada consulta espera o driver assíncrono sem bloquear o
+event loop. Só muda o UserStore: as rotas @read_replica leem da réplica (bind
+'replica') e as escritas passam pelo group commit quando ele está ligado. As
+rotas sem operação compartilhada (exportação, lookup, criação e desativação em
+lote e /metrics) são repassadas à aplicação WSGI em uma thread do executor.
+
+Uso (requer aiosqlite e um servidor ASGI, ex.: uvicorn; banco SQLite em arquivo):
+    uvicorn --factory app.asgi:create_asgi_app --port 8000
+"""
+import asyncio
+import io
+import json
+import sys
+import time
+from functools import partial
+from urllib.parse import parse_qsl
+
+from flask import g
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.util import await_only
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_date, parse_etags
+
+from app import create_app, group_commit
+from app.admission import ADMITTED_ENVIRON_KEY, SHED, AsyncConcurrencyLimiter
+from app.conditional import is_fresh
+from app.engine import install_sqlite_pragmas, sqlite_pragmas
+from app.group_commit import GroupCommitTimeout, run_in_transaction
+from app.instrumentation import QueryStats, install_listeners, log_request, server_timing
+from app.routing import REPLICA_BIND
+from app.services import users
+from app.services.users import UserStore, dumps, run_operation
+
+# Driver assíncrono de cada banco suportado
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg'
+}
+
+# Chunks da resposta WSGI em trânsito entre a thread e o event loop
+WSGI_QUEUE_SIZE = 8
+
+
+#Converte a URL do SQLALCHEMY_DATABASE_URI para o driver assíncrono
+def async_database_url(uri):
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'Banco {backend} não suportado no modo ASGI')
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        # Cada engine teria o seu próprio banco em memória
+        raise ValueError('O modo ASGI requer um banco SQLite em arquivo')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncRequest:
+    """Dados da requisição ASGI usados pelos handlers"""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.body = body
+
+    #Equivalente ao request.get_json(silent=True)
+    def get_json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+class AsyncResponse:
+    def __init__(self, payload=None, status=200, headers=None):
+        self.status = status
+        self.body = dumps(payload).encode('utf-8') if payload is not None else b''
+        self.headers = [(b'content-type', b'application/json')] if payload is not None else []
+        for name, value in (headers or {}).items():
+            self.add_header(name, value)
+
+    def add_header(self, name, value):
+        self.headers.append((name.encode('latin-1'), str(value).encode('latin-1')))
+
+    async def send(self, send):
+        await send({'type': 'http.response.start', 'status': self.status,
+                    'headers': self.headers + [(b'content-length', str(len(self.body)).encode())]})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+def validators(etag, last_modified=None):
+    headers = {'etag': f'"{etag}"'}
+    if last_modified is not None:
+        headers['last-modified'] = http_date(last_modified)
+    return headers
+
+
+#Converte o Result da operação compartilhada; com etag aplica a mesma regra de 304 do WSGI
+def to_response(request, result):
+    if result.etag is None:
+        return AsyncResponse(result.payload, result.status)
+
+    headers = validators(result.etag, result.last_modified)
+    if is_fresh(parse_etags(request.headers.get('if-none-match')),
+                parse_date(request.headers.get('if-modified-since')),
+                result.etag, result.last_modified):
+        return AsyncResponse(status=304, headers=headers)
+    return AsyncResponse(result.payload, result.status, headers)
+
+
+class AsyncUsersApp:
+    """Aplicação ASGI: handlers assíncronos de /api/users e repasse do restante ao WSGI"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.metrics = flask_app.extensions.get('metrics')
+        self.admission = flask_app.extensions.get('admission')
+        # Limites do controle de admissão aplicados no event loop (mesma configuração)
+        self.limiters = self.admission.create_limiters(AsyncConcurrencyLimiter) if self.admission else None
+        # Mesmo mapa de rotas da aplicação Flask (mesmas regras e conversores)
+        self.routes = flask_app.url_map.bind('localhost')
+        self.instrumented = self.config['SQL_INSTRUMENTATION']
+
+        self.engine = self.create_engine(self.config['SQLALCHEMY_DATABASE_URI'])
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        # Como na RoutingSession: as rotas somente leitura usam a réplica, se configurada
+        self.replica_engine = None
+        self.read_sessions = self.sessions
+        replica = self.config.get('SQLALCHEMY_BINDS', {}).get(REPLICA_BIND)
+        if replica is not None:
+            self.replica_engine = self.create_engine(replica, REPLICA_BIND)
+            self.read_sessions = async_sessionmaker(self.replica_engine, expire_on_commit=False)
+
+        # Argumentos da operação compartilhada de cada endpoint
+        self.handlers = {
+            'users.get_users': lambda request: (users.get_all_users, request.args),
+            'users.get_changes': lambda request: (users.get_changes, request.args),
+            'users.search_users': lambda request: (users.search_users, request.args),
+            'users.get_user': lambda request, phone: (users.get_user_by_phone, phone),
+            'users.create_user': lambda request: (users.create_user, request.get_json()),
+            'users.update_user': lambda request, phone: (users.update_user, phone, request.get_json(), request.args),
+            'users.delete_user': lambda request, phone: (users.delete_user, phone),
+            'users.restore_user': lambda request, phone: (users.restore_user, phone),
+        }
+
+    #Engine assíncrono do bind, com os mesmos PRAGMAs e instrumentação do WSGI
+    def create_engine(self, bind, bind_key=None):
+        options = dict(self.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        if isinstance(bind, dict):
+            options.update(bind)
+            bind = options.pop('url')
+
+        engine = create_async_engine(async_database_url(bind), **options)
+        pragmas = sqlite_pragmas(self.config, bind_key)
+        if engine.dialect.name == 'sqlite' and pragmas:
+            install_sqlite_pragmas(engine.sync_engine, pragmas)
+        if self.instrumented:
+            install_listeners(engine.sync_engine)
+        return engine
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Tipo de conexão não suportado: {scope["type"]}')
+
+        body = await read_body(receive)
+        try:
+            rule, args = self.routes.match(scope['path'], scope['method'], return_rule=True)
+        except HTTPException:
+            rule, args = None, {}
+
+        admitted = False
+        if self.admission is not None and rule is not None and self.admission.covers(rule.endpoint):
+            route_class = self.admission.route_class(self.flask_app.view_functions[rule.endpoint])
+            limiter = self.limiters[route_class]
+            start = time.perf_counter()
+            outcome = await limiter.acquire()
+            self.admission.record(route_class, outcome)
+            if outcome in SHED:
+                response = AsyncResponse(self.admission.shed_payload(), 503,
+                                         {'retry-after': self.admission.retry_after})
+                self.record_metrics(rule, scope['method'], response.status, start, started=True)
+                return await response.send(send)
+            admitted = True
+
+        try:
+            await self.dispatch(rule, args, scope, body, send, admitted)
+        finally:
+            if admitted:
+                limiter.release()
+
+    async def dispatch(self, rule, args, scope, body, send, admitted):
+        handler = self.handlers.get(rule.endpoint) if rule is not None else None
+        if handler is None:
+            return await self.call_wsgi(scope, body, send, admitted)
+
+        start = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.started.inc()
+
+        request = AsyncRequest(scope, body)
+        stats = QueryStats() if self.instrumented else None
+        read_only = getattr(self.flask_app.view_functions[rule.endpoint], 'read_only', False)
+        sessions = self.read_sessions if read_only else self.sessions
+        async with sessions() as session:
+            result = await session.run_sync(self.call, rule.endpoint, stats, *handler(request, **args))
+        response = to_response(request, result)
+
+        if stats is not None:
+            total_ms = (time.perf_counter() - start) * 1000
+            response.add_header('server-timing', server_timing(stats, total_ms))
+            log_request(request.method, request.path, rule.endpoint, response.status, stats, total_ms)
+
+        self.record_metrics(rule, request.method, response.status, start)
+        await response.send(send)
+
+    #Executa a operação no greenlet do run_sync, dentro do app context (cache, group commit)
+    def call(self, session, endpoint, stats, operation, *args):
+        with self.flask_app.app_context():
+            g.sql_stats = stats
+            store = UserStore(session, partial(self.write, session), self.engine.dialect.name)
+            return run_operation(endpoint, store, operation, *args)
+
+    #Escrita pelo group commit (esperando o Future sem bloquear o event loop)
+    #ou, com ele desligado, na transação da própria sessão
+    def write(self, session, op):
+        future = group_commit.submit(op)
+        if future is None:
+            return run_in_transaction(session, op)
+        try:
+            return await_only(asyncio.wait_for(asyncio.wrap_future(future), group_commit.timeout))
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise GroupCommitTimeout()
+
+    def record_metrics(self, rule, method, status, start, started=False):
+        if self.metrics is None:
+            return
+        if started:
+            self.metrics.started.inc()
+        self.metrics.requests.inc((rule.rule, method, str(status)))
+        self.metrics.latency.observe(time.perf_counter() - start, (rule.rule, method))
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispose(self):
+        await self.engine.dispose()
+        if self.replica_engine is not None:
+            await self.replica_engine.dispose()
+
+    #Executa a aplicação WSGI em uma thread; o corpo volta em chunks por uma fila
+    #limitada, então a exportação continua em streaming
+    async def call_wsgi(self, scope, body, send, admitted=False):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(WSGI_QUEUE_SIZE)
+        environ = wsgi_environ(scope, body)
+        if admitted:
+            environ[ADMITTED_ENVIRON_KEY] = True
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+        def run():
+            try:
+                result = self.flask_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if chunk:
+                            put(chunk)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            finally:
+                put(None)
+
+        worker = loop.run_in_executor(None, run)
+        chunk = await chunks.get()
+        if 'status' not in started:
+            # A aplicação falhou antes de iniciar a resposta: propaga o erro da thread
+            await worker
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await chunks.get()
+        await send({'type': 'http.response.body', 'body': b''})
+        await worker
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+#Monta o environ WSGI (PEP 3333) a partir do scope ASGI
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+#Factory do servidor ASGI (uvicorn --factory app.asgi:create_asgi_app)
+def create_asgi_app(config_name=None, config_overrides=None):
+    return AsyncUsersApp(create_app(config_name, config_overrides))
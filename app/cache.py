@@ -0,0 +1,277 @@
+"""
+Cache read-through dos payloads de usuário consultados por telefone
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+
+class CacheBackend:
+    """Interface dos backends de cache (em processo ou compartilhados)"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    #Leitura/escrita de várias chaves; backends remotos podem usar MGET/pipeline
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def stats(self):
+        return {}
+
+
+class LRUCache(CacheBackend):
+    """Cache em memória com política LRU, expiração por TTL e tamanho máximo"""
+
+    def __init__(self, max_size=10000, ttl=60, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError('max_size deve ser maior que zero')
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    #Mesma semântica do get, com uma única aquisição do lock para o lote
+    def get_many(self, keys):
+        found = {}
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._data[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    continue
+
+                self._data.move_to_end(key)
+                self.hits += 1
+                found[key] = value
+        return found
+
+    def set_many(self, mapping):
+        expires_at = self._clock() + self.ttl if self.ttl else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data),
+                'max_size': self.max_size
+            }
+
+
+class FillGenerations:
+    """Gerações por chave (em faixas fixas) que impedem a volta de um payload antigo
+
+    Um leitor que não encontrou a chave lê a linha e só depois grava o payload; se
+    nesse meio-tempo uma escrita confirmou e invalidou a chave, o que ele leu já
+    é antigo. A gravação só acontece se a geração da chave não mudou desde antes
+    da leitura. Verificação + gravação e incremento + remoção acontecem sob o lock
+    da faixa, então uma invalidação nunca fica entre as duas. Cobre as escritas
+    do próprio processo; entre processos o limite continua sendo o TTL.
+    """
+
+    def __init__(self, stripes=1024):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._generations = [0] * stripes
+
+    def _stripe(self, key):
+        return hash(key) % len(self._locks)
+
+    #Gerações atuais das chaves, lidas antes de consultar o banco
+    def snapshot(self, keys):
+        return {key: self._generations[self._stripe(key)] for key in keys}
+
+    #Grava no backend só as chaves que não foram invalidadas desde o snapshot
+    def fill(self, backend, mapping, snapshot):
+        stripes = sorted({self._stripe(key) for key in mapping})
+        with ExitStack() as stack:
+            # Sempre na mesma ordem: dois preenchimentos simultâneos não se travam
+            for stripe in stripes:
+                stack.enter_context(self._locks[stripe])
+            fresh = {key: value for key, value in mapping.items()
+                     if self._generations[self._stripe(key)] == snapshot.get(key)}
+            if len(fresh) == 1:
+                backend.set(*next(iter(fresh.items())))
+            elif fresh:
+                backend.set_many(fresh)
+
+    def invalidate(self, backend, keys):
+        for key in keys:
+            stripe = self._stripe(key)
+            with self._locks[stripe]:
+                self._generations[stripe] += 1
+                backend.delete(key)
+
+
+class UserCache:
+    """Extensão Flask que guarda o to_dict() dos usuários indexado pelo telefone"""
+
+    key_prefix = 'user:phone:'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_ENABLED', True)
+        app.config.setdefault('USER_CACHE_MAX_SIZE', 10000)
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.config.setdefault('USER_CACHE_BACKEND', None)
+
+        backend = None
+        if app.config['USER_CACHE_ENABLED']:
+            backend = self._create_backend(app)
+
+        app.extensions['user_cache'] = backend
+        app.extensions['user_cache_generations'] = FillGenerations()
+
+    #USER_CACHE_BACKEND aceita uma instância, uma factory (recebe o app) ou o caminho de importação
+    @staticmethod
+    def _create_backend(app):
+        backend = app.config['USER_CACHE_BACKEND']
+        if backend is None:
+            return LRUCache(
+                max_size=app.config['USER_CACHE_MAX_SIZE'],
+                ttl=app.config['USER_CACHE_TTL']
+            )
+
+        if isinstance(backend, str):
+            backend = import_string(backend)
+        if not isinstance(backend, CacheBackend):
+            backend = backend(app)
+        return backend
+
+    @property
+    def backend(self):
+        return current_app.extensions.get('user_cache')
+
+    @property
+    def generations(self):
+        return current_app.extensions['user_cache_generations']
+
+    #Retorna o payload do cache ou chama loader() e guarda o resultado (se não for None)
+    def get_or_load(self, phone, loader):
+        backend = self.backend
+        if backend is None:
+            return loader()
+
+        key = self.key_prefix + phone
+        payload = backend.get(key)
+        if payload is None:
+            generations = self.generations
+            snapshot = generations.snapshot([key])
+            payload = loader()
+            if payload is not None:
+                generations.fill(backend, {key: payload}, snapshot)
+        return payload
+
+    #Versão em lote do get_or_load: loader(telefones_ausentes) devolve {telefone: payload}
+    def get_many_or_load(self, phones, loader):
+        backend = self.backend
+        if backend is None:
+            return loader(phones)
+
+        prefix = self.key_prefix
+        cached = backend.get_many([prefix + phone for phone in phones])
+        found = {key[len(prefix):]: payload for key, payload in cached.items()}
+
+        missing = [phone for phone in phones if phone not in found]
+        if missing:
+            generations = self.generations
+            snapshot = generations.snapshot([prefix + phone for phone in missing])
+            loaded = loader(missing)
+            if loaded:
+                generations.fill(backend, {prefix + phone: payload for phone, payload in loaded.items()}, snapshot)
+                found.update(loaded)
+        return found
+
+    def invalidate(self, *phones):
+        backend = self.backend
+        if backend is None:
+            return
+
+        self.generations.invalidate(backend, [self.key_prefix + phone for phone in phones if phone])
+
+    def stats(self):
+        backend = self.backend
+        return backend.stats() if backend is not None else {}
@@ -0,0 +1,46 @@
+"""
+Sequência de alterações de users (cursor do feed /api/users/changes)
+
+updated_at é gerado no Python antes de a escrita esperar pelo lock (até o
+busy_timeout, ou a fila do group commit) e pode ser confirmado depois de um
+cursor que o consumidor já passou. change_seq é atribuído pelos triggers dentro
+da transação de escrita, a partir de um contador de uma linha: como o SQLite
+tem um único escritor, a ordem de change_seq é a ordem de commit e nenhuma
+alteração aparece atrás de um cursor já entregue.
+"""
+from sqlalchemy import DDL, event
+
+COUNTER_TABLE = 'users_change_counter'
+
+# Colunas cuja alteração publica a linha de novo no feed (change_seq fica de
+# fora: o UPDATE do próprio trigger não dispara outra alteração)
+TRACKED_COLUMNS = 'name, email, phone, enabled, created_at, updated_at'
+
+NEXT_SEQ = f"""
+        UPDATE {COUNTER_TABLE} SET seq = seq + 1 WHERE id = 1;
+        UPDATE users SET change_seq = (SELECT seq FROM {COUNTER_TABLE} WHERE id = 1) WHERE id = new.id;"""
+
+CREATE_STATEMENTS = (
+    f'CREATE TABLE IF NOT EXISTS {COUNTER_TABLE} (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)',
+    f'INSERT OR IGNORE INTO {COUNTER_TABLE} (id, seq) VALUES (1, 0)',
+    f"""CREATE TRIGGER IF NOT EXISTS users_change_seq_after_insert AFTER INSERT ON users
+    BEGIN{NEXT_SEQ}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_change_seq_after_update AFTER UPDATE OF {TRACKED_COLUMNS} ON users
+    BEGIN{NEXT_SEQ}
+    END""",
+)
+
+DROP_STATEMENTS = (
+    'DROP TRIGGER IF EXISTS users_change_seq_after_update',
+    'DROP TRIGGER IF EXISTS users_change_seq_after_insert',
+    f'DROP TABLE IF EXISTS {COUNTER_TABLE}',
+)
+
+
+#Cria o contador e os triggers junto com a tabela users no db.create_all() (somente SQLite)
+def install_change_sequence(users_table):
+    for statement in CREATE_STATEMENTS:
+        event.listen(users_table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in DROP_STATEMENTS:
+        event.listen(users_table, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
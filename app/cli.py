@@ -0,0 +1,218 @@
+"""
+Comandos de linha de comando (flask users ...)
+"""
+import csv
+import itertools
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, ScriptInfo
+
+from app.services.bulk import create_users_batch, parse_json_line
+
+users_cli = AppGroup('users', help='Comandos de manutenção de usuários.')
+
+
+class MigrateGroup(click.Group):
+    """flask db ...: importa o Flask-Migrate (e o Alembic) só quando o comando é usado"""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from app import db, ensure_database_dir, migrate
+
+        app = parent.ensure_object(ScriptInfo).load_app()
+        if 'migrate' not in app.extensions:
+            # As migrações criam o banco: a pasta do SQLite precisa existir
+            ensure_database_dir(app)
+            migrate.init_app(app, db)
+
+        from flask_migrate.cli import db as migrate_cli
+        return migrate_cli.make_context(info_name, args, parent=parent, **extra)
+
+
+db_cli = MigrateGroup('db', help='Migrações do banco (Flask-Migrate/Alembic).')
+
+
+#Lê o arquivo em streaming, uma linha por vez
+def read_rows(path, file_format):
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            for row in csv.DictReader(source):
+                enabled = (row.pop('enabled', None) or '').strip().lower()
+                # Célula vazia fica com o padrão do modelo (habilitado)
+                if enabled:
+                    row['enabled'] = enabled not in ('0', 'false', 'no')
+                yield row
+        else:
+            for line in source:
+                if line.strip():
+                    yield parse_json_line(line)
+
+
+def load_checkpoint(path, source):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get('source') != source:
+        raise click.ClickException(f'Checkpoint {path} pertence a outro arquivo ({checkpoint.get("source")})')
+
+    return checkpoint
+
+
+#Grava o checkpoint de forma atômica (arquivo temporário + rename)
+def save_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+              help='Formato do arquivo (padrão: pela extensão).')
+@click.option('--batch-size', type=int, default=None,
+              help='Linhas por transação (padrão: BULK_BATCH_SIZE).')
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False),
+              help='Arquivo de checkpoint (padrão: <arquivo>.checkpoint).')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+              help='Grava as linhas rejeitadas neste arquivo NDJSON.')
+def import_users(path, file_format, batch_size, checkpoint_path, errors_path):
+    """Importa usuários de um arquivo CSV ou NDJSON em lotes."""
+    source = os.path.abspath(path)
+    if file_format is None:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    if batch_size is None:
+        batch_size = current_app.config['BULK_BATCH_SIZE']
+    if batch_size < 1:
+        raise click.BadParameter('deve ser maior que zero', param_hint='--batch-size')
+    checkpoint_path = checkpoint_path or f'{source}.checkpoint'
+
+    # Retoma do último lote confirmado, se houver checkpoint
+    checkpoint = load_checkpoint(checkpoint_path, source) or {
+        'source': source, 'rows': 0, 'created': 0, 'failed': 0
+    }
+    if checkpoint['rows']:
+        click.echo(f'Retomando a partir da linha {checkpoint["rows"]}')
+
+    rows = itertools.islice(read_rows(path, file_format), checkpoint['rows'], None)
+    errors = open(errors_path, 'a', encoding='utf-8') if errors_path else None
+    start = time.perf_counter()
+    processed = 0
+
+    try:
+        while True:
+            batch = [
+                (checkpoint['rows'] + offset, row)
+                for offset, row in enumerate(itertools.islice(rows, batch_size))
+            ]
+            if not batch:
+                break
+
+            for result in create_users_batch(batch):
+                if result['success']:
+                    checkpoint['created'] += 1
+                else:
+                    checkpoint['failed'] += 1
+                    if errors:
+                        errors.write(json.dumps({'row': result['index'], 'message': result['message']},
+                                                ensure_ascii=False) + '\n')
+
+            # O lote já foi confirmado no banco; só então avançamos o checkpoint
+            if errors:
+                errors.flush()
+            checkpoint['rows'] += len(batch)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - start
+            click.echo(f'{checkpoint["rows"]} linhas processadas '
+                       f'({checkpoint["created"]} criadas, {checkpoint["failed"]} rejeitadas) '
+                       f'- {processed / elapsed:.0f} linhas/s')
+    finally:
+        if errors:
+            errors.close()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    click.echo(f'Importação concluída: {checkpoint["created"]} criados, {checkpoint["failed"]} rejeitados')
+
+
+@users_cli.command('reindex-search')
+def reindex_search():
+    """Reconstrói o índice de busca (users_fts) a partir da tabela users."""
+    from app import db
+    from app.search import rebuild_search_index
+
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    click.echo('Índice de busca reconstruído')
+
+
+@users_cli.command('archive')
+@click.option('--older-than-days', type=int, default=None,
+              help='Arquiva quem está desabilitado há mais de N dias (padrão: ARCHIVE_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=None,
+              help='Usuários movidos por transação (padrão: ARCHIVE_BATCH_SIZE).')
+def archive_users(older_than_days, batch_size):
+    """Move para users_archive os usuários desabilitados há mais tempo que a retenção."""
+    from app.services.archive import archive_disabled_users, retention_cutoff
+
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_RETENTION_DAYS']
+    if batch_size is None:
+        batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    if older_than_days < 0:
+        raise click.BadParameter('não pode ser negativo', param_hint='--older-than-days')
+    if batch_size < 1:
+        raise click.BadParameter('deve ser maior que zero', param_hint='--batch-size')
+
+    start = time.perf_counter()
+    archived = archive_disabled_users(
+        retention_cutoff(older_than_days), batch_size,
+        on_batch=lambda total: click.echo(f'{total} usuários arquivados '
+                                          f'- {total / (time.perf_counter() - start):.0f} usuários/s')
+    )
+    click.echo(f'Arquivamento concluído: {archived} usuários movidos para users_archive')
+
+
+@users_cli.command('startup-profile')
+@click.option('--config', 'config_name', default=lambda: os.environ.get('FLASK_CONFIG', 'production'),
+              help='Perfil de config.py medido (padrão: FLASK_CONFIG ou production).')
+@click.option('--runs', type=int, default=3, help='Execuções; reporta a mais rápida.')
+@click.option('--top', type=int, default=10, help='Importações mais lentas listadas.')
+def startup_profile(config_name, runs, top):
+    """Mede o tempo de import e do create_app() em um processo novo."""
+    from app.startup import DEFERRED_MODULES, measure_startup
+
+    if runs < 1:
+        raise click.BadParameter('deve ser maior que zero', param_hint='--runs')
+    try:
+        profile = measure_startup(config_name, runs=runs, importtime=top > 0)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    schema = 'create_all' if profile['schema_auto_create'] else 'migrações'
+    click.echo(f'Inicialização ({config_name}, esquema: {schema}, melhor de {runs}):')
+    click.echo(f'  interpretador  {profile["interpreter_ms"]:>8.1f} ms')
+    click.echo(f'  import app     {profile["import_ms"]:>8.1f} ms')
+    click.echo(f'  create_app()   {profile["create_app_ms"]:>8.1f} ms')
+    click.echo(f'  total          {profile["total_ms"]:>8.1f} ms  ({profile["modules"]} módulos)')
+
+    if top > 0:
+        click.echo('Importações mais lentas (tempo acumulado):')
+        for name, elapsed in profile['imports'][:top]:
+            click.echo(f'  {elapsed:>8.1f} ms  {name}')
+
+    loaded = profile['loaded_deferred']
+    if loaded:
+        click.echo(f'Aviso: módulos que deveriam ser adiados foram importados: {", ".join(loaded)}')
+    else:
+        click.echo(f'Adiados (não importados): {", ".join(DEFERRED_MODULES)}')
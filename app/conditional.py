@@ -0,0 +1,48 @@
+"""
+Validadores HTTP (ETag / Last-Modified) e respostas 304 para requisições condicionais
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+
+#Gera um ETag forte a partir das partes que identificam a versão do recurso
+def make_etag(*parts):
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+#Converte o datetime UTC ingênuo do banco para o formato usado nos headers HTTP
+def http_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+#O cliente já possui a versão atual? If-None-Match tem prioridade sobre If-Modified-Since
+def is_fresh(if_none_match, if_modified_since, etag, last_modified=None):
+    if if_none_match:
+        return if_none_match.contains(etag)
+    if last_modified is None or if_modified_since is None:
+        return False
+    return last_modified <= if_modified_since
+
+
+#Retorna uma resposta 304 se o cliente já possui a versão atual, senão None
+def not_modified(etag, last_modified=None):
+    if not is_fresh(request.if_none_match, request.if_modified_since, etag, last_modified):
+        return None
+
+    response = Response(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
@@ -1,160 +1,221 @@
-from flask import Blueprint, request, jsonify
-from app import db
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from app import db, group_commit, user_cache
 from app.models.user import User
-from sqlalchemy.exc import IntegrityError
+from app.conditional import not_modified, set_validators
+from app.services import users
+from app.services.bulk import (chunked, create_users_batch, parse_json_line, set_enabled_by_phones,
+                               set_enabled_created_before)
+from app.services.lookup import resolve_users
+from app.services.users import UserStore, dumps, run_operation
+from app.routing import read_replica
+from sqlalchemy import select
 from datetime import datetime
 
 user_bp = Blueprint('users', __name__)
 
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+
+#Interpreta o filtro ?enabled= (true, false ou all)
+def parse_enabled_filter(value, default=True):
+    if value is None or value == '':
+        return default
+
+    value = value.lower()
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    if value == 'all':
+        return None
+
+    raise ValueError('Parâmetro enabled deve ser true, false ou all')
+
+
+def json_response(payload):
+    return current_app.response_class(dumps(payload), mimetype='application/json')
+
+
+#Executa a operação compartilhada (app.services.users) na sessão da requisição,
+#com as escritas pelo group commit, e converte o Result na resposta Flask
+def respond(operation, *args):
+    store = UserStore(db.session, group_commit.execute, db.engine.dialect.name)
+    result = run_operation(request.endpoint, store, operation, *args)
+    if result.etag is not None:
+        cached = not_modified(result.etag, result.last_modified)
+        if cached:
+            return cached
+
+    response = json_response(result.payload)
+    if result.etag is not None:
+        set_validators(response, result.etag, result.last_modified)
+    return response, result.status
+
+
 #Controller para realizar o CRUD de usuários
 class UserController:
     
-    #Retorna todos os usuários habilitados com enabled=true
+    #Retorna os usuários habilitados com enabled=true, paginados por cursor (id)
     @staticmethod
     def get_all_users():
+        return respond(users.get_all_users, request.args)
+
+    #Feed de alterações desde o cursor, incluindo enabled=false
+    @staticmethod
+    def get_changes():
+        return respond(users.get_changes, request.args)
+
+    #Exporta os usuários em streaming (NDJSON ou array JSON) sem carregar a tabela em memória
+    @staticmethod
+    def export_users():
         try:
-            users = User.query.filter_by(enabled=True).all()
-            return jsonify({
-                'success': True,
-                'data': [user.to_dict() for user in users],
-                'count': len(users)
-            }), 200
-        except Exception as e:
+            export_format = request.args.get('format', 'ndjson')
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError('Parâmetro format deve ser ndjson ou json')
+
+            enabled = parse_enabled_filter(request.args.get('enabled'))
+            fields = User.parse_fields(request.args.get('fields'))
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'message': f'Erro ao buscar usuários: {str(e)}'
-            }), 500
-            
-            
+                'message': str(e)
+            }), 400
+
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        stmt = (
+            select(*[getattr(User, field) for field in fields])
+            .order_by(User.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if enabled is not None:
+            stmt = stmt.where(User.enabled == enabled)
+
+        serialize = User.row_serializer(fields)
+
+        def generate():
+            # yield_per mantém o cursor aberto e busca as linhas em lotes,
+            # então o primeiro byte sai antes da consulta terminar.
+            # Cada lote vira um único chunk da resposta
+            result = db.session.execute(stmt)
+            try:
+                if export_format == 'json':
+                    separator = '['
+                    for partition in result.partitions():
+                        yield separator + ','.join(dumps(serialize(row)) for row in partition)
+                        separator = ','
+                    yield '[]' if separator == '[' else ']'
+                else:
+                    for partition in result.partitions():
+                        yield ''.join(dumps(serialize(row)) + '\n' for row in partition)
+            finally:
+                result.close()
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[export_format]
+        )
+
+
+    #Busca usuários habilitados por nome ou email (prefixo), ordenados por relevância
+    @staticmethod
+    def search_users():
+        return respond(users.search_users, request.args)
+
     #Retorna um usuário específico por telefone
     @staticmethod
     def get_user_by_phone(phone):
-        try:
-            user = User.query.filter_by(phone=phone).first()
-            if not user:
-                return jsonify({
-                    'success': False,
-                    'message': f'Usuário com telefone {phone} não encontrado.'
-                }), 404
-                
-            return jsonify({
-                'success': True,
-                'data': user.to_dict()
-            }), 200
+        return respond(users.get_user_by_phone, phone)
 
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'message': f'Erro ao buscar usuário: {str(e)}'
-            }), 500
-            
-            
+    #Busca vários usuários por telefone e/ou email em uma requisição
     @staticmethod
-    def create_user():
-        #Cria um novo usuário
+    def lookup_users():
         try:
             data = request.get_json(silent=True)
-            
-            if not data:
+            if not isinstance(data, dict):
                 return jsonify({
                     'success': False,
                     'message': 'Dados JSON são obrigatórios'
                 }), 400
-            
-            # Validação de campos obrigatórios
-            required_fields = ['name', 'email','phone']
-            for field in required_fields:
-                if field not in data or not data[field]:
+
+            phones = data.get('phones') or []
+            emails = data.get('emails') or []
+            for keys in (phones, emails):
+                if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
                     return jsonify({
                         'success': False,
-                        'message': f'Campo {field} é obrigatório'
+                        'message': 'phones e emails devem ser listas de texto'
                     }), 400
-            
-            # Verificar se email já existe
-            existing_user = User.query.filter_by(email=data['email']).first()
-            if existing_user:
+            if not phones and not emails:
                 return jsonify({
                     'success': False,
-                    'message': 'Email já está em uso'
-                }), 409
-            
-            # Criar novo usuário
-            user = User(
-                name=data['name'],
-                email=data['email'],
-                phone=data.get('phone'),
-                enabled=data.get('enabled', True)
-            )
-            
-            db.session.add(user)
-            db.session.commit()
-            
-            return jsonify({
+                    'message': 'Informe phones e/ou emails'
+                }), 400
+
+            max_keys = current_app.config['LOOKUP_MAX_KEYS']
+            if len(phones) + len(emails) > max_keys:
+                return jsonify({
+                    'success': False,
+                    'message': f'Máximo de {max_keys} chaves por requisição'
+                }), 413
+
+            found, missing = resolve_users(phones, emails)
+            return json_response({
                 'success': True,
-                'message': 'Usuário criado com sucesso',
-                'data': user.to_dict()
-            }), 201
-            
-        except ValueError as e:
-            return jsonify({
-                'success': False,
-                'message': str(e)
-            }), 400
-        except IntegrityError as e:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'message': 'Erro: Telefone já cadastrado'
-            }), 409
+                'data': found,
+                'count': len(found),
+                'missing': missing
+            }), 200
+
         except Exception as e:
-            db.session.rollback()
             return jsonify({
                 'success': False,
-                'message': f'Erro ao criar usuário: {str(e)}'
+                'message': f'Erro ao buscar usuários: {str(e)}'
             }), 500
-            
-    @staticmethod        
-    def update_user_by_phone(phone):
+
+    #Cria um novo usuário
+    @staticmethod
+    def create_user():
+        return respond(users.create_user, request.get_json(silent=True))
+
+    #Cria vários usuários em uma requisição (array JSON ou NDJSON)
+    @staticmethod
+    def bulk_create_users():
         try:
-            # Buscar usuário pelo telefone
-            user = User.query.filter_by(phone=phone).first()
-            if not user:
-                return jsonify({
-                    'success': False,
-                    'message': f'Usuário com telefone {phone} não encontrado'
-                }), 404
+            if request.mimetype == 'application/x-ndjson':
+                # Linha que não é JSON válido vira um erro na posição dela, como no flask users import
+                lines = request.get_data(as_text=True).splitlines()
+                rows = [parse_json_line(line) for line in lines if line.strip()]
+            else:
+                rows = request.get_json(silent=True)
 
-            data = request.get_json(silent=True)
-            if not data:
+            if not rows or not isinstance(rows, list):
                 return jsonify({
                     'success': False,
-                    'message': 'Dados JSON são obrigatórios'
+                    'message': 'Uma lista de usuários em JSON é obrigatória'
                 }), 400
 
-            # Atualizar apenas nome e email (se forem informados)
-            if 'name' in data:
-                user.name = data['name']
-
-            if 'email' in data:
-                # Verifica se o novo email já existe em outro usuário
-                existing_email = User.query.filter(
-                    User.email == data['email'],
-                    User.id != user.id
-                ).first()
-                if existing_email:
-                    return jsonify({
-                        'success': False,
-                        'message': 'E-mail já cadastrado'
-                    }), 409
-
-                user.email = data['email']
+            max_rows = current_app.config['BULK_MAX_ROWS']
+            if len(rows) > max_rows:
+                return jsonify({
+                    'success': False,
+                    'message': f'Máximo de {max_rows} usuários por requisição'
+                }), 413
 
-            db.session.commit()
+            # Cada lote é validado, verificado e inserido em uma única transação
+            batch_size = current_app.config['BULK_BATCH_SIZE']
+            results = []
+            for batch in chunked(list(enumerate(rows)), batch_size):
+                results.extend(create_users_batch(batch))
 
+            created = sum(1 for result in results if result['success'])
             return jsonify({
                 'success': True,
-                'message': 'Usuário atualizado com sucesso',
-                'data': user.to_dict()
+                'created': created,
+                'failed': len(results) - created,
+                'results': results
             }), 200
 
         except ValueError as e:
@@ -162,95 +223,122 @@ class UserController:
                 'success': False,
                 'message': str(e)
             }), 400
-
-        except IntegrityError:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'message': 'Erro de integridade: e-mail já existe'
-            }), 409
-
         except Exception as e:
             db.session.rollback()
             return jsonify({
                 'success': False,
-                'message': f'Erro ao atualizar usuário: {str(e)}'
+                'message': f'Erro ao criar usuários: {str(e)}'
             }), 500
             
-             
+    #Desativa (enabled=False) ou reativa (enabled=True) vários usuários de uma vez,
+    #por lista de telefones ou pelo filtro created_before, sem carregar objetos ORM
     @staticmethod
-    def delete_user(phone):
-        """Desabilita um usuário com base no telefone"""
+    def bulk_set_enabled(enabled):
         try:
-            # Busca o usuário pelo telefone
-            user = User.query.filter_by(phone=phone).first()
-            if not user:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
                 return jsonify({
                     'success': False,
-                    'message': f'Usuário com telefone {phone} não encontrado'
-                }), 404
-
-            # Desabilita o usuário
-            user.enabled = False
-            user.updated_at = datetime.utcnow()
-            db.session.commit()
-
-            return jsonify({
-                'success': True,
-                'message': 'Usuário removido com sucesso'
-            }), 200
+                    'message': 'Dados JSON são obrigatórios'
+                }), 400
 
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'message': f'Erro ao remover usuário: {str(e)}'
-            }), 500
-            
-    #Reativar usuário que foi apagado        
-    @staticmethod
-    def restore_user(phone):
-        try:
-            # Busca o usuário pelo telefone (incluindo desabilitados)
-            user = User.query.filter_by(phone=phone).first()
-            if not user:
+            phones = data.get('phones')
+            created_before = data.get('created_before')
+            if phones is None and created_before is None:
                 return jsonify({
                     'success': False,
-                    'message': f'Usuário com telefone {phone} não encontrado'
-                }), 404
-            
-            # Verifica se já está habilitado
-            if user.enabled:
+                    'message': 'Informe phones ou created_before'
+                }), 400
+            if phones is not None and created_before is not None:
                 return jsonify({
                     'success': False,
-                    'message': 'Usuário já está ativo'
+                    'message': 'Informe apenas um entre phones e created_before'
                 }), 400
 
-            # Reativa o usuário
-            user.enabled = True
-            user.updated_at = datetime.utcnow()
-            db.session.commit()
+            if phones is not None:
+                if not isinstance(phones, list) or not all(isinstance(phone, str) for phone in phones):
+                    return jsonify({
+                        'success': False,
+                        'message': 'phones deve ser uma lista de texto'
+                    }), 400
+
+                max_rows = current_app.config['BULK_MAX_ROWS']
+                if len(phones) > max_rows:
+                    return jsonify({
+                        'success': False,
+                        'message': f'Máximo de {max_rows} telefones por requisição'
+                    }), 413
+
+                updated, unchanged, unknown = set_enabled_by_phones(phones, enabled)
+            else:
+                try:
+                    created_before = datetime.fromisoformat(created_before)
+                except (TypeError, ValueError):
+                    return jsonify({
+                        'success': False,
+                        'message': 'Parâmetro created_before deve ser uma data ISO 8601'
+                    }), 400
+
+                updated = set_enabled_created_before(
+                    created_before, enabled, current_app.config['BULK_BATCH_SIZE']
+                )
+                unchanged, unknown = [], []
+
+            user_cache.invalidate(*updated)
 
             return jsonify({
                 'success': True,
-                'message': 'Usuário reativado com sucesso',
-                'data': user.to_dict()
+                'updated': len(updated),
+                'unchanged': len(unchanged),
+                'unknown': unknown
             }), 200
 
         except Exception as e:
             db.session.rollback()
             return jsonify({
                 'success': False,
-                'message': f'Erro ao reativar usuário: {str(e)}'
+                'message': f'Erro ao atualizar usuários: {str(e)}'
             }), 500
+
+    #Atualiza nome e email ou, com ?upsert=1, cria ou atualiza o usuário do telefone
+    @staticmethod
+    def update_user_by_phone(phone):
+        return respond(users.update_user, phone, request.get_json(silent=True), request.args)
+
+    #Desabilita um usuário com base no telefone
+    @staticmethod
+    def delete_user(phone):
+        return respond(users.delete_user, phone)
+
+    #Reativar usuário que foi apagado
+    @staticmethod
+    def restore_user(phone):
+        return respond(users.restore_user, phone)
     
 
 # Rotas da API
 @user_bp.route('/users', methods=['GET'])
+@read_replica
 def get_users():
     return UserController.get_all_users()
 
+@user_bp.route('/users/export', methods=['GET'])
+@read_replica
+def export_users():
+    return UserController.export_users()
+
+@user_bp.route('/users/changes', methods=['GET'])
+@read_replica
+def get_changes():
+    return UserController.get_changes()
+
+@user_bp.route('/users/search', methods=['GET'])
+@read_replica
+def search_users():
+    return UserController.search_users()
+
 @user_bp.route('/users/<string:phone>', methods=['GET'])
+@read_replica
 def get_user(phone):
     return UserController.get_user_by_phone(phone)
 
@@ -258,6 +346,23 @@ def get_user(phone):
 def create_user():
     return UserController.create_user()
 
+@user_bp.route('/users/lookup', methods=['POST'])
+@read_replica
+def lookup_users():
+    return UserController.lookup_users()
+
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_create_users():
+    return UserController.bulk_create_users()
+
+@user_bp.route('/users/bulk-disable', methods=['PATCH'])
+def bulk_disable_users():
+    return UserController.bulk_set_enabled(False)
+
+@user_bp.route('/users/bulk-restore', methods=['PATCH'])
+def bulk_restore_users():
+    return UserController.bulk_set_enabled(True)
+
 @user_bp.route('/users/<string:phone>', methods=['PUT'])
 def update_user(phone):
     return UserController.update_user_by_phone(phone)
@@ -0,0 +1,41 @@
+"""
+Perfil do engine SQLAlchemy: PRAGMAs do SQLite aplicados a cada nova conexão
+"""
+from sqlalchemy import event
+
+from app.routing import REPLICA_BIND
+
+
+def configure_engines(app, engines):
+    for bind_key, engine in engines.items():
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            continue
+
+        engine_pragmas = sqlite_pragmas(app.config, bind_key)
+        if engine_pragmas:
+            install_sqlite_pragmas(engine, engine_pragmas)
+
+
+#PRAGMAs do perfil para o bind (None é o primário)
+def sqlite_pragmas(config, bind_key=None):
+    pragmas = dict(config.get('SQLITE_PRAGMAS') or {})
+    if bind_key == REPLICA_BIND:
+        # A réplica só recebe leituras: qualquer escrita por engano falha
+        pragmas['query_only'] = 'ON'
+    return pragmas
+
+
+#Registra um listener de connect que executa os PRAGMAs configurados
+def install_sqlite_pragmas(engine, pragmas):
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_sqlite_pragmas
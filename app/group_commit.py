@@ -0,0 +1,208 @@
+"""
+Group commit das escritas
+
+O SQLite aceita um escritor por vez e cada requisição de escrita paga o seu
+próprio commit (fsync). Com WRITE_GROUP_COMMIT ligado, as operações das
+requisições concorrentes vão para uma única thread escritora, que aplica o que
+estiver na fila (até WRITE_GROUP_MAX_OPS, esperando no máximo
+WRITE_GROUP_MAX_DELAY_MS por mais operações) em uma só transação. Cada operação
+roda em um SAVEPOINT: o erro de uma (ex.: IntegrityError) desfaz só ela e é
+devolvido para a requisição que a enviou.
+
+Uma operação é uma função que recebe a Connection e executa instruções Core;
+ela pode rodar na requisição (modo padrão) ou na thread escritora.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+
+class GroupCommitTimeout(Exception):
+    """A operação não terminou em WRITE_GROUP_TIMEOUT; se ainda estava na fila, foi cancelada"""
+
+    def __init__(self, message='Tempo de espera da escrita esgotado, tente novamente em instantes'):
+        super().__init__(message)
+
+
+class GroupCommitWriter:
+    """Thread escritora: aplica as operações enfileiradas em transações agrupadas"""
+
+    def __init__(self, engine, max_ops=64, max_delay=0):
+        self.engine = engine
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self.pid = os.getpid()
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, func):
+        future = Future()
+        self._queue.put((func, future))
+        return future
+
+    #Aplica o que ainda estiver na fila e encerra a thread
+    def close(self, timeout=None):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._apply(batch)
+            if stop:
+                return
+
+    #Bloqueia até a primeira operação e junta as que chegarem até max_delay
+    def _collect(self):
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_ops:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _apply(self, batch):
+        outcomes = []
+        try:
+            with self.engine.connect() as connection:
+                # O pysqlite não emite BEGIN antes de um SAVEPOINT: sem o BEGIN explícito
+                # o RELEASE do primeiro savepoint confirmaria a operação sozinha.
+                # IMMEDIATE já reserva a escrita, sem disputa de lock no meio do grupo
+                if connection.dialect.name == 'sqlite':
+                    connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+                for func, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    savepoint = connection.begin_nested()
+                    try:
+                        result = func(connection)
+                        savepoint.commit()
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        savepoint.rollback()
+                        outcomes.append((future, None, e))
+
+                connection.commit()
+        except Exception as e:
+            # Falha no commit do grupo: nenhuma operação foi gravada
+            for _, future in batch:
+                if future.running():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+class _GroupCommitState:
+    def __init__(self, app):
+        self.max_ops = app.config['WRITE_GROUP_MAX_OPS']
+        self.max_delay = app.config['WRITE_GROUP_MAX_DELAY_MS'] / 1000
+        self.timeout = app.config['WRITE_GROUP_TIMEOUT']
+        self.writer = None
+        self.lock = threading.Lock()
+
+    #A thread é criada na primeira escrita (e recriada em um processo filho após fork)
+    def get_writer(self, engine):
+        writer = self.writer
+        if writer is not None and writer.pid == os.getpid():
+            return writer
+
+        with self.lock:
+            if self.writer is None or self.writer.pid != os.getpid():
+                self.writer = GroupCommitWriter(engine, self.max_ops, self.max_delay)
+                atexit.register(self.writer.close)
+            return self.writer
+
+
+class GroupCommit:
+    """Extensão Flask que executa as operações de escrita na requisição ou no group commit"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_GROUP_COMMIT', False)
+        app.config.setdefault('WRITE_GROUP_MAX_OPS', 64)
+        app.config.setdefault('WRITE_GROUP_MAX_DELAY_MS', 0)
+        app.config.setdefault('WRITE_GROUP_TIMEOUT', 30)
+
+        state = None
+        if app.config['WRITE_GROUP_COMMIT']:
+            state = _GroupCommitState(app)
+        app.extensions['group_commit'] = state
+
+    @property
+    def writer(self):
+        state = current_app.extensions.get('group_commit')
+        return state.writer if state is not None else None
+
+    @property
+    def timeout(self):
+        state = current_app.extensions.get('group_commit')
+        return state.timeout if state is not None else None
+
+    #Envia func para a thread escritora; sem group commit devolve None
+    def submit(self, func):
+        from app import db
+
+        state = current_app.extensions.get('group_commit')
+        if state is None:
+            return None
+        return state.get_writer(db.engine).submit(func)
+
+    #Executa func(connection) e confirma; devolve o resultado ou propaga a exceção da operação
+    def execute(self, func):
+        from app import db
+
+        future = self.submit(func)
+        if future is None:
+            return run_in_transaction(db.session, func)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Ninguém espera mais pelo resultado: a operação que ainda não começou
+            # sai da fila (_apply ignora futures cancelados) em vez de gravar depois
+            future.cancel()
+            raise GroupCommitTimeout()
+
+
+#Executa func(connection) na transação da sessão e confirma (desfaz em caso de erro)
+def run_in_transaction(session, func):
+    try:
+        result = func(session.connection())
+        session.commit()
+        return result
+    except Exception:
+        session.rollback()
+        raise
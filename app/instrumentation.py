@@ -0,0 +1,115 @@
+"""
+Instrumentação de SQL por requisição: número de consultas, tempo no banco,
+header Server-Timing e log estruturado
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('app.requests')
+
+# Controle de transação não conta como consulta: os SAVEPOINTs do group commit
+# (e da transação externa dos testes) não entram no número de consultas
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, duration):
+        self.count += 1
+        self.duration += duration
+
+
+def init_app(app, engines):
+    app.config.setdefault('SQL_INSTRUMENTATION', True)
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    for engine in engines.values():
+        install_listeners(engine)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+#Mede cada execução de cursor e acumula nas estatísticas da requisição atual
+def install_listeners(engine):
+    # O início fica no contexto de execução, descartado com a instrução: uma
+    # instrução que falha não deixa nada para trás na conexão do pool
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_start
+        if statement.startswith(TRANSACTION_CONTROL):
+            return
+        # g.sql_stats é criado por requisição (WSGI ou ASGI, que abre um app context)
+        if has_app_context():
+            stats = g.get('sql_stats')
+            if stats is not None:
+                stats.record(duration)
+        for counter in _active_counters:
+            counter.record(duration)
+
+
+def _start_request():
+    g.sql_stats = QueryStats()
+    g.request_start = time.perf_counter()
+
+
+def _finish_request(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+
+    total_ms = (time.perf_counter() - g.request_start) * 1000
+    response.headers.add('Server-Timing', server_timing(stats, total_ms))
+    log_request(request.method, request.path, request.endpoint, response.status_code, stats, total_ms)
+    return response
+
+
+#Valor do header Server-Timing: tempo no banco (com o número de consultas) e total
+def server_timing(stats, total_ms):
+    return f'db;dur={stats.duration * 1000:.3f};desc="{stats.count} queries", app;dur={total_ms:.3f}'
+
+
+def log_request(method, path, endpoint, status, stats, total_ms):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    record = {
+        'event': 'request',
+        'method': method,
+        'path': path,
+        'endpoint': endpoint,
+        'status': status,
+        'duration_ms': round(total_ms, 3),
+        'db_queries': stats.count,
+        'db_time_ms': round(stats.duration * 1000, 3)
+    }
+    logger.info(json.dumps(record), extra=record)
+
+
+_active_counters = []
+
+
+#Conta as consultas executadas dentro do bloco (usado pelos testes de orçamento de queries)
+@contextmanager
+def count_queries():
+    stats = QueryStats()
+    _active_counters.append(stats)
+    try:
+        yield stats
+    finally:
+        _active_counters.remove(stats)
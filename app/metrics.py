@@ -0,0 +1,336 @@
+"""
+Métricas no formato texto do Prometheus (/metrics).
+
+Os contadores são particionados por thread: cada thread escreve apenas no seu
+próprio dicionário, sem lock no caminho da requisição. As partições só são
+somadas na coleta (leitura do /metrics). A partição de uma thread encerrada é
+incorporada a um total base, então o número de partições acompanha as threads
+vivas e não as conexões já atendidas.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, request
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ShardedMetric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._base = {}  # valores das threads já encerradas
+        self._shards = []  # (thread, partição) das threads vivas
+        self._shards_lock = threading.Lock()
+
+    #Dicionário da thread atual; o lock só é usado na primeira escrita de cada thread
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    #Incorpora ao total base as partições de threads encerradas (que não escrevem mais)
+    def _fold_finished(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._base, shard.items())
+        self._shards = alive
+
+    def _snapshots(self):
+        with self._shards_lock:
+            self._fold_finished()
+            shards = [shard for _, shard in self._shards]
+            base = list(self._base.items())
+        # list(dict.items()) é atômico no CPython, então não precisamos parar os escritores
+        return [base] + [list(shard.items()) for shard in shards]
+
+    def values(self):
+        totals = {}
+        for items in self._snapshots():
+            self._merge(totals, items)
+        return totals
+
+    #Zera os valores; as threads continuam escrevendo nas mesmas partições
+    def reset(self):
+        with self._shards_lock:
+            self._base.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_ShardedMetric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(totals, items):
+        for labels, value in items:
+            totals[labels] = totals.get(labels, 0) + value
+
+    def _render_samples(self):
+        return [f'{self.name}{self._labels(labels)} {value}' for labels, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_ShardedMetric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # contagem por bucket (o último é +Inf) e a soma dos valores
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    #Cria listas novas: as entradas das partições continuam sendo escritas
+    def _merge(self, totals, items):
+        for labels, (counts, total) in items:
+            merged_counts, merged_total = totals.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            totals[labels] = [[a + b for a, b in zip(merged_counts, counts)], merged_total + total]
+
+    def _render_samples(self):
+        lines = []
+        for labels, (counts, total) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{self._labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels(labels)} {total}')
+            lines.append(f'{self.name}_count{self._labels(labels)} {cumulative}')
+        return lines
+
+
+class CallbackGauge:
+    """Gauge cujo valor é lido na coleta (ex.: estado do pool, estatísticas do cache)"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback, metric_type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.type = metric_type
+
+    def render(self):
+        value = self.callback()
+        if value is None:
+            return []
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}',
+                f'{self.name} {value}']
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self.metrics:
+            if hasattr(metric, 'reset'):
+                metric.reset()
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Extensão Flask: métricas das rotas do user_bp, do pool de conexões e do cache"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, blueprints=('users',)):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        registry = MetricsRegistry()
+        state = _MetricsState(registry)
+        app.extensions['metrics'] = state
+
+        # Hooks registrados só para os blueprints medidos (sem custo nas demais rotas)
+        before_request, after_request, teardown_request = _make_hooks(state)
+        for blueprint in blueprints:
+            app.before_request_funcs.setdefault(blueprint, []).append(before_request)
+            app.after_request_funcs.setdefault(blueprint, []).append(after_request)
+            app.teardown_request_funcs.setdefault(blueprint, []).append(teardown_request)
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics'].registry
+
+
+class _MetricsState:
+    def __init__(self, registry):
+        self.registry = registry
+        self.requests = registry.register(Counter(
+            'http_requests_total', 'Requisições atendidas por rota, método e status.',
+            ('route', 'method', 'status')))
+        self.latency = registry.register(Histogram(
+            'http_request_duration_seconds', 'Latência das requisições por rota e método.',
+            ('route', 'method')))
+        # Em andamento = iniciadas - finalizadas, evitando um decremento por requisição
+        self.started = Counter('http_requests_started_total', 'Requisições iniciadas.')
+        registry.register(CallbackGauge(
+            'http_requests_in_flight', 'Requisições em andamento.', self._in_flight))
+        self.pool_wait = registry.register(Histogram(
+            'db_pool_checkout_wait_seconds', 'Tempo de espera para obter uma conexão do pool.'))
+        registry.register(CallbackGauge(
+            'db_pool_connections_in_use', 'Conexões do pool em uso.',
+            lambda: _pool_stat('checkedout')))
+        registry.register(CallbackGauge(
+            'db_pool_size', 'Tamanho configurado do pool.', lambda: _pool_stat('size')))
+        registry.register(CallbackGauge(
+            'db_pool_overflow', 'Conexões além do tamanho do pool.', lambda: _pool_stat('overflow')))
+        for stat in ('hits', 'misses', 'evictions'):
+            registry.register(CallbackGauge(
+                f'user_cache_{stat}_total', f'Cache de usuários: {stat}.',
+                lambda stat=stat: _cache_stats().get(stat), 'counter'))
+        registry.register(CallbackGauge(
+            'user_cache_hit_ratio', 'Proporção de hits do cache de usuários.', _cache_hit_ratio))
+        self.engine = None
+        self.pool = None
+
+    def reset(self):
+        self.registry.reset()
+        self.started.reset()
+
+    def _in_flight(self):
+        started = sum(self.started.values().values())
+        finished = sum(self.requests.values().values())
+        return started - finished
+
+    #Envolve o checkout do pool para medir a espera por conexão. É refeito
+    #quando o engine recria o pool (ex.: dispose após fork)
+    def instrument_pool(self):
+        if self.engine is None:
+            from app import db
+            self.engine = db.engine
+
+        pool = self.engine.pool
+        if pool is self.pool:
+            return
+        self.pool = pool
+
+        do_get = getattr(pool, '_do_get', None)
+        if do_get is None:
+            return
+        observe = self.pool_wait.observe
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                observe(time.perf_counter() - start)
+
+        pool._do_get = timed_do_get
+
+
+#Cria os hooks com o estado já vinculado: no caminho da requisição cada acesso a
+#um proxy do Flask (current_app, g, request) custa cerca de 1 µs
+def _make_hooks(state):
+    started = state.started
+    requests = state.requests
+    latency = state.latency
+
+    def record(req, status):
+        start = req.__dict__.pop('_metrics_start', None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        route = req.url_rule.rule if req.url_rule else req.path
+        method = req.method
+        requests.inc((route, method, str(status)))
+        latency.observe(duration, (route, method))
+
+    def before_request():
+        state.instrument_pool()
+        started.inc()
+        request._get_current_object()._metrics_start = time.perf_counter()
+
+    def after_request(response):
+        record(request._get_current_object(), response.status_code)
+        return response
+
+    #Requisições que terminaram com exceção não passam pelo after_request
+    def teardown_request(exc):
+        record(request._get_current_object(), 500)
+
+    return before_request, after_request, teardown_request
+
+
+def _pool_stat(name):
+    from app import db
+
+    method = getattr(db.engine.pool, name, None)
+    return method() if callable(method) else None
+
+
+def _cache_stats():
+    from app import user_cache
+    return user_cache.stats()
+
+
+def _cache_hit_ratio():
+    stats = _cache_stats()
+    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+    if not stats:
+        return None
+    return stats['hits'] / lookups if lookups else 0.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metrics_view():
+    return Response(current_app.extensions['metrics'].registry.render(), mimetype='text/plain; version=0.0.4')
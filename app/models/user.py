@@ -1,13 +1,28 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.orm import validates
+from app.changes import install_change_sequence
+from app.search import install_search_index
 import re
 
 
 class User(db.Model):
     
     __tablename__ = 'users'
+    __table_args__ = (
+        # Serve a listagem filter_by(enabled=True) ordenada/paginada por id
+        Index('ix_users_enabled_id', 'enabled', 'id'),
+        Index('ix_users_updated_at', 'updated_at'),
+        # Feed de alterações paginado por change_seq
+        Index('ix_users_change_seq', 'change_seq'),
+        # Ids nunca são reutilizados: o usuário arquivado volta com o id original
+        {'sqlite_autoincrement': True},
+    )
+    # Campos expostos pela API, na mesma ordem do to_dict
+    SERIALIZABLE_FIELDS = ('id', 'name', 'email', 'phone', 'enabled', 'created_at', 'updated_at')
+    DATETIME_FIELDS = ('created_at', 'updated_at')
+
     #Definindo o shema 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -16,6 +31,8 @@ class User(db.Model):
     enabled = Column(Boolean, default=True)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+    # Posição no feed de alterações, atribuída pelos triggers na transação (app/changes.py)
+    change_seq = Column(Integer)
     
     #Definindo o construtor
     def __init__(self, name, email, phone=None, enabled=True):
@@ -68,6 +85,40 @@ class User(db.Model):
         
         return phone
 
+    @validates('enabled')
+    def validate_enabled(self, key, enabled):
+        # Só aceita booleano: bool("false") seria True e bool(None) seria False
+        if not isinstance(enabled, bool):
+            raise ValueError('Campo enabled deve ser true ou false')
+
+        return enabled
+
+    @classmethod
+    def normalize(cls, data):
+        #Aplica as mesmas validações do @validates sem instanciar o objeto ORM
+        #(usado nos caminhos em lote, que inserem direto na tabela)
+        now = datetime.utcnow()
+        return {
+            'name': cls.validate_name(None, 'name', data.get('name')),
+            'email': cls.validate_email(None, 'email', data.get('email')),
+            'phone': cls.validate_phone(None, 'phone', data.get('phone')),
+            'enabled': cls.validate_enabled(None, 'enabled', data.get('enabled', True)),
+            'created_at': now,
+            'updated_at': now
+        }
+
+    @classmethod
+    def unique_violation(cls, error):
+        #Identifica qual coluna única (email ou phone) causou o IntegrityError.
+        #SQLite: "UNIQUE constraint failed: users.email"; PostgreSQL: constraint users_email_key
+        message = str(getattr(error, 'orig', error))
+        diag = getattr(getattr(error, 'orig', None), 'diag', None)
+        constraint = getattr(diag, 'constraint_name', None) or ''
+        for column in ('email', 'phone'):
+            if f'{cls.__tablename__}.{column}' in message or f'_{column}_' in constraint:
+                return column
+        return None
+
     def to_dict(self):
         #Converte o objeto para dicionário
         return {
@@ -80,6 +131,37 @@ class User(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    @classmethod
+    def parse_fields(cls, value):
+        #Interpreta a projeção ?fields=name,email (sem o parâmetro, todos os campos)
+        if not value:
+            return cls.SERIALIZABLE_FIELDS
+
+        fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+        invalid = [field for field in fields if field not in cls.SERIALIZABLE_FIELDS]
+        if invalid or not fields:
+            raise ValueError(f'Campos inválidos em fields: {", ".join(invalid) or value}')
+
+        return fields
+
+    @classmethod
+    def row_serializer(cls, fields, columns=None):
+        #Cria uma função que serializa tuplas de select(*colunas) sem construir objetos ORM.
+        #columns é a ordem das colunas na tupla, quando diferente de fields
+        columns = tuple(columns or fields)
+        positions = [(field, columns.index(field), field in cls.DATETIME_FIELDS) for field in fields]
+
+        def serialize(row):
+            data = {}
+            for field, position, is_datetime in positions:
+                value = row[position]
+                if is_datetime and value is not None:
+                    value = value.isoformat()
+                data[field] = value
+            return data
+
+        return serialize
+
     def update_from_dict(self, data):
         #Atualiza o objeto a partir de um dicionário
         for key, value in data.items():
@@ -90,3 +172,9 @@ class User(db.Model):
     
     def __repr__(self):
         return f'<User {self.name} ({self.email})>'
+
+
+# Índice FTS5 de nome/email criado junto com a tabela (ver app/search.py)
+install_search_index(User.__table__)
+# Contador e triggers do change_seq (ver app/changes.py)
+install_change_sequence(User.__table__)
@@ -0,0 +1,49 @@
+from app import db
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, DDL, event
+
+
+class UserArchive(db.Model):
+    """Usuários desabilitados há mais tempo que a retenção, fora da tabela users"""
+
+    __tablename__ = 'users_archive'
+
+    #Mesmo shema de users (o id original é preservado) mais a data do arquivamento
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    email = Column(String(120), unique=True, nullable=False)
+    phone = Column(String(20), unique=True, nullable=True)
+    enabled = Column(Boolean, default=False)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, index=True)
+
+    def __repr__(self):
+        return f'<UserArchive {self.name} ({self.email})>'
+
+
+# Email e telefone continuam únicos considerando os usuários arquivados.
+# A mensagem segue o formato do SQLite para UNIQUE, então User.unique_violation
+# identifica a coluna da mesma forma que para um conflito dentro de users
+ARCHIVE_UNIQUE_TRIGGERS = {
+    'users_archive_unique_insert': '''
+        CREATE TRIGGER IF NOT EXISTS users_archive_unique_insert BEFORE INSERT ON users
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+            WHERE EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+            WHERE new.phone IS NOT NULL AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+        END''',
+    'users_archive_unique_update': '''
+        CREATE TRIGGER IF NOT EXISTS users_archive_unique_update BEFORE UPDATE OF email, phone ON users
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+            WHERE new.email IS NOT old.email AND EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+            WHERE new.phone IS NOT old.phone AND new.phone IS NOT NULL
+              AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+        END''',
+}
+
+for name, statement in ARCHIVE_UNIQUE_TRIGGERS.items():
+    event.listen(UserArchive.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(UserArchive.__table__, 'before_drop', DDL(f'DROP TRIGGER IF EXISTS {name}').execute_if(dialect='sqlite'))
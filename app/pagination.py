@@ -0,0 +1,46 @@
+"""
+Utilitários de paginação por cursor (keyset)
+"""
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+#Codifica a posição da última linha da página em um token opaco
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+#Decodifica o token gerado por encode_cursor
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding)
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Cursor inválido')
+
+    if not isinstance(values, dict):
+        raise InvalidCursor('Cursor inválido')
+
+    return values
+
+
+#Lê e valida o parâmetro ?limit= respeitando o máximo configurado
+def parse_limit(value, default, maximum):
+    if value is None or value == '':
+        return default
+
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Parâmetro limit deve ser um número inteiro')
+
+    if limit < 1:
+        raise ValueError('Parâmetro limit deve ser maior que zero')
+
+    return min(limit, maximum)
@@ -0,0 +1,47 @@
+"""
+Roteamento de leituras para a réplica somente leitura (bind 'replica')
+
+As rotas marcadas com @read_replica enviam seus SELECTs para o engine do bind
+'replica' (SQLALCHEMY_BINDS). Escritas, flushes e qualquer leitura depois de
+uma escrita na mesma sessão (a sessão vive uma requisição) ficam no primário.
+Sem o bind configurado, tudo continua no banco principal.
+"""
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sessão do Flask-SQLAlchemy que escolhe entre primário e réplica por instrução"""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self.uses_primary = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.uses_primary:
+            if self._flushing or isinstance(clause, sa.UpdateBase):
+                # A partir da primeira escrita a sessão não volta para a réplica
+                self.uses_primary = True
+            elif isinstance(clause, sa.Select) and g.get('use_replica'):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+#Marca a rota como somente leitura: os SELECTs dela podem ir para a réplica
+#(read_only também define a classe da rota no controle de admissão)
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+
+    wrapper.read_only = True
+    return wrapper
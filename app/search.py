@@ -0,0 +1,101 @@
+"""
+Busca textual de usuários por nome e email (índice FTS5 do SQLite)
+
+users_fts é uma tabela FTS5 de conteúdo externo: guarda só o índice invertido
+e lê o texto de users pelo rowid. Apenas usuários habilitados são indexados;
+os triggers mantêm o índice em dia na criação, atualização, desativação e
+reativação, inclusive nos INSERTs em lote feitos direto na tabela.
+"""
+import re
+
+from sqlalchemy import DDL, and_, column, event, func, literal_column, or_, select, table
+
+FTS_TABLE = 'users_fts'
+
+# Pesos do bm25 por coluna: nome vale mais que email
+RANK_WEIGHTS = (2.0, 1.0)
+
+MAX_TERMS = 8
+
+CREATE_STATEMENTS = (
+    # prefix='2 3' cria índices extras para prefixos curtos (busca enquanto digita)
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, email,
+        content='users', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_insert AFTER INSERT ON users
+    WHEN new.enabled BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_delete AFTER DELETE ON users
+    WHEN old.enabled BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_after_update AFTER UPDATE OF name, email, enabled ON users
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email)
+            SELECT 'delete', old.id, old.name, old.email WHERE old.enabled;
+        INSERT INTO {FTS_TABLE}(rowid, name, email)
+            SELECT new.id, new.name, new.email WHERE new.enabled;
+    END""",
+)
+
+# Reconstrói o índice a partir dos usuários habilitados
+REBUILD_STATEMENTS = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"INSERT INTO {FTS_TABLE}(rowid, name, email) SELECT id, name, email FROM users WHERE enabled",
+)
+
+DROP_STATEMENTS = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_after_update',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_after_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_after_insert',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+fts = table(FTS_TABLE, column('rowid'))
+rank = func.bm25(literal_column(FTS_TABLE), *RANK_WEIGHTS)
+
+
+#Cria o índice junto com a tabela users no db.create_all() (somente SQLite)
+def install_search_index(users_table):
+    for statement in CREATE_STATEMENTS:
+        event.listen(users_table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in DROP_STATEMENTS:
+        event.listen(users_table, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def rebuild_search_index(connection):
+    for statement in REBUILD_STATEMENTS:
+        connection.exec_driver_sql(statement)
+
+
+#Converte o texto digitado em uma consulta FTS5 segura: cada palavra vira um
+#prefixo entre aspas ("joa"* "silv"*), todas obrigatórias
+def build_match_query(text):
+    terms = re.findall(r'\w+', (text or '').lower())
+    if not terms:
+        raise ValueError('Parâmetro q é obrigatório')
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f'Parâmetro q aceita no máximo {MAX_TERMS} palavras')
+
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+#Monta o SELECT ranqueado (bm25) com keyset em (rank, id)
+def search_statement(users_table, columns, text, after=None):
+    id_column = users_table.c.id
+    stmt = (
+        select(rank.label('rank'), *columns)
+        .select_from(fts.join(users_table, id_column == fts.c.rowid))
+        .where(literal_column(FTS_TABLE).op('MATCH')(build_match_query(text)))
+        .where(users_table.c.enabled == True)
+    )
+    if after is not None:
+        after_rank, after_id = after
+        stmt = stmt.where(or_(rank > after_rank, and_(rank == after_rank, id_column > after_id)))
+
+    return stmt.order_by(rank, id_column)
+
@@ -0,0 +1,323 @@
+"""
+Servidor de produção com pre-fork
+
+O processo mestre cria a aplicação uma única vez (create_app), abre o socket de
+escuta e faz fork dos workers, que herdam o socket e aceitam conexões dele.
+Antes de sinalizar que está pronto, cada worker descarta as conexões herdadas do
+mestre, abre as suas próprias e carrega no cache os usuários alterados mais
+recentemente.
+
+Sinais do mestre:
+    SIGHUP          troca os workers um por um: o novo só entra quando está
+                    pronto e o antigo termina as requisições em andamento
+    SIGTERM/SIGINT  encerra os workers de forma graciosa e sai
+
+Um worker que morre fora de um reload é substituído.
+
+Com mais de um worker o cache de usuários precisa ser compartilhado
+(USER_CACHE_BACKEND): o LRU em processo de cada worker não veria as
+invalidações feitas pelos outros, então nesse caso ele é desligado.
+"""
+import errno
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from sqlalchemy import select as sql_select
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+logger = logging.getLogger('app.server')
+
+# Sinais tratados pelo mestre (os demais mantêm o comportamento padrão)
+MASTER_SIGNALS = (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD)
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """Handler sem a linha de log por requisição (o log estruturado fica em app.requests)"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def create_listener(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+#Descarta o pool de conexões de todos os engines da aplicação.
+#close=False no filho: as conexões herdadas pertencem ao processo pai
+def dispose_engines(app, close=True):
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+#Abre as conexões do worker (aplicando os PRAGMAs) e carrega no cache os usuários
+#alterados mais recentemente
+def warmup(app):
+    from app import db, user_cache
+    from app.services.users import USER_COLUMNS, serialize_user
+    from app.models.user import User
+
+    config = app.config
+    with app.app_context():
+        for engine in db.engines.values():
+            connections = [engine.connect() for _ in range(config['SERVER_WARMUP_CONNECTIONS'])]
+            for connection in connections:
+                connection.exec_driver_sql('SELECT 1')
+                connection.close()
+
+        backend = user_cache.backend
+        count = config['SERVER_WARMUP_CACHE_USERS']
+        if backend is not None and count:
+            rows = db.session.execute(
+                sql_select(*USER_COLUMNS)
+                .where(User.updated_at.is_not(None))
+                .order_by(User.updated_at.desc())
+                .limit(count)
+            ).all()
+            backend.set_many({user_cache.key_prefix + row.phone: serialize_user(row) for row in rows if row.phone})
+        db.session.remove()
+
+
+#Desliga o cache em processo (LRU) quando há mais de um worker: uma escrita só
+#invalida o cache do worker que a atendeu e os demais serviriam dados antigos
+def check_user_cache(app, worker_count):
+    from app.cache import LRUCache
+
+    if worker_count > 1 and isinstance(app.extensions.get('user_cache'), LRUCache):
+        app.extensions['user_cache'] = None
+        logger.warning('Cache de usuários em processo desligado com %s workers; '
+                       'configure um USER_CACHE_BACKEND compartilhado para usá-lo', worker_count)
+
+
+class Worker:
+    """Processo filho: atende o socket herdado até receber SIGTERM"""
+
+    def __init__(self, app, listener, ready_fd):
+        self.app = app
+        self.listener = listener
+        self.ready_fd = ready_fd
+        self.server = None
+
+    def run(self):
+        for signum in MASTER_SIGNALS:
+            signal.signal(signum, signal.SIG_DFL)
+        # Ctrl+C chega a todo o grupo de processos; quem encerra os workers é o mestre
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, self.handle_term)
+
+        dispose_engines(self.app, close=False)
+        warmup(self.app)
+
+        host, port = self.listener.getsockname()[:2]
+        self.server = make_server(host, port, self.app, threaded=True,
+                                  request_handler=WorkerRequestHandler, fd=self.listener.fileno())
+        # Threads não daemon: server_close() espera as requisições em andamento
+        self.server.daemon_threads = False
+        self.server.block_on_close = True
+
+        os.write(self.ready_fd, b'1')
+        os.close(self.ready_fd)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.shutdown_extensions()
+
+    #serve_forever roda nesta thread: o shutdown precisa vir de outra
+    def handle_term(self, signum, frame):
+        if self.server is None:
+            sys.exit(0)
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def shutdown_extensions(self):
+        state = self.app.extensions.get('group_commit')
+        writer = state.writer if state is not None else None
+        if writer is not None and writer.pid == os.getpid():
+            writer.close()
+        dispose_engines(self.app)
+
+
+class PreforkServer:
+    """Processo mestre: faz fork dos workers, troca-os no SIGHUP e os substitui se morrerem"""
+
+    def __init__(self, app, bind=None, workers=None):
+        config = app.config
+        self.app = app
+        self.host, self.port = parse_bind(bind or config['SERVER_BIND'])
+        self.worker_count = workers or config['SERVER_WORKERS'] or os.cpu_count() or 1
+        check_user_cache(app, self.worker_count)
+        self.backlog = config['SERVER_BACKLOG']
+        self.graceful_timeout = config['SERVER_GRACEFUL_TIMEOUT']
+        self.warmup_timeout = config['SERVER_WARMUP_TIMEOUT']
+        self.workers = set()
+        self.listener = None
+        self.stopping = False
+        self.signals = []
+        self.wakeup_r = self.wakeup_w = None
+
+    def run(self):
+        self.listener = create_listener(self.host, self.port, self.backlog)
+        # Nenhuma conexão do mestre pode ser herdada pelos workers
+        dispose_engines(self.app)
+
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        for signum in MASTER_SIGNALS:
+            signal.signal(signum, self.handle_signal)
+
+        logger.info('Mestre %s escutando em %s:%s com %s workers',
+                    os.getpid(), self.host, self.listener.getsockname()[1], self.worker_count)
+        try:
+            for _ in range(self.worker_count):
+                if self.spawn() is None:
+                    raise RuntimeError('Worker não ficou pronto durante o warmup')
+            self.loop()
+        finally:
+            self.stop()
+            self.listener.close()
+
+    def handle_signal(self, signum, frame):
+        self.signals.append(signum)
+        try:
+            os.write(self.wakeup_w, b'.')
+        except BlockingIOError:
+            pass
+
+    def loop(self):
+        while not self.stopping:
+            try:
+                select.select([self.wakeup_r], [], [], 1.0)
+                os.read(self.wakeup_r, 1024)
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                if e.errno != errno.EINTR:
+                    raise
+
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reload()
+                elif signum in (signal.SIGTERM, signal.SIGINT):
+                    self.stopping = True
+            if not self.stopping:
+                self.reap()
+                self.manage()
+
+    #Faz fork de um worker e espera o warmup; devolve o pid ou None se não ficou pronto
+    def spawn(self):
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(self.wakeup_r)
+            os.close(self.wakeup_w)
+            code = 0
+            try:
+                Worker(self.app, self.listener, ready_w).run()
+            except SystemExit as e:
+                code = e.code or 0
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+
+        os.close(ready_w)
+        try:
+            ready, _, _ = select.select([ready_r], [], [], self.warmup_timeout)
+            ready = bool(ready) and os.read(ready_r, 1) == b'1'
+        finally:
+            os.close(ready_r)
+
+        if not ready:
+            logger.error('Worker %s não ficou pronto em %ss', pid, self.warmup_timeout)
+            self.stop_worker(pid, graceful=False)
+            return None
+
+        self.workers.add(pid)
+        logger.info('Worker %s pronto', pid)
+        return pid
+
+    #Troca os workers um por um: o novo entra antes de o antigo sair
+    def reload(self):
+        logger.info('Reload: trocando %s workers', len(self.workers))
+        for pid in list(self.workers):
+            if self.spawn() is None:
+                logger.error('Reload interrompido; os workers atuais continuam atendendo')
+                return
+            self.workers.discard(pid)
+            self.stop_worker(pid)
+
+    #SIGTERM e espera as requisições em andamento (até SERVER_GRACEFUL_TIMEOUT)
+    def stop_worker(self, pid, graceful=True):
+        try:
+            os.kill(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+        except ProcessLookupError:
+            return
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while True:
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if finished:
+                return
+            if time.monotonic() > deadline:
+                logger.warning('Worker %s não terminou em %ss; encerrando', pid, self.graceful_timeout)
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                return
+            time.sleep(0.05)
+
+    #Recolhe os workers que morreram sozinhos e os substitui
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                logger.warning('Worker %s saiu (status %s); iniciando outro', pid, status)
+
+    #Completa o número de workers (um worker que não sobe é tentado de novo no próximo ciclo)
+    def manage(self):
+        while len(self.workers) < self.worker_count:
+            if self.spawn() is None:
+                return
+
+    def stop(self):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+            self.workers.discard(pid)
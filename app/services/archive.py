@@ -0,0 +1,86 @@
+"""
+Arquivamento de usuários desabilitados há muito tempo (tabela users_archive)
+
+Os usuários são movidos em lotes curtos (INSERT ... SELECT + DELETE por lote,
+cada um em sua transação), então o lock de escrita nunca fica preso pelo
+arquivamento inteiro. restore_user e bulk-restore trazem o usuário de volta.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from app import db
+from app.models.user import User
+from app.models.user_archive import UserArchive
+
+USER_FIELDS = User.SERIALIZABLE_FIELDS
+
+
+#Move para users_archive os usuários desabilitados cujo updated_at é anterior a
+#cutoff, em lotes de batch_size (keyset em id). Devolve o total arquivado
+def archive_disabled_users(cutoff, batch_size, on_batch=None):
+    from app import user_cache
+
+    users = User.__table__
+    archive = UserArchive.__table__
+    eligible = (users.c.enabled == False, users.c.updated_at < cutoff)
+    archived = 0
+    last_id = 0
+
+    while True:
+        ids = db.session.execute(
+            select(users.c.id)
+            .where(*eligible, users.c.id > last_id)
+            .order_by(users.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return archived
+
+        # A condição é repetida no DELETE: quem foi reativado depois do SELECT fica
+        # em users. Só as linhas efetivamente removidas vão para o arquivo
+        rows = db.session.execute(
+            delete(users).where(users.c.id.in_(ids), *eligible)
+            .returning(*[users.c[field] for field in USER_FIELDS])
+        ).all()
+        if rows:
+            archived_at = datetime.utcnow()
+            db.session.execute(insert(archive), [dict(row._mapping, archived_at=archived_at) for row in rows])
+        db.session.commit()
+        # Sem isso o GET por telefone continuaria servindo o usuário arquivado do cache
+        user_cache.invalidate(*(row.phone for row in rows))
+
+        archived += len(rows)
+        last_id = ids[-1]
+        if on_batch:
+            on_batch(archived)
+
+
+def retention_cutoff(days):
+    return datetime.utcnow() - timedelta(days=days)
+
+
+#Traz de volta (habilitados) os usuários arquivados com os telefones informados.
+#Roda na conexão da operação de escrita; devolve as linhas restauradas de users
+def unarchive_by_phones(connection, phones, returning):
+    users = User.__table__
+    archive = UserArchive.__table__
+
+    rows = connection.execute(
+        delete(archive).where(archive.c.phone.in_(phones)).returning(*[archive.c[field] for field in USER_FIELDS])
+    ).all()
+    if not rows:
+        return []
+
+    # Com AUTOINCREMENT (migração 0005) o id do arquivado não é reutilizado:
+    # o usuário volta sempre com o id original
+    now = datetime.utcnow()
+    connection.execute(insert(users), [dict(row._mapping, enabled=True, updated_at=now) for row in rows])
+    return connection.execute(
+        select(*returning).where(users.c.id.in_([row.id for row in rows])).order_by(users.c.id)
+    ).all()
+
+
+def archived_phones(connection, phones):
+    archive = UserArchive.__table__
+    return set(connection.execute(select(archive.c.phone).where(archive.c.phone.in_(phones))).scalars())
@@ -0,0 +1,240 @@
+"""
+Operações em lote: criação (validação, detecção de duplicados por conjunto e
+inserção com executemany) e desativação/reativação com UPDATEs por conjunto
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import insert, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.user import User
+from app.models.user_archive import UserArchive
+from app.services.archive import archived_phones, unarchive_by_phones
+
+# Limite conservador de parâmetros por instrução no SQLite (SQLITE_MAX_VARIABLE_NUMBER antigo)
+SQLITE_MAX_PARAMS = 999
+
+REQUIRED_FIELDS = ['name', 'email', 'phone']
+
+MSG_EMAIL_IN_USE = 'Email já está em uso'
+MSG_PHONE_IN_USE = 'Telefone já cadastrado'
+
+
+class MalformedLine:
+    """Linha do NDJSON que não é JSON válido: rejeitada sem interromper o lote"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+#Decodifica uma linha de NDJSON (API e flask users import)
+def parse_json_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return MalformedLine(f'JSON inválido: {e}')
+
+
+#Divide uma sequência em pedaços de no máximo size elementos
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+#Valida uma linha com as regras do modelo User e devolve os valores normalizados
+def validate_row(data):
+    if not isinstance(data, dict):
+        raise ValueError('Cada usuário deve ser um objeto JSON')
+
+    for field in REQUIRED_FIELDS:
+        if field not in data or not data[field]:
+            raise ValueError(f'Campo {field} é obrigatório')
+        # Os validadores do modelo assumem texto (123.strip() seria AttributeError)
+        if not isinstance(data[field], str):
+            raise ValueError(f'Campo {field} deve ser texto')
+
+    return User.normalize(data)
+
+
+#Busca, em uma única consulta por pedaço, quais emails e telefones já existem
+#(em users ou em users_archive, que também contam para a unicidade)
+def find_existing(emails, phones):
+    existing_emails = set()
+    existing_phones = set()
+    size = SQLITE_MAX_PARAMS // 4
+
+    emails = list(emails)
+    phones = list(phones)
+    for start in range(0, max(len(emails), len(phones)), size):
+        email_chunk = emails[start:start + size]
+        phone_chunk = phones[start:start + size]
+        stmt = union_all(*(
+            select(table.c.email, table.c.phone).where(or_(
+                table.c.email.in_(email_chunk),
+                table.c.phone.in_(phone_chunk)
+            ))
+            for table in (User.__table__, UserArchive.__table__)
+        ))
+        for email, phone in db.session.execute(stmt):
+            existing_emails.add(email)
+            existing_phones.add(phone)
+
+    return existing_emails, existing_phones
+
+
+#Cria um lote de usuários em uma transação e devolve o resultado por linha.
+#rows é uma lista de (índice, dados) para que o chamador preserve a posição original;
+#linhas malformadas (MalformedLine) são rejeitadas sem ir ao banco
+def create_users_batch(rows):
+    results = {}
+    candidates = []
+
+    for index, data in rows:
+        if isinstance(data, MalformedLine):
+            results[index] = {'index': index, 'success': False, 'message': data.message}
+            continue
+        try:
+            candidates.append((index, validate_row(data)))
+        except ValueError as e:
+            results[index] = {'index': index, 'success': False, 'message': str(e)}
+
+    existing_emails, existing_phones = find_existing(
+        (row['email'] for _, row in candidates),
+        (row['phone'] for _, row in candidates if row['phone'])
+    )
+
+    # Duplicados no banco ou repetidos dentro do próprio lote
+    to_insert = []
+    for index, row in candidates:
+        if row['email'] in existing_emails:
+            results[index] = {'index': index, 'success': False, 'message': MSG_EMAIL_IN_USE}
+            continue
+        if row['phone'] and row['phone'] in existing_phones:
+            results[index] = {'index': index, 'success': False, 'message': MSG_PHONE_IN_USE}
+            continue
+
+        existing_emails.add(row['email'])
+        if row['phone']:
+            existing_phones.add(row['phone'])
+        to_insert.append((index, row))
+
+    if to_insert:
+        try:
+            ids = _insert_rows([row for _, row in to_insert])
+            db.session.commit()
+        except IntegrityError:
+            # Outra transação inseriu um dos valores depois da verificação:
+            # refaz o lote linha a linha para isolar os conflitos
+            db.session.rollback()
+            ids = _insert_rows_one_by_one(to_insert, results)
+            db.session.commit()
+
+        for (index, _), user_id in zip(to_insert, ids):
+            if user_id is not None:
+                results[index] = {'index': index, 'success': True, 'id': user_id}
+
+    return [results[index] for index, _ in rows]
+
+
+#Insere com um único executemany e busca os ids gerados pelo email (único).
+#RETURNING com ordem garantida faria o SQLite voltar a um INSERT por linha
+def _insert_rows(rows):
+    db.session.execute(insert(User.__table__), rows)
+
+    ids_by_email = {}
+    for email_chunk in chunked([row['email'] for row in rows], SQLITE_MAX_PARAMS):
+        stmt = select(User.email, User.id).where(User.email.in_(email_chunk))
+        ids_by_email.update(db.session.execute(stmt).all())
+
+    return [ids_by_email[row['email']] for row in rows]
+
+
+def _insert_rows_one_by_one(to_insert, results):
+    ids = []
+    for index, row in to_insert:
+        try:
+            with db.session.begin_nested():
+                ids.append(db.session.execute(
+                    insert(User.__table__).returning(User.__table__.c.id), row
+                ).scalar_one())
+        except IntegrityError as e:
+            message = MSG_PHONE_IN_USE if User.unique_violation(e) == 'phone' else MSG_EMAIL_IN_USE
+            results[index] = {'index': index, 'success': False, 'message': message}
+            ids.append(None)
+    return ids
+
+
+#Desativa/reativa os usuários dos telefones com um UPDATE ... IN (...) por pedaço.
+#Cada pedaço é confirmado em seguida, sem segurar o lock de escrita pelo lote inteiro.
+#Devolve (telefones alterados, telefones já no estado pedido, telefones inexistentes)
+def set_enabled_by_phones(phones, enabled):
+    table = User.__table__
+    phones = list(dict.fromkeys(phones))
+    updated = []
+    unchanged = []
+
+    # 3 parâmetros fixos: enabled e updated_at do SET e o enabled do WHERE
+    for chunk in chunked(phones, SQLITE_MAX_PARAMS - 3):
+        stmt = (
+            update(table)
+            .where(table.c.phone.in_(chunk), table.c.enabled != enabled)
+            .values(enabled=enabled, updated_at=datetime.utcnow())
+            .returning(table.c.phone)
+        )
+        changed = set(db.session.execute(stmt).scalars())
+        db.session.commit()
+        updated.extend(phone for phone in chunk if phone in changed)
+
+        # Só os que não mudaram precisam ser conferidos (já no estado ou inexistentes)
+        rest = [phone for phone in chunk if phone not in changed]
+        if rest:
+            existing = set(db.session.execute(select(table.c.phone).where(table.c.phone.in_(rest))).scalars())
+            unchanged.extend(phone for phone in rest if phone in existing)
+
+            # Os que não estão em users podem estar arquivados (desabilitados):
+            # a reativação os traz de volta; a desativação não tem o que fazer
+            missing = [phone for phone in rest if phone not in existing]
+            if missing:
+                if enabled:
+                    restored = unarchive_by_phones(db.session.connection(), missing, [table.c.phone])
+                    db.session.commit()
+                    updated.extend(row.phone for row in restored)
+                else:
+                    unchanged.extend(archived_phones(db.session.connection(), missing))
+
+    updated_set = set(updated)
+    unchanged_set = set(unchanged)
+    unknown = [phone for phone in phones if phone not in updated_set and phone not in unchanged_set]
+    return updated, unchanged, unknown
+
+
+#Desativa/reativa os usuários criados antes de created_before, percorrendo a
+#chave primária em pedaços de batch_size (keyset em id, uma passada na tabela).
+#Devolve os telefones alterados
+def set_enabled_created_before(created_before, enabled, batch_size):
+    table = User.__table__
+    updated = []
+    last_id = 0
+
+    while True:
+        ids = (
+            select(table.c.id)
+            .where(table.c.id > last_id, table.c.created_at < created_before, table.c.enabled != enabled)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        stmt = (
+            update(table)
+            .where(table.c.id.in_(ids))
+            .values(enabled=enabled, updated_at=datetime.utcnow())
+            .returning(table.c.id, table.c.phone)
+        )
+        rows = db.session.execute(stmt).all()
+        db.session.commit()
+        if not rows:
+            return updated
+
+        updated.extend(phone for _, phone in rows)
+        last_id = max(user_id for user_id, _ in rows)
@@ -0,0 +1,42 @@
+"""
+Consulta de vários usuários por telefone ou email em uma requisição
+"""
+from sqlalchemy import select
+
+from app import db, user_cache
+from app.models.user import User
+from app.services.bulk import SQLITE_MAX_PARAMS, chunked
+
+COLUMNS = [User.__table__.c[field] for field in User.SERIALIZABLE_FIELDS]
+
+
+#Busca as linhas cuja coluna está em values, um IN (...) por pedaço
+#(respeitando o limite de parâmetros do SQLite) e devolve {valor: to_dict()}
+def fetch_by(column, values):
+    serialize = User.row_serializer(User.SERIALIZABLE_FIELDS)
+    position = User.SERIALIZABLE_FIELDS.index(column.key)
+    found = {}
+    for chunk in chunked(values, SQLITE_MAX_PARAMS):
+        for row in db.session.execute(select(*COLUMNS).where(column.in_(chunk))):
+            found[row[position]] = serialize(row)
+    return found
+
+
+#Resolve telefones (passando pelo cache) e emails; devolve (encontrados, ausentes)
+#com as chaves exatamente como recebidas
+def resolve_users(phones=(), emails=()):
+    phones = list(dict.fromkeys(phones))
+    emails = list(dict.fromkeys(emails))
+    found = {}
+
+    if phones:
+        by_phone = user_cache.get_many_or_load(phones, lambda missing: fetch_by(User.__table__.c.phone, missing))
+        found.update((phone, by_phone[phone]) for phone in phones if phone in by_phone)
+
+    if emails:
+        # Emails são gravados em minúsculas (validate_email)
+        by_email = fetch_by(User.__table__.c.email, list({email.lower() for email in emails}))
+        found.update((email, by_email[email.lower()]) for email in emails if email.lower() in by_email)
+
+    missing = [key for key in phones + emails if key not in found]
+    return found, missing
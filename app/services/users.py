@@ -0,0 +1,418 @@
+"""
+Operações de /api/users compartilhadas pelos modos WSGI (controllers) e ASGI
+
+Cada operação valida a entrada, monta as instruções e devolve um Result
+(payload, status e validadores HTTP). O que muda entre os modos é só o
+UserStore: a sessão das leituras (a RoutingSession do Flask-SQLAlchemy ou a
+sessão síncrona por trás da AsyncSession) e o executor das escritas (group
+commit ou a transação da própria sessão).
+"""
+import importlib
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+from app import user_cache
+from app.conditional import http_datetime, make_etag
+from app.group_commit import GroupCommitTimeout
+from app.models.user import User
+from app.models.user_archive import UserArchive
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from app.search import search_statement
+from app.services.archive import archived_phones, unarchive_by_phones
+
+# Colunas devolvidas pelos INSERT/UPDATE ... RETURNING, na ordem do to_dict
+USER_COLUMNS = [User.__table__.c[field] for field in User.SERIALIZABLE_FIELDS]
+serialize_user = User.row_serializer(User.SERIALIZABLE_FIELDS)
+
+# INSERT com suporte a ON CONFLICT por dialeto. O módulo é importado no primeiro
+# uso: o do PostgreSQL sozinho custa ~25 ms na subida de um serviço em SQLite
+UPSERT_INSERTS = {
+    'sqlite': 'sqlalchemy.dialects.sqlite',
+    'postgresql': 'sqlalchemy.dialects.postgresql'
+}
+
+# Mensagem das respostas 500 por endpoint
+ERROR_MESSAGES = {
+    'users.get_users': 'Erro ao buscar usuários',
+    'users.get_changes': 'Erro ao buscar alterações',
+    'users.search_users': 'Erro ao buscar usuários',
+    'users.get_user': 'Erro ao buscar usuário',
+    'users.create_user': 'Erro ao criar usuário',
+    'users.update_user': 'Erro ao atualizar usuário',
+    'users.delete_user': 'Erro ao remover usuário',
+    'users.restore_user': 'Erro ao reativar usuário',
+}
+
+
+def upsert_insert(dialect_name):
+    return importlib.import_module(UPSERT_INSERTS[dialect_name]).insert
+
+
+#Serialização JSON compacta, sem ordenar chaves (caminho rápido das listagens)
+def dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+class Result:
+    """Resposta de uma operação; com etag, o modo responde 304 às requisições condicionais
+
+    payload pode ser uma função que monta o corpo: ela só é chamada no primeiro
+    acesso a payload, depois da verificação de frescor, e o 304 não serializa nada.
+    """
+
+    __slots__ = ('_payload', 'status', 'etag', 'last_modified')
+
+    def __init__(self, payload, status=200, etag=None, last_modified=None):
+        self._payload = payload
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def payload(self):
+        if callable(self._payload):
+            self._payload = self._payload()
+        return self._payload
+
+
+def error(message, status):
+    return Result({'success': False, 'message': message}, status)
+
+
+class UserStore:
+    """Acesso ao banco de uma requisição: session para as leituras e write(op) para as escritas
+
+    write recebe uma operação op(connection), a executa em uma transação e
+    devolve o resultado (ou propaga a exceção da operação).
+    """
+
+    def __init__(self, session, write, dialect_name):
+        self.session = session
+        self.write = write
+        self.dialect_name = dialect_name
+
+
+#Executa a operação; ValueError vira 400, a escrita que esgotou a espera no
+#group commit vira 503 e as demais exceções, 500
+def run_operation(endpoint, store, operation, *args, **kwargs):
+    try:
+        return operation(store, *args, **kwargs)
+    except ValueError as e:
+        return error(str(e), 400)
+    except GroupCommitTimeout as e:
+        return error(str(e), 503)
+    except Exception as e:
+        store.session.rollback()
+        return error(f'{ERROR_MESSAGES[endpoint]}: {str(e)}', 500)
+
+
+def page_limit(args):
+    config = current_app.config
+    return parse_limit(args.get('limit'), config['USERS_PER_PAGE'], config['MAX_USERS_PER_PAGE'])
+
+
+#Usuários habilitados (enabled=true), paginados por cursor (id)
+def get_all_users(store, args):
+    limit = page_limit(args)
+    fields = User.parse_fields(args.get('fields'))
+
+    # Seleciona só as colunas necessárias, sem montar objetos ORM.
+    # id e updated_at são sempre lidos: id para o cursor e updated_at para o ETag
+    columns = tuple(dict.fromkeys(('id', 'updated_at') + fields))
+    stmt = select(*[getattr(User, column) for column in columns]).where(User.enabled == True)
+
+    # Keyset: continua a partir do último id da página anterior,
+    # o custo da página não depende da profundidade
+    cursor = args.get('cursor')
+    if cursor:
+        after_id = decode_cursor(cursor).get('id')
+        # bool é subclasse de int: true/false não são ids válidos
+        if type(after_id) is not int:
+            raise InvalidCursor('Cursor inválido')
+        stmt = stmt.where(User.id > after_id)
+
+    # Busca um registro a mais para saber se existe próxima página
+    rows = store.session.execute(stmt.order_by(User.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor({'id': rows[-1].id}) if has_more else None
+
+    # Versão agregada da página: muda se qualquer usuário da página mudar.
+    # Sem Last-Modified: remover um usuário não altera o max(updated_at) da página
+    etag = make_etag('users', limit, cursor, next_cursor, ','.join(fields),
+                     *(f'{row.id}:{row.updated_at}' for row in rows))
+
+    # A página só é serializada se o cliente não tiver a versão atual (sem 304)
+    serialize = User.row_serializer(fields, columns)
+    return Result(lambda: {
+        'success': True,
+        'data': [serialize(row) for row in rows],
+        'count': len(rows),
+        'next_cursor': next_cursor
+    }, etag=etag)
+
+
+#Feed de alterações: usuários criados, alterados, desativados ou reativados
+#desde o cursor, em ordem de change_seq (ordem de commit), incluindo enabled=false
+def get_changes(store, args):
+    limit = page_limit(args)
+    fields = User.parse_fields(args.get('fields'))
+    columns = ('change_seq',) + fields
+
+    # Keyset em change_seq, servido pelo índice ix_users_change_seq. O valor é
+    # atribuído na transação de escrita: nenhuma alteração confirmada depois
+    # fica atrás de um cursor já entregue (ver app/changes.py)
+    after = 0
+    since = args.get('since')
+    if since:
+        after = decode_cursor(since).get('seq')
+        # bool é subclasse de int: true/false não são posições válidas
+        if type(after) is not int:
+            raise InvalidCursor('Cursor inválido')
+
+    stmt = select(*[getattr(User, column) for column in columns]).where(User.change_seq > after)
+    rows = store.session.execute(stmt.order_by(User.change_seq).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Sem alterações novas o cursor recebido é devolvido, para continuar consultando dele
+    next_cursor = since or None
+    if rows:
+        next_cursor = encode_cursor({'seq': rows[-1].change_seq})
+
+    serialize = User.row_serializer(fields, columns)
+    return Result({
+        'success': True,
+        'data': [serialize(row) for row in rows],
+        'count': len(rows),
+        'has_more': has_more,
+        'next_cursor': next_cursor
+    })
+
+
+#Usuários habilitados por nome ou email (prefixo), ordenados por relevância
+def search_users(store, args):
+    limit = page_limit(args)
+    fields = User.parse_fields(args.get('fields'))
+    columns = tuple(dict.fromkeys(('id',) + fields))
+
+    # Keyset em (rank, id): continua logo após o último resultado da página anterior
+    after = None
+    cursor = args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        after = (values.get('rank'), values.get('id'))
+        if not isinstance(after[0], float) or type(after[1]) is not int:
+            raise InvalidCursor('Cursor inválido')
+
+    stmt = search_statement(
+        User.__table__,
+        [User.__table__.c[column] for column in columns],
+        args.get('q'),
+        after
+    )
+    rows = store.session.execute(stmt.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor({'rank': rows[-1].rank, 'id': rows[-1].id}) if has_more else None
+
+    serialize = User.row_serializer(fields, ('rank',) + columns)
+    return Result({
+        'success': True,
+        'data': [serialize(row) for row in rows],
+        'count': len(rows),
+        'next_cursor': next_cursor
+    })
+
+
+#Um usuário por telefone, pelo cache; só consulta o banco em caso de miss
+def get_user_by_phone(store, phone):
+    def load_user():
+        row = store.session.execute(select(*USER_COLUMNS).where(User.phone == phone)).first()
+        return serialize_user(row) if row is not None else None
+
+    payload = user_cache.get_or_load(phone, load_user)
+    if not payload:
+        return error(f'Usuário com telefone {phone} não encontrado.', 404)
+
+    return Result({'success': True, 'data': payload},
+                  etag=make_etag('user', payload['id'], payload['updated_at']),
+                  last_modified=http_datetime(payload['updated_at']))
+
+
+def create_user(store, data):
+    if not data:
+        return error('Dados JSON são obrigatórios', 400)
+
+    for field in ['name', 'email', 'phone']:
+        if field not in data or not data[field]:
+            return error(f'Campo {field} é obrigatório', 400)
+
+    # Um único INSERT ... RETURNING: email ou telefone duplicados são
+    # detectados pelas restrições UNIQUE, sem SELECT prévio
+    stmt = insert(User.__table__).values(User.normalize(data)).returning(*USER_COLUMNS)
+    try:
+        row = store.write(lambda connection: connection.execute(stmt).one())
+    except IntegrityError as e:
+        # O SQLite informa só a primeira restrição violada; como o email tem
+        # prioridade na resposta, um conflito de telefone confere também o email
+        # (consulta extra apenas no caminho de erro)
+        email = data['email'].lower()
+        email_in_use = User.unique_violation(e) == 'email' or store.session.execute(union_all(
+            select(User.__table__.c.id).where(User.__table__.c.email == email),
+            select(UserArchive.__table__.c.id).where(UserArchive.__table__.c.email == email)
+        )).first() is not None
+        if email_in_use:
+            return error('Email já está em uso', 409)
+        return error('Erro: Telefone já cadastrado', 409)
+
+    return Result({
+        'success': True,
+        'message': 'Usuário criado com sucesso',
+        'data': serialize_user(row)
+    }, 201)
+
+
+#PUT /users/<phone>: atualização de nome e email ou, com ?upsert=1, criação ou atualização
+def update_user(store, phone, data, args):
+    if args.get('upsert') in ('1', 'true'):
+        return upsert_user_by_phone(store, phone, data)
+    return update_user_by_phone(store, phone, data)
+
+
+def update_user_by_phone(store, phone, data):
+    if not data:
+        return error('Dados JSON são obrigatórios', 400)
+
+    # Atualizar apenas nome e email (se forem informados)
+    values = {'updated_at': datetime.utcnow()}
+    if 'name' in data:
+        values['name'] = User.validate_name(None, 'name', data['name'])
+    if 'email' in data:
+        values['email'] = User.validate_email(None, 'email', data['email'])
+
+    # Um único UPDATE ... RETURNING: o email em uso por outro usuário
+    # é detectado pela restrição UNIQUE
+    stmt = (
+        update(User.__table__)
+        .where(User.__table__.c.phone == phone)
+        .values(values)
+        .returning(*USER_COLUMNS)
+    )
+    try:
+        row = store.write(lambda connection: connection.execute(stmt).first())
+    except IntegrityError as e:
+        if User.unique_violation(e) == 'email':
+            return error('E-mail já cadastrado', 409)
+        return error('Erro de integridade: e-mail já existe', 409)
+
+    if row is None:
+        return error(f'Usuário com telefone {phone} não encontrado', 404)
+
+    user_cache.invalidate(phone)
+    return Result({
+        'success': True,
+        'message': 'Usuário atualizado com sucesso',
+        'data': serialize_user(row)
+    })
+
+
+#Cria ou atualiza o usuário do telefone de forma atômica
+def upsert_user_by_phone(store, phone, data):
+    if not data:
+        return error('Dados JSON são obrigatórios', 400)
+
+    for field in ['name', 'email']:
+        if field not in data or not data[field]:
+            return error(f'Campo {field} é obrigatório', 400)
+
+    values = User.normalize({**data, 'phone': phone})
+
+    # INSERT ... ON CONFLICT(phone) DO UPDATE: na atualização mantém
+    # enabled e created_at e troca só nome, email e updated_at
+    stmt = upsert_insert(store.dialect_name)(User.__table__).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.__table__.c.phone],
+        set_={
+            'name': stmt.excluded.name,
+            'email': stmt.excluded.email,
+            'updated_at': stmt.excluded.updated_at
+        }
+    ).returning(*USER_COLUMNS)
+    try:
+        row = store.write(lambda connection: connection.execute(stmt).one())
+    except IntegrityError as e:
+        # O conflito de telefone vira UPDATE; o telefone só colide aqui
+        # com um usuário arquivado
+        if User.unique_violation(e) == 'phone':
+            return error('Usuário arquivado; reative-o antes de atualizar', 409)
+        return error('E-mail já cadastrado', 409)
+
+    user_cache.invalidate(phone)
+
+    # Linha nova recebe o created_at enviado; a existente mantém o seu
+    created = row.created_at == values['created_at']
+    return Result({
+        'success': True,
+        'message': 'Usuário criado com sucesso' if created else 'Usuário atualizado com sucesso',
+        'data': serialize_user(row)
+    }, 201 if created else 200)
+
+
+#Desabilita o usuário em um único UPDATE (sem carregar o objeto)
+def delete_user(store, phone):
+    stmt = (
+        update(User.__table__)
+        .where(User.__table__.c.phone == phone)
+        .values(enabled=False, updated_at=datetime.utcnow())
+        .returning(User.__table__.c.id)
+    )
+
+    # Um usuário arquivado já está desabilitado: a remoção não tem o que alterar
+    def disable(connection):
+        row = connection.execute(stmt).first()
+        return row is not None or bool(archived_phones(connection, [phone]))
+
+    if not store.write(disable):
+        return error(f'Usuário com telefone {phone} não encontrado', 404)
+
+    user_cache.invalidate(phone)
+    return Result({'success': True, 'message': 'Usuário removido com sucesso'})
+
+
+#Reativa em um único UPDATE, apenas se o usuário estiver desabilitado
+def restore_user(store, phone):
+    stmt = (
+        update(User.__table__)
+        .where(User.__table__.c.phone == phone, User.__table__.c.enabled == False)
+        .values(enabled=True, updated_at=datetime.utcnow())
+        .returning(*USER_COLUMNS)
+    )
+
+    # Sem linha em users, o usuário pode ter sido arquivado: volta para users
+    # na mesma operação (consulta extra só nesse caso)
+    def restore(connection):
+        row = connection.execute(stmt).first()
+        if row is None:
+            restored = unarchive_by_phones(connection, [phone], USER_COLUMNS)
+            row = restored[0] if restored else None
+        return row
+
+    row = store.write(restore)
+    if row is None:
+        # Nenhuma linha alterada: usuário inexistente ou já ativo
+        exists = store.session.execute(select(User.id).where(User.phone == phone)).first() is not None
+        if not exists:
+            return error(f'Usuário com telefone {phone} não encontrado', 404)
+        return error('Usuário já está ativo', 400)
+
+    user_cache.invalidate(phone)
+    return Result({
+        'success': True,
+        'message': 'Usuário reativado com sucesso',
+        'data': serialize_user(row)
+    })
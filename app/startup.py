@@ -0,0 +1,79 @@
+"""
+Perfil de inicialização (flask users startup-profile)
+
+Mede, em um processo Python novo, o tempo de importar o pacote app e de executar
+create_app(). O processo precisa ser novo: no processo que executa o comando os
+módulos já estão importados e a aplicação já foi criada.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que a subida não deve importar (carregados só pelo flask db)
+DEFERRED_MODULES = ('alembic', 'flask_migrate')
+
+MARKER = '-- startup-profile --'
+
+PROFILE_SCRIPT = f'''
+import json, sys, time
+sys.stderr.write({MARKER!r} + "\\n")
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "schema_auto_create": app.config["SCHEMA_AUTO_CREATE"],
+    "modules": len(sys.modules),
+    "loaded_deferred": sorted(name for name in {DEFERRED_MODULES!r} if name in sys.modules),
+}}))
+'''
+
+
+#Lê a saída do -X importtime: módulos importados pelo pacote app e pelo
+#create_app (dois primeiros níveis), com o tempo acumulado em ms
+def parse_importtime(stderr):
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Uma coluna de espaço e mais dois espaços por nível de aninhamento
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth <= 1 and name != 'app':
+            imports.append((name, int(cumulative_us) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+#Executa o script de perfil runs vezes e devolve a execução mais rápida
+def measure_startup(config_name, runs=1, importtime=False, env=None):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROFILE_SCRIPT, config_name]
+
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if completed.returncode != 0:
+            raise RuntimeError(f'Falha ao criar a aplicação:\n{completed.stderr.split(MARKER)[-1].strip()}')
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        result['total_ms'] = wall_ms
+        # Início e encerramento do interpretador (inclui o site e os imports do próprio Python)
+        result['interpreter_ms'] = wall_ms - result['import_ms'] - result['create_app_ms']
+        if importtime:
+            result['imports'] = parse_importtime(completed.stderr)
+        if best is None or result['total_ms'] < best['total_ms']:
+            best = result
+    return best
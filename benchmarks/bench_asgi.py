@@ -0,0 +1,245 @@
+"""
+Modo ASGI (app/asgi.py, uvicorn) versus WSGI (servidor werkzeug com uma thread
+por conexão) com muitas conexões abertas ao mesmo tempo.
+
+O servidor roda em um subprocesso sobre uma cópia da base populada; o cliente
+(asyncio) abre todas as conexões antes de começar e reporta vazão, latência,
+pico de memória (VmHWM) e de threads do processo servidor. O werkzeug responde
+sempre com Connection: close; nesse caso o cliente reabre a conexão, mantendo o
+mesmo número de requisições em andamento.
+
+Uso: python benchmarks/bench_asgi.py [--connections 1000] [--requests 20000]
+                                      [--scenario get_user] [--dataset 100000]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import make_app, seeded_database
+
+from load import DATA_DIR, percentile
+
+SCENARIOS = {
+    'get_user': lambda i, dataset: ('GET', f'/api/users/{11000000000 + i * 7919 % dataset}', None),
+    'list': lambda i, dataset: ('GET', '/api/users?limit=25', None),
+    'update': lambda i, dataset: ('PUT', f'/api/users/{11000000000 + i % dataset}', b'{"name":"Usuario Atualizado"}'),
+}
+
+
+#Processo servidor: --mode wsgi (werkzeug threaded) ou asgi (uvicorn)
+def serve(mode, db_path, port, backlog):
+    overrides = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'SQL_INSTRUMENTATION': False}
+    if mode == 'asgi':
+        import uvicorn
+
+        from app.asgi import create_asgi_app
+        app = create_asgi_app('production', overrides)
+        uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning', backlog=backlog,
+                    lifespan='on', access_log=False)
+    else:
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        app = make_app(db_path, 'production', SQL_INSTRUMENTATION=False)
+        server = make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler)
+        server.socket.listen(backlog)
+        server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'servidor não respondeu na porta {port}')
+
+
+def proc_status(pid):
+    values = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            values[name] = value.strip()
+    return values
+
+
+#Amostra o número de threads do servidor enquanto a carga roda
+class Sampler(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.max_threads = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(0.05):
+            try:
+                self.max_threads = max(self.max_threads, int(proc_status(self.pid)['Threads']))
+            except (OSError, KeyError, ValueError):
+                return
+
+
+async def open_connection(port):
+    return await asyncio.open_connection('127.0.0.1', port)
+
+
+async def http_request(reader, writer, method, path, body):
+    headers = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+    if body is not None:
+        headers += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(headers.encode() + b'\r\n' + (body or b''))
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('conexão encerrada pelo servidor')
+    length = 0
+    chunked = False
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+        elif name == 'connection' and 'close' in value.lower():
+            keep_alive = False
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return int(status_line.split()[1]), keep_alive
+
+
+async def run_load(port, connections, requests, scenario, dataset):
+    # Todas as conexões ficam abertas durante a medição
+    streams = await asyncio.gather(*(open_connection(port) for _ in range(connections)))
+    counter = iter(range(requests))
+    latencies = []
+    errors = 0
+
+    async def worker(reader, writer):
+        nonlocal errors
+        try:
+            for i in counter:
+                method, path, body = SCENARIOS[scenario](i, dataset)
+                start = time.perf_counter()
+                try:
+                    if reader is None:
+                        reader, writer = await open_connection(port)
+                    status, keep_alive = await http_request(reader, writer, method, path, body)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                    errors += 1
+                    reader = None
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+                if not keep_alive:
+                    writer.close()
+                    reader = None
+        finally:
+            if reader is not None:
+                writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(reader, writer) for reader, writer in streams))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def run(mode, source, work_dir, args):
+    db_path = os.path.join(work_dir, f'{mode}.db')
+    shutil.copyfile(source, db_path)
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--db', db_path,
+                               '--port', str(port), '--backlog', str(args.connections * 2)])
+    try:
+        wait_for_port(port)
+        idle_rss = int(proc_status(server.pid)['VmRSS'].split()[0])
+        sampler = Sampler(server.pid)
+        sampler.start()
+        result = asyncio.run(run_load(port, args.connections, args.requests, args.scenario, args.dataset))
+        sampler.stopped.set()
+        status = proc_status(server.pid)
+        result.update({
+            'idle_rss_mb': round(idle_rss / 1024, 1),
+            'peak_rss_mb': round(int(status['VmHWM'].split()[0]) / 1024, 1),
+            'max_threads': sampler.max_threads,
+        })
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='get_user')
+    parser.add_argument('--dataset', type=int, default=100000)
+    parser.add_argument('--modes', nargs='+', choices=('wsgi', 'asgi'), default=['wsgi', 'asgi'])
+    parser.add_argument('--serve', choices=('wsgi', 'asgi'), help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--backlog', type=int, default=2048, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.db, args.port, args.backlog)
+
+    source = seeded_database(args.dataset, DATA_DIR)
+    work_dir = tempfile.mkdtemp(prefix='crud-user-asgi-')
+    try:
+        print(f'{args.scenario}: {args.connections} conexões abertas, {args.requests} requisições, '
+              f'base com {args.dataset} usuários')
+        for mode in args.modes:
+            result = run(mode, source, work_dir, args)
+            print(f'  {mode:>4}  {result["throughput_rps"]:>8.1f} req/s  p50 {result["p50_ms"]:>8.2f} ms  '
+                  f'p99 {result["p99_ms"]:>8.2f} ms  RSS {result["idle_rss_mb"]:.1f} -> '
+                  f'{result["peak_rss_mb"]:.1f} MB  threads {result["max_threads"]:>5}  '
+                  f'erros {result["errors"]}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Compara a vazão de POST /api/users em laço com POST /api/users/bulk.
+
+Uso: python benchmarks/bench_bulk.py [--rows 5000]
+"""
+import argparse
+import json
+import time
+
+from common import make_app, synthetic_users
+
+
+def payloads(count):
+    return [
+        {'name': row['name'], 'email': row['email'], 'phone': row['phone']}
+        for row in synthetic_users(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    users = payloads(args.rows)
+
+    client = make_app().test_client()
+    start = time.perf_counter()
+    for user in users:
+        response = client.post('/api/users', data=json.dumps(user), content_type='application/json')
+        assert response.status_code == 201, response.data
+    single = args.rows / (time.perf_counter() - start)
+
+    client = make_app().test_client()
+    start = time.perf_counter()
+    response = client.post('/api/users/bulk', data=json.dumps(users), content_type='application/json')
+    bulk = args.rows / (time.perf_counter() - start)
+    assert json.loads(response.data)['created'] == args.rows
+
+    print(f'POST /api/users em laço: {single:>10.0f} usuários/s')
+    print(f'POST /api/users/bulk:    {bulk:>10.0f} usuários/s')
+    print(f'Ganho:                   {bulk / single:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
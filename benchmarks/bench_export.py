@@ -0,0 +1,42 @@
+"""
+Mede o tempo até o primeiro byte e o pico de memória da exportação em streaming.
+
+Uso: python benchmarks/bench_export.py [--rows 200000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from common import make_app, seed_users
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[50000, 200000])
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        app = make_app()
+        seed_users(app, rows)
+        client = app.test_client()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get('/api/users/export?format=ndjson', buffered=False)
+        chunks = iter(response.response)
+        next(chunks)
+        first_byte = time.perf_counter() - start
+        exported = 1
+        for chunk in chunks:
+            exported += 1
+        total = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        response.close()
+
+        print(f'{rows:>8} linhas: primeiro byte {first_byte * 1000:.1f} ms, '
+              f'total {total:.2f} s, pico de memória {peak / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
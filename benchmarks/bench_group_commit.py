@@ -0,0 +1,63 @@
+"""
+Vazão de escritas com e sem group commit (WRITE_GROUP_COMMIT) para 1, 8 e 64
+clientes concorrentes. Cada combinação roda sobre um banco novo.
+
+Uso: python benchmarks/bench_group_commit.py [--clients 1 8 64] [--requests 2000]
+                                              [--synchronous FULL]
+"""
+import argparse
+
+from common import make_app
+
+from app import db
+from load import TestClientDriver, run_scenario, scenarios
+
+WRITE_SCENARIOS = ('create', 'update')
+
+
+def run(mode, synchronous, scenario, clients, requests):
+    app = make_app(
+        WRITE_GROUP_COMMIT=(mode == 'group'),
+        SQLITE_PRAGMAS={
+            'journal_mode': 'WAL',
+            'synchronous': synchronous,
+            'busy_timeout': 5000
+        }
+    )
+    with app.app_context():
+        # Usuários que os cenários de atualização alteram
+        client = app.test_client()
+        client.post('/api/users/bulk', json=[
+            {'name': 'Usuario Base', 'email': f'base{i}@example.com', 'phone': str(11000000000 + i)}
+            for i in range(1000)
+        ])
+
+    driver = TestClientDriver(app)
+    try:
+        return run_scenario(driver, scenarios(1000)[scenario], requests, clients, warmup=10)
+    finally:
+        with app.app_context():
+            writer = app.extensions['group_commit'] and app.extensions['group_commit'].writer
+            if writer is not None:
+                writer.close()
+            db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--synchronous', default='NORMAL', help='PRAGMA synchronous (NORMAL ou FULL).')
+    args = parser.parse_args()
+
+    print(f'PRAGMA synchronous={args.synchronous}')
+    for scenario in WRITE_SCENARIOS:
+        for clients in args.clients:
+            for mode in ('inline', 'group'):
+                result = run(mode, args.synchronous, scenario, clients, args.requests)
+                print(f'  {scenario:>6} c={clients:<3} {mode:>6}  {result["throughput_rps"]:>8.1f} escritas/s  '
+                      f'p50 {result["p50_ms"]:>7.2f} ms  p99 {result["p99_ms"]:>8.2f} ms  erros {result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compara resolver N telefones com N chamadas GET /api/users/<phone> contra uma
+única chamada POST /api/users/lookup, com o cache frio e quente.
+
+Uso: python benchmarks/bench_lookup.py [--phones 5000] [--rows 100000]
+"""
+import argparse
+import json
+import random
+import time
+
+from common import make_app, seed_users
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--phones', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = make_app()
+    seed_users(app, args.rows)
+    client = app.test_client()
+    phones = [str(11000000000 + i) for i in random.Random(42).sample(range(args.rows), args.phones)]
+
+    def sequential():
+        for phone in phones:
+            assert client.get(f'/api/users/{phone}').status_code == 200
+
+    def batch():
+        response = client.post('/api/users/lookup', data=json.dumps({'phones': phones}),
+                               content_type='application/json')
+        assert json.loads(response.data)['count'] == len(phones)
+
+    print(f'{args.phones} telefones em uma base de {args.rows} usuários:')
+    for label, warm in (('cache frio', False), ('cache quente', True)):
+        results = {}
+        for name, func in (('sequencial', sequential), ('lookup', batch)):
+            with app.app_context():
+                app.extensions['user_cache'].clear()
+            if warm:
+                func()
+            results[name] = timed(func)
+
+        print(f'    {label:<13} GET sequencial {results["sequencial"] * 1000:>9.1f} ms   '
+              f'POST lookup {results["lookup"] * 1000:>7.1f} ms '
+              f'({results["sequencial"] / results["lookup"]:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Compara a latência da primeira página com uma página profunda da listagem.
+
+Uso: python benchmarks/bench_pagination.py [--pages 10000] [--limit 25]
+"""
+import argparse
+import time
+
+from common import make_app, seed_users
+
+from app.pagination import encode_cursor
+
+
+def measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.data
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    total = args.pages * args.limit
+    app = make_app()
+    print(f'Populando {total} usuários...')
+    seed_users(app, total)
+
+    client = app.test_client()
+    first_page = f'/api/users?limit={args.limit}'
+    # O cursor da página N aponta para o último id da página N-1
+    deep_cursor = encode_cursor({'id': (args.pages - 1) * args.limit})
+    deep_page = f'/api/users?limit={args.limit}&cursor={deep_cursor}'
+
+    first = measure(client, first_page, args.repeat)
+    deep = measure(client, deep_page, args.repeat)
+
+    print(f'Página 1:      {first:.3f} ms (mediana)')
+    print(f'Página {args.pages}: {deep:.3f} ms (mediana)')
+    print(f'Razão:         {deep / first:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
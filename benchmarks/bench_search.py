@@ -0,0 +1,72 @@
+"""
+Compara a busca por nome/email com LIKE '%termo%' (varredura da tabela)
+contra o índice FTS5 usado por GET /api/users/search.
+
+Uso: python benchmarks/bench_search.py [--rows 100000 1000000]
+"""
+import argparse
+import time
+
+from sqlalchemy import or_, select
+
+from common import make_app, seed_users
+
+from app import db
+from app.models.user import User
+from app.search import search_statement
+
+# Termo seletivo (um usuário), termo amplo (10% da tabela) e termo sem resultados.
+# O LIKE com curinga à esquerda não usa índice e percorre a tabela até completar
+# a página; o FTS5 só lê as listas do índice invertido
+TERMS = ('user12345', 'olive', 'zzz')
+PAGE_SIZE = 25
+
+
+def like_search(term):
+    def run():
+        pattern = f'%{term}%'
+        stmt = (
+            select(User.id, User.name, User.email)
+            .where(User.enabled == True, or_(User.name.ilike(pattern), User.email.ilike(pattern)))
+            .order_by(User.id)
+            .limit(PAGE_SIZE)
+        )
+        return db.session.execute(stmt).all()
+    return run
+
+
+def fts_search(term):
+    def run():
+        stmt = search_statement(User.__table__, [User.id, User.name, User.email], term)
+        return db.session.execute(stmt.limit(PAGE_SIZE)).all()
+    return run
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        app = make_app()
+        seed_users(app, rows)
+        print(f'{rows:>8} linhas:')
+        with app.app_context():
+            for term in TERMS:
+                like = best_of(like_search(term), args.repeat)
+                fts = best_of(fts_search(term), args.repeat)
+                print(f'    {term!r:<12} LIKE {like:>9.2f} ms   FTS5 {fts:>8.2f} ms ({like / fts:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compara a serialização da listagem via objetos ORM + to_dict() com o caminho
+de projeção de colunas (select(*colunas) + User.row_serializer).
+
+Uso: python benchmarks/bench_serialization.py [--rows 10000 100000]
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import select
+
+from common import make_app, seed_users
+
+from app import db
+from app.models.user import User
+
+
+def orm_to_dict():
+    users = User.query.filter_by(enabled=True).all()
+    payload = json.dumps([user.to_dict() for user in users])
+    db.session.expunge_all()
+    return payload
+
+
+def projection(fields):
+    def run():
+        stmt = select(*[getattr(User, field) for field in fields]).where(User.enabled == True)
+        serialize = User.row_serializer(fields)
+        rows = db.session.execute(stmt).all()
+        return json.dumps([serialize(row) for row in rows])
+    return run
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        app = make_app()
+        seed_users(app, rows)
+        with app.app_context():
+            baseline = best_of(orm_to_dict, args.repeat)
+            full = best_of(projection(User.SERIALIZABLE_FIELDS), args.repeat)
+            narrow = best_of(projection(('name', 'email')), args.repeat)
+
+        print(f'{rows:>7} linhas:')
+        print(f'    ORM + to_dict():          {baseline:>9.1f} ms')
+        print(f'    projeção (todos campos):  {full:>9.1f} ms ({baseline / full:.1f}x)')
+        print(f'    projeção (name,email):    {narrow:>9.1f} ms ({baseline / narrow:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
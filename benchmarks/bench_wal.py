@@ -0,0 +1,88 @@
+"""
+Vazão de leitura com escritores ativos: journal_mode=DELETE (rollback journal) versus WAL.
+
+Uso: python benchmarks/bench_wal.py [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from common import make_app, seed_users
+
+MODES = {
+    'rollback journal': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000},
+    'WAL': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000},
+}
+
+
+def run_mode(pragmas, args):
+    # Cache desligado para que toda leitura vá ao banco
+    app = make_app(SQLITE_PRAGMAS=pragmas, USER_CACHE_ENABLED=False)
+    seed_users(app, args.users)
+    phones = [str(11000000000 + i) for i in range(args.users)]
+
+    stop = threading.Event()
+    counters = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def reader():
+        client = app.test_client()
+        reads = errors = 0
+        while not stop.is_set():
+            response = client.get(f'/api/users/{random.choice(phones)}')
+            if response.status_code == 200:
+                reads += 1
+            else:
+                errors += 1
+        with lock:
+            counters['reads'] += reads
+            counters['errors'] += errors
+
+    def writer():
+        client = app.test_client()
+        writes = errors = 0
+        while not stop.is_set():
+            response = client.put(
+                f'/api/users/{random.choice(phones)}',
+                data=json.dumps({'name': random.choice(['Ana Souza', 'Pedro Lima'])}),
+                content_type='application/json'
+            )
+            if response.status_code == 200:
+                writes += 1
+            else:
+                errors += 1
+        with lock:
+            counters['writes'] += writes
+            counters['errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {name: value / args.seconds if name != 'errors' else value for name, value in counters.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{args.readers} leitores, {args.writers} escritores, {args.seconds:.0f}s por modo')
+    for name, pragmas in MODES.items():
+        result = run_mode(pragmas, args)
+        print(f'{name:>17}: {result["reads"]:>8.0f} leituras/s  '
+              f'{result["writes"]:>7.0f} escritas/s  {result["errors"]:>5} erros')
+
+
+if __name__ == '__main__':
+    main()
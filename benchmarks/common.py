@@ -0,0 +1,79 @@
+"""
+Utilitários compartilhados pelos benchmarks
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+#Cria uma aplicação (perfil production) apontando para um banco SQLite temporário
+def make_app(db_path=None, config_name='production', **overrides):
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='crud-user-bench-'), 'users.db')
+
+    overrides.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{db_path}')
+    # As bases dos benchmarks são criadas pelo create_all, não pelas migrações
+    overrides.setdefault('SCHEMA_AUTO_CREATE', True)
+    return create_app(config_name, overrides)
+
+
+# Versão do esquema das bases em cache (benchmarks/.data); incrementar quando
+# o esquema mudar para que sejam recriadas (2: índice de busca users_fts)
+SEED_VERSION = 2
+
+FIRST_NAMES = ('Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Fábio', 'Gabriela', 'Heitor', 'Iara', 'João')
+LAST_NAMES = ('Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Almeida', 'Ribeiro', "D'Ávila")
+
+
+#Gera usuários sintéticos que passam nas validações do modelo
+def synthetic_users(count, start=0):
+    base = datetime(2025, 1, 1)
+    for i in range(start, start + count):
+        timestamp = base + timedelta(seconds=i)
+        yield {
+            'name': f'{FIRST_NAMES[i % 10]} {LAST_NAMES[(i // 10) % 10]}',
+            'email': f'user{i}@example.com',
+            'phone': f'{11000000000 + i}',
+            'enabled': True,
+            'created_at': timestamp,
+            'updated_at': timestamp,
+        }
+
+
+#Popula a tabela users em lotes com executemany.
+#Com validate=True cada linha passa pelas validações do modelo (User.normalize)
+def seed_users(app, count, batch_size=10000, validate=False):
+    with app.app_context():
+        batch = []
+        for row in synthetic_users(count):
+            if validate:
+                row.update(User.normalize(row), created_at=row['created_at'], updated_at=row['updated_at'])
+            batch.append(row)
+            if len(batch) == batch_size:
+                db.session.execute(insert(User.__table__), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(User.__table__), batch)
+        db.session.commit()
+        db.engine.dispose()
+
+
+#Retorna o caminho de um banco já populado com count usuários, criando-o uma única vez
+def seeded_database(count, data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'users-{count}-v{SEED_VERSION}.db')
+    if not os.path.exists(path):
+        tmp_path = f'{path}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        seed_users(make_app(tmp_path), count, validate=True)
+        os.replace(tmp_path, path)
+    return path
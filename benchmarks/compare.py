@@ -0,0 +1,58 @@
+"""
+Compara dois resultados do benchmarks/load.py (ex.: antes e depois de um commit).
+
+Uso: python benchmarks/compare.py base.json novo.json [--threshold 10]
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report['meta'], {
+        (row['dataset'], row['scenario'], row['concurrency']): row for row in report['results']
+    }
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Variação percentual de p95 ou vazão marcada como regressão.')
+    args = parser.parse_args()
+
+    base_meta, base = load(args.base)
+    new_meta, new = load(args.new)
+    print(f'base: {base_meta.get("commit")}  novo: {new_meta.get("commit")}')
+    print(f'{"dataset":>9} {"cenário":>12} {"c":>3}  {"req/s":>19} {"Δ":>7}  {"p95 ms":>19} {"Δ":>7}')
+
+    regressions = 0
+    for key in sorted(base.keys() & new.keys()):
+        old_row, new_row = base[key], new[key]
+        rps = change(old_row['throughput_rps'], new_row['throughput_rps'])
+        p95 = change(old_row['p95_ms'], new_row['p95_ms'])
+        flag = ''
+        if (rps is not None and rps < -args.threshold) or (p95 is not None and p95 > args.threshold):
+            flag = '  <- regressão'
+            regressions += 1
+        dataset, scenario, concurrency = key
+        print(f'{dataset:>9} {scenario:>12} {concurrency:>3}  '
+              f'{old_row["throughput_rps"]:>9.1f}→{new_row["throughput_rps"]:<9.1f} {rps or 0:>+6.1f}%  '
+              f'{old_row["p95_ms"]:>9.3f}→{new_row["p95_ms"]:<9.3f} {p95 or 0:>+6.1f}%{flag}')
+
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f'{key}: presente em apenas um dos arquivos')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
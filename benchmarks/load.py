@@ -0,0 +1,268 @@
+"""
+Benchmark de carga dos endpoints de /api/users.
+
+Popula bancos sintéticos (10k, 100k, 1M usuários válidos), executa cada
+endpoint com a concorrência informada e reporta vazão e latência p50/p95/p99.
+Os resultados são gravados em JSON para comparação entre commits
+(ver benchmarks/compare.py). Tudo roda localmente contra a aplicação WSGI:
+pelo test client do Flask (padrão) ou por HTTP em um servidor local (--http).
+
+Uso:
+    python benchmarks/load.py --datasets 10000 100000 --concurrency 1 8 32
+    python benchmarks/load.py --datasets 1000000 --scenarios get_user list --http
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from common import make_app, seeded_database
+
+from app.pagination import encode_cursor
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '.data')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class Scenario:
+    """Gera as requisições de um endpoint. build(i) devolve (método, url, corpo)."""
+
+    def __init__(self, name, build, expected=(200,), writes=False):
+        self.name = name
+        self.build = build
+        self.expected = expected
+        self.writes = writes
+
+
+#Cada requisição de escrita usa um índice novo, acima dos usuários já populados
+def scenarios(dataset):
+    phone = lambda i: str(11000000000 + i % dataset)  # noqa: E731
+    new_user = lambda i: {  # noqa: E731
+        'name': 'Usuario Carga',
+        'email': f'load{i}@example.com',
+        'phone': str(12000000000 + i)
+    }
+    deep_cursor = encode_cursor({'id': max(dataset - 50, 0)})
+
+    return {
+        'list': Scenario('list', lambda i: ('GET', '/api/users', None)),
+        'list_deep': Scenario('list_deep', lambda i: ('GET', f'/api/users?cursor={deep_cursor}', None)),
+        'list_fields': Scenario('list_fields', lambda i: ('GET', '/api/users?limit=100&fields=name,email', None)),
+        'get_user': Scenario('get_user', lambda i: ('GET', f'/api/users/{phone(i * 7919)}', None)),
+        'changes': Scenario('changes', lambda i: ('GET', '/api/users/changes?limit=100', None)),
+        'search': Scenario('search', lambda i: ('GET', f'/api/users/search?q=user{i * 7919 % dataset}', None)),
+        'create': Scenario('create', lambda i: ('POST', '/api/users', new_user(i)), (201,), writes=True),
+        'bulk': Scenario('bulk', lambda i: ('POST', '/api/users/bulk',
+                                            [new_user(i * 100 + j) for j in range(100)]), writes=True),
+        'update': Scenario('update', lambda i: ('PUT', f'/api/users/{phone(i)}',
+                                                {'name': 'Usuario Atualizado'}), writes=True),
+        'upsert': Scenario('upsert', lambda i: ('PUT', f'/api/users/{phone(i)}?upsert=1',
+                                                {'name': 'Usuario Upsert', 'email': f'upsert{i}@example.com'}),
+                           writes=True),
+        'delete': Scenario('delete', lambda i: ('DELETE', f'/api/users/{phone(i)}', None), writes=True),
+        'restore': Scenario('restore', lambda i: ('PATCH', f'/api/users/{phone(i)}/restore', None),
+                            (200, 400), writes=True),
+        'export': Scenario('export', lambda i: ('GET', '/api/users/export?fields=id,phone', None)),
+    }
+
+
+DEFAULT_SCENARIOS = ['list', 'list_deep', 'list_fields', 'changes', 'get_user', 'search',
+                     'create', 'bulk', 'update', 'upsert', 'delete', 'restore']
+
+
+class TestClientDriver:
+    """Chama a aplicação WSGI em processo, um test client por thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, url, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(url, method=method, json=body)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+    """Sobe a aplicação em um servidor WSGI local e usa conexões keep-alive por thread"""
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def request(self, method, url, body):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, url, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self):
+        self.server.shutdown()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+#Executa requests requisições do cenário com concurrency threads
+def run_scenario(driver, scenario, requests, concurrency, warmup):
+    counter = itertools.count()
+    for _ in range(warmup):
+        driver.request(*scenario.build(next(counter)))
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = itertools.count()
+
+    def worker():
+        nonlocal errors
+        local_latencies = []
+        local_errors = 0
+        while next(remaining) < requests:
+            method, url, body = scenario.build(next(counter))
+            start = time.perf_counter()
+            status = driver.request(method, url, body)
+            local_latencies.append(time.perf_counter() - start)
+            if status not in scenario.expected:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': to_ms(percentile(latencies, 0.50)),
+        'p95_ms': to_ms(percentile(latencies, 0.95)),
+        'p99_ms': to_ms(percentile(latencies, 0.99)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS)
+    parser.add_argument('--requests', type=int, default=1000, help='Requisições por cenário.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--config', default='production', help='Perfil de config.py.')
+    parser.add_argument('--http', action='store_true', help='Usa um servidor HTTP local em vez do test client.')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/<commit>-<data>.json).')
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(scenarios(1))
+    if unknown:
+        parser.error(f'cenários desconhecidos: {", ".join(sorted(unknown))}')
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'driver': 'http' if args.http else 'test_client',
+            'config': args.config,
+            'requests_per_scenario': args.requests,
+        },
+        'results': []
+    }
+
+    work_dir = tempfile.mkdtemp(prefix='crud-user-load-')
+    try:
+        for dataset in args.datasets:
+            print(f'Preparando base com {dataset} usuários...')
+            source = seeded_database(dataset, DATA_DIR)
+            available = scenarios(dataset)
+
+            for name in args.scenarios:
+                scenario = available[name]
+                for concurrency in args.concurrency:
+                    # Cada execução usa uma cópia da base para que as escritas não se acumulem
+                    db_path = os.path.join(work_dir, f'{name}-{concurrency}.db')
+                    shutil.copyfile(source, db_path)
+                    app = make_app(db_path, args.config)
+                    driver = HTTPDriver(app) if args.http else TestClientDriver(app)
+                    try:
+                        result = run_scenario(driver, scenario, args.requests, concurrency, args.warmup)
+                    finally:
+                        driver.close()
+                        with app.app_context():
+                            from app import db
+                            db.engine.dispose()
+                        os.remove(db_path)
+
+                    result.update({'dataset': dataset, 'scenario': name, 'concurrency': concurrency})
+                    report['results'].append(result)
+                    print(f'  {name:>12} c={concurrency:<3} {result["throughput_rps"]:>9.1f} req/s  '
+                          f'p50 {result["p50_ms"]:>8.3f} ms  p95 {result["p95_ms"]:>8.3f} ms  '
+                          f'p99 {result["p99_ms"]:>8.3f} ms  erros {result["errors"]}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'{report["meta"]["commit"] or "local"}-{stamp}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'Resultados gravados em {output}')
+
+
+if __name__ == '__main__':
+    main()
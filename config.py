@@ -10,9 +10,82 @@ class Config:
     basedir = os.path.abspath(os.path.dirname(__file__))
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f'sqlite:///{os.path.join(basedir, "instance", "users.db")}'
+
+    # Cria as tabelas que faltam (db.create_all) a cada create_app. Desligado, o
+    # esquema vem só das migrações (flask db upgrade) e a subida não inspeciona o banco
+    SCHEMA_AUTO_CREATE = os.environ.get('SCHEMA_AUTO_CREATE', '1').lower() in ('1', 'true')
+
+    # Réplica somente leitura (opcional) usada pelas rotas GET; qualquer URL do
+    # SQLAlchemy, ex.: sqlite:////var/lib/users/replica.db
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} \
+        if os.environ.get('DATABASE_REPLICA_URL') else {}
+
+    # Opções repassadas ao create_engine (pool etc.)
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # PRAGMAs executados em cada nova conexão SQLite (bancos em arquivo)
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000
+    }
     
     # Configurações de paginação
     USERS_PER_PAGE = 25
+    MAX_USERS_PER_PAGE = 100
+
+    # Configurações de exportação (linhas buscadas por lote do cursor)
+    EXPORT_BATCH_SIZE = 1000
+
+    # Configurações de criação em lote (linhas por transação e máximo por requisição)
+    BULK_BATCH_SIZE = 5000
+    BULK_MAX_ROWS = 50000
+
+    # Máximo de telefones + emails por POST /api/users/lookup
+    LOOKUP_MAX_KEYS = 10000
+
+    # Arquivamento (flask users archive): usuários desabilitados há mais de N dias
+    # vão para users_archive, em lotes curtos para não segurar o lock de escrita
+    ARCHIVE_RETENTION_DAYS = 365
+    ARCHIVE_BATCH_SIZE = 1000
+
+    # Configurações do cache de usuários por telefone
+    USER_CACHE_ENABLED = True
+    USER_CACHE_MAX_SIZE = 10000
+    USER_CACHE_TTL = 60  # segundos
+    USER_CACHE_BACKEND = None  # None = LRU em memória; ou factory/caminho de um CacheBackend
+
+    # Group commit: escritas concorrentes aplicadas por uma thread em transações
+    # agrupadas (até MAX_OPS operações, esperando no máximo MAX_DELAY_MS por mais)
+    WRITE_GROUP_COMMIT = os.environ.get('WRITE_GROUP_COMMIT', '').lower() in ('1', 'true')
+    WRITE_GROUP_MAX_OPS = 64
+    WRITE_GROUP_MAX_DELAY_MS = 0
+    WRITE_GROUP_TIMEOUT = 30  # segundos esperando o resultado da operação
+
+    # Controle de admissão de /api/users: requisições simultâneas por classe de rota
+    # (leitura ou escrita). As excedentes esperam em uma fila limitada por até
+    # QUEUE_TIMEOUT_MS; acima disso recebem 503 com Retry-After (segundos)
+    ADMISSION_CONTROL = True
+    ADMISSION_READ_LIMIT = 64
+    ADMISSION_WRITE_LIMIT = 16
+    ADMISSION_READ_QUEUE_SIZE = 128
+    ADMISSION_WRITE_QUEUE_SIZE = 64
+    ADMISSION_QUEUE_TIMEOUT_MS = 1000
+    ADMISSION_RETRY_AFTER = 1
+
+    # Servidor de produção (python serve.py): workers com pre-fork no mesmo socket
+    SERVER_BIND = os.environ.get('SERVER_BIND', '127.0.0.1:8000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 0))  # 0 = um por CPU
+    SERVER_BACKLOG = 2048
+    SERVER_GRACEFUL_TIMEOUT = 30  # segundos para o worker terminar as requisições em andamento
+    SERVER_WARMUP_TIMEOUT = 60  # segundos para o worker ficar pronto
+    SERVER_WARMUP_CONNECTIONS = 2  # conexões abertas por engine antes de aceitar tráfego
+    SERVER_WARMUP_CACHE_USERS = 1000  # usuários alterados mais recentemente carregados no cache
+
+    # Instrumentação de SQL por requisição (header Server-Timing e log app.requests)
+    SQL_INSTRUMENTATION = True
+
+    # Endpoint /metrics (formato Prometheus)
+    METRICS_ENABLED = True
     
     # Configurações de validação
     MAX_NAME_LENGTH = 100
@@ -22,16 +95,45 @@ class Config:
 
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_ECHO = True
+    # Log de cada instrução SQL só quando pedido (SQLALCHEMY_ECHO=1): ligado por
+    # padrão ele inundaria a saída do flask users import
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', '').lower() in ('1', 'true')
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000
+    }
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_ECHO = False
+    # Em produção o esquema é aplicado pelas migrações antes do deploy
+    SCHEMA_AUTO_CREATE = os.environ.get('SCHEMA_AUTO_CREATE', '').lower() in ('1', 'true')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 3600
+    }
+    # WAL permite leituras concorrentes com um escritor; synchronous=NORMAL
+    # é seguro em WAL e evita um fsync por commit
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+        'mmap_size': 268435456,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY'
+    }
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_BINDS = {}
+    SCHEMA_AUTO_CREATE = True
     WTF_CSRF_ENABLED = False
+    SQLITE_PRAGMAS = {}
 
 # Dicionário de configurações
 config = {
@@ -0,0 +1,25 @@
+"""add indexes for enabled listing and updated_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_enabled_id', 'users', ['enabled', 'id'], unique=False)
+    op.create_index('ix_users_updated_at', 'users', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_updated_at', table_name='users')
+    op.drop_index('ix_users_enabled_id', table_name='users')
@@ -0,0 +1,56 @@
+"""add FTS5 search index on users name and email
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """CREATE VIRTUAL TABLE users_fts USING fts5(
+            name, email,
+            content='users', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )"""
+    )
+    op.execute(
+        """CREATE TRIGGER users_fts_after_insert AFTER INSERT ON users
+        WHEN new.enabled BEGIN
+            INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER users_fts_after_delete AFTER DELETE ON users
+        WHEN old.enabled BEGIN
+            INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER users_fts_after_update AFTER UPDATE OF name, email, enabled ON users
+        BEGIN
+            INSERT INTO users_fts(users_fts, rowid, name, email)
+                SELECT 'delete', old.id, old.name, old.email WHERE old.enabled;
+            INSERT INTO users_fts(rowid, name, email)
+                SELECT new.id, new.name, new.email WHERE new.enabled;
+        END"""
+    )
+    # Indexa os usuários habilitados que já existem
+    op.execute("INSERT INTO users_fts(rowid, name, email) SELECT id, name, email FROM users WHERE enabled")
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS users_fts_after_update')
+    op.execute('DROP TRIGGER IF EXISTS users_fts_after_delete')
+    op.execute('DROP TRIGGER IF EXISTS users_fts_after_insert')
+    op.execute('DROP TABLE IF EXISTS users_fts')
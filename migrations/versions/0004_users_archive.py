@@ -0,0 +1,61 @@
+"""add users_archive table for long-disabled users
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('enabled', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('phone')
+    )
+    op.create_index('ix_users_archive_archived_at', 'users_archive', ['archived_at'], unique=False)
+
+    # Email e telefone continuam únicos considerando os usuários arquivados
+    op.execute(
+        """CREATE TRIGGER users_archive_unique_insert BEFORE INSERT ON users
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+            WHERE EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+            WHERE new.phone IS NOT NULL AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER users_archive_unique_update BEFORE UPDATE OF email, phone ON users
+        BEGIN
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+            WHERE new.email IS NOT old.email AND EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+            SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+            WHERE new.phone IS NOT old.phone AND new.phone IS NOT NULL
+              AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+        END"""
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS users_archive_unique_update')
+    op.execute('DROP TRIGGER IF EXISTS users_archive_unique_insert')
+    op.drop_index('ix_users_archive_archived_at', table_name='users_archive')
+    op.drop_table('users_archive')
@@ -0,0 +1,103 @@
+"""rebuild users with AUTOINCREMENT so archived ids are never reused
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Sem AUTOINCREMENT o SQLite usa max(id) + 1: o id de um usuário arquivado pode
+# ir para um novo usuário e o restore não teria como devolver o id original.
+# O SQLite não altera a chave de uma tabela existente, então users é recriada;
+# o DROP TABLE leva junto os triggers de users (índice FTS e unicidade com o arquivo)
+TRIGGERS = (
+    """CREATE TRIGGER users_fts_after_insert AFTER INSERT ON users
+    WHEN new.enabled BEGIN
+        INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    """CREATE TRIGGER users_fts_after_delete AFTER DELETE ON users
+    WHEN old.enabled BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER users_fts_after_update AFTER UPDATE OF name, email, enabled ON users
+    BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email)
+            SELECT 'delete', old.id, old.name, old.email WHERE old.enabled;
+        INSERT INTO users_fts(rowid, name, email)
+            SELECT new.id, new.name, new.email WHERE new.enabled;
+    END""",
+    """CREATE TRIGGER users_archive_unique_insert BEFORE INSERT ON users
+    BEGIN
+        SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+        WHERE EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+        SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+        WHERE new.phone IS NOT NULL AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+    END""",
+    """CREATE TRIGGER users_archive_unique_update BEFORE UPDATE OF email, phone ON users
+    BEGIN
+        SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.email')
+        WHERE new.email IS NOT old.email AND EXISTS (SELECT 1 FROM users_archive WHERE email = new.email);
+        SELECT RAISE(ABORT, 'UNIQUE constraint failed: users.phone')
+        WHERE new.phone IS NOT old.phone AND new.phone IS NOT NULL
+          AND EXISTS (SELECT 1 FROM users_archive WHERE phone = new.phone);
+    END""",
+)
+
+COLUMNS = 'id, name, email, phone, enabled, created_at, updated_at'
+
+
+def rebuild_users(autoincrement):
+    op.create_table('users_rebuild',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('enabled', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('phone'),
+    sqlite_autoincrement=autoincrement
+    )
+    # Mesmos rowids: o índice FTS (content_rowid='id') continua válido
+    op.execute(f'INSERT INTO users_rebuild ({COLUMNS}) SELECT {COLUMNS} FROM users')
+    op.drop_table('users')
+    op.rename_table('users_rebuild', 'users')
+
+    op.create_index('ix_users_enabled_id', 'users', ['enabled', 'id'], unique=False)
+    op.create_index('ix_users_updated_at', 'users', ['updated_at'], unique=False)
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    # No PostgreSQL o id já vem de uma sequência, que não reutiliza valores
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    rebuild_users(autoincrement=True)
+    # A sequência começa depois do maior id em uso, inclusive no arquivo
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'users'")
+    op.execute(
+        """INSERT INTO sqlite_sequence (name, seq) SELECT 'users', max(
+            coalesce((SELECT max(id) FROM users), 0),
+            coalesce((SELECT max(id) FROM users_archive), 0)
+        )"""
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    rebuild_users(autoincrement=False)
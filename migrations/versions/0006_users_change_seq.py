@@ -0,0 +1,56 @@
+"""add users.change_seq, assigned by triggers, as the change feed cursor
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('change_seq', sa.Integer(), nullable=True))
+
+    # As linhas existentes entram no feed na ordem antiga, (updated_at, id)
+    op.execute(
+        """UPDATE users SET change_seq = ordered.seq
+        FROM (SELECT id, row_number() OVER (ORDER BY updated_at, id) AS seq FROM users) AS ordered
+        WHERE ordered.id = users.id"""
+    )
+    op.create_index('ix_users_change_seq', 'users', ['change_seq'], unique=False)
+
+    # Contador de uma linha: cada alteração de users recebe o próximo valor
+    # dentro da própria transação de escrita
+    op.execute('CREATE TABLE users_change_counter (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)')
+    op.execute('INSERT INTO users_change_counter (id, seq) SELECT 1, coalesce(max(change_seq), 0) FROM users')
+    op.execute(
+        """CREATE TRIGGER users_change_seq_after_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE users_change_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE users SET change_seq = (SELECT seq FROM users_change_counter WHERE id = 1) WHERE id = new.id;
+        END"""
+    )
+    op.execute(
+        """CREATE TRIGGER users_change_seq_after_update
+        AFTER UPDATE OF name, email, phone, enabled, created_at, updated_at ON users
+        BEGIN
+            UPDATE users_change_counter SET seq = seq + 1 WHERE id = 1;
+            UPDATE users SET change_seq = (SELECT seq FROM users_change_counter WHERE id = 1) WHERE id = new.id;
+        END"""
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS users_change_seq_after_update')
+    op.execute('DROP TRIGGER IF EXISTS users_change_seq_after_insert')
+    op.execute('DROP TABLE IF EXISTS users_change_counter')
+    op.drop_index('ix_users_change_seq', table_name='users')
+    op.execute('ALTER TABLE users DROP COLUMN change_seq')
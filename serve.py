@@ -0,0 +1,30 @@
+"""
+Servidor de produção: cria a aplicação uma vez e faz pre-fork de N workers que
+compartilham o mesmo socket (ver app/server.py)
+
+Uso:
+    python serve.py --bind 0.0.0.0:8000 --workers 4 --config production
+    kill -HUP <pid do mestre>   # troca os workers sem derrubar requisições
+"""
+import argparse
+import logging
+import os
+
+from app import create_app
+from app.server import PreforkServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', help='host:porta (padrão: SERVER_BIND).')
+    parser.add_argument('--workers', type=int, help='Número de workers (padrão: SERVER_WORKERS ou um por CPU).')
+    parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'production'),
+                        help='Perfil de config.py.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+    PreforkServer(create_app(args.config), bind=args.bind, workers=args.workers).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,223 @@
 """
 Configuração dos testes pytest
+
+A aplicação, o engine e o esquema são criados uma vez por sessão (e por worker
+do pytest-xdist). Cada teste roda dentro de uma transação externa desfeita no
+final; os commits e rollbacks da aplicação viram SAVEPOINTs dentro dela.
+
+Opções:
+    --sqlite-file    usa um banco SQLite em arquivo por worker em vez de :memory:
+    --seed-users N   usuários da base do fixture seeded_app (padrão: 100000)
 """
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
 import pytest
-from flask import Flask
-from app import db
+from flask import current_app
+from sqlalchemy import create_engine, event, insert, text
+
+from app import db, user_cache
 from app.models.user import User
+from app.routing import RoutingSession
 
-@pytest.fixture
-def app():
-
-    # Criar app
-    app = Flask(__name__)
-    app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
-        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
-        'WTF_CSRF_ENABLED': False
-    })
-    
-    # Importar e inicializar extensões
-    from app import db, migrate
-    db.init_app(app)
-    migrate.init_app(app, db)
-    
-    # Registrar blueprints
-    from app.controllers.user_controller import user_bp
-    app.register_blueprint(user_bp, url_prefix='/api')
-    
+SEED_USERS = 100000
+SEED_PHONE_BASE = 11000000000
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('crud-user')
+    group.addoption('--sqlite-file', action='store_true',
+                    help='Roda os testes em um banco SQLite em arquivo (um por worker) em vez de :memory:.')
+    group.addoption('--seed-users', type=int, default=SEED_USERS,
+                    help=f'Usuários da base do fixture seeded_app (padrão: {SEED_USERS}).')
+
+
+#gw0, gw1... com pytest-xdist; main sem ele
+def worker_id():
+    return os.environ.get('PYTEST_XDIST_WORKER', 'main')
+
+
+#O pysqlite só abre a transação antes de INSERT/UPDATE/DELETE: sem um BEGIN
+#explícito, o RELEASE do primeiro SAVEPOINT confirmaria a escrita no banco
+def install_savepoint_support(engine):
+    @event.listens_for(engine, 'connect')
+    def disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def emit_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+#Cria a aplicação da sessão; o esquema só é criado se create_schema=True
+def create_test_app(database_uri, create_schema=True):
+    from app import create_app
+
+    overrides = {'SQLALCHEMY_DATABASE_URI': database_uri, 'SCHEMA_AUTO_CREATE': False}
+    if ':memory:' in database_uri:
+        # Em memória todo checkout devolve a mesma conexão (StaticPool): o rollback
+        # na devolução ao pool desfaria a transação externa do teste
+        overrides['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_reset_on_return': None}
+    app = create_app('testing', overrides)
+    with app.app_context():
+        install_savepoint_support(db.engine)
+        if create_schema:
+            db.create_all(bind_key=None)
+    return app
+
+
+class TransactionalSession(RoutingSession):
+    """Sessão dos testes: na aplicação do teste, usa a conexão da transação externa"""
+
+    def __init__(self, db, app=None, **kwargs):
+        super().__init__(db, **kwargs)
+        self.app = app
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and current_app._get_current_object() is self.app:
+            return self.bind
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+#Isola um teste: transação externa desfeita no final, sessões presas à conexão
+#dela (commit = RELEASE SAVEPOINT) e estado em memória da aplicação zerado
+@contextmanager
+def transaction(app):
+    config = dict(app.config)
+    with app.app_context():
+        user_cache.init_app(app)
+        metrics = app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.reset()
+
+        connection = db.engine.connect()
+        outer = connection.begin()
+        session = db.session
+        db.session = db._make_scoped_session({
+            'class_': TransactionalSession,
+            'app': app,
+            'bind': connection,
+            'join_transaction_mode': 'create_savepoint'
+        })
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            db.session = session
+            outer.rollback()
+            connection.close()
+            app.config.clear()
+            app.config.update(config)
+
+
+@pytest.fixture(scope='session')
+def session_app(request, tmp_path_factory):
+    database_uri = 'sqlite:///:memory:'
+    if request.config.getoption('sqlite_file'):
+        database_uri = f"sqlite:///{tmp_path_factory.getbasetemp() / f'users-{worker_id()}.db'}"
+
+    app = create_test_app(database_uri)
+    yield app
     with app.app_context():
-        db.create_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def app(session_app):
+    with transaction(session_app) as app:
         yield app
-        db.drop_all()
 
 @pytest.fixture
 def client(app):
     return app.test_client()
 
+
+#Identifica o esquema criado pelos modelos (tabelas, índices, FTS e triggers)
+def schema_fingerprint():
+    from app import create_app
+
+    app = create_app('testing', {'SCHEMA_AUTO_CREATE': False})
+    with app.app_context():
+        db.create_all(bind_key=None)
+        with db.engine.connect() as connection:
+            ddl = connection.execute(text(
+                'SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name'
+            )).all()
+        db.engine.dispose()
+    return hashlib.sha256(repr(ddl).encode('utf-8')).hexdigest()[:12]
+
+
+#Usuários sintéticos válidos: telefones SEED_PHONE_BASE + i, emails user{i}@example.com
+def seed_users(engine, count, batch_size=10000):
+    base = datetime(2025, 1, 1)
+    with engine.begin() as connection:
+        for start in range(0, count, batch_size):
+            connection.execute(insert(User.__table__), [
+                {
+                    'name': f'Usuario Seed {i}',
+                    'email': f'user{i}@example.com',
+                    'phone': str(SEED_PHONE_BASE + i),
+                    'enabled': i % 10 != 0,
+                    'created_at': base + timedelta(seconds=i),
+                    'updated_at': base + timedelta(seconds=i),
+                }
+                for i in range(start, min(start + batch_size, count))
+            ])
+
+
+#Base grande populada uma vez e guardada no cache do pytest (por tamanho e esquema);
+#cada worker recebe a sua cópia
+@pytest.fixture(scope='session')
+def seeded_database(request, tmp_path_factory):
+    count = request.config.getoption('seed_users')
+    cache = getattr(request.config, 'cache', None)  # ausente com -p no:cacheprovider
+    cache_dir = cache.mkdir('seeded-db') if cache is not None else tmp_path_factory.mktemp('seeded')
+    cached = cache_dir / f'users-{count}-{schema_fingerprint()}.db'
+
+    if not cached.exists():
+        building = cached.with_name(f'{cached.name}.{worker_id()}.tmp')
+        engine = create_engine(f'sqlite:///{building}')
+        with engine.begin() as connection:
+            db.metadata.create_all(connection)
+        seed_users(engine, count)
+        engine.dispose()
+        os.replace(building, cached)
+
+    path = tmp_path_factory.getbasetemp() / f'seeded-{worker_id()}.db'
+    shutil.copyfile(cached, path)
+    app = create_test_app(f'sqlite:///{path}', create_schema=False)
+    app.config['SEED_USERS'] = count
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def seeded_app(seeded_database):
+    with transaction(seeded_database) as app:
+        yield app
+
+
+@pytest.fixture
+def seeded_client(seeded_app):
+    return seeded_app.test_client()
+
+#Garante que o bloco não execute mais consultas do que o orçamento
+@pytest.fixture
+def assert_max_queries():
+    from app.instrumentation import count_queries
+
+    @contextmanager
+    def check(budget):
+        with count_queries() as stats:
+            yield stats
+        assert stats.count <= budget, f'{stats.count} consultas executadas (orçamento: {budget})'
+
+    return check
+
 #Dados para exemplos de teste
 @pytest.fixture
 def sample_user_data():
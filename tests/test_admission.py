@@ -0,0 +1,135 @@
+"""
+Controle de admissão: limites por classe de rota, fila com prazo e 503 com Retry-After
+"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app import create_app, db
+from app.admission import (ADMITTED, QUEUE_FULL, QUEUED, READ, TIMEOUT, WRITE, AsyncConcurrencyLimiter,
+                           ConcurrencyLimiter)
+
+NEW_USER = {'name': 'Maria Souza', 'email': 'maria@example.com', 'phone': '11988887777'}
+
+
+@pytest.fixture
+def admission_app():
+    # Uma vaga de escrita, fila de uma posição e prazo curto
+    app = create_app('testing', {
+        'ADMISSION_WRITE_LIMIT': 1,
+        'ADMISSION_WRITE_QUEUE_SIZE': 1,
+        'ADMISSION_QUEUE_TIMEOUT_MS': 50,
+        'ADMISSION_RETRY_AFTER': 2
+    })
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def create_user(app):
+    return app.test_client().post('/api/users', data=json.dumps(NEW_USER), content_type='application/json')
+
+
+class TestConcurrencyLimiter:
+    def test_limit_queue_and_deadline(self):
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=0.05)
+        assert limiter.acquire() == ADMITTED
+
+        # Espera o prazo inteiro na fila e desiste
+        assert limiter.acquire() == TIMEOUT
+
+        # Com a fila ocupada, a próxima é rejeitada na hora
+        waiting = threading.Thread(target=limiter.acquire)
+        limiter.timeout = 1
+        waiting.start()
+        while not limiter.waiting:
+            time.sleep(0.001)
+        assert limiter.acquire() == QUEUE_FULL
+        limiter.release()
+        waiting.join()
+        assert limiter.active == 1 and limiter.waiting == 0
+
+    def test_release_admits_waiter(self):
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=1)
+        limiter.acquire()
+        threading.Timer(0.02, limiter.release).start()
+
+        assert limiter.acquire() == QUEUED
+        assert limiter.active == 1
+
+    def test_async_limiter(self):
+        async def scenario():
+            limiter = AsyncConcurrencyLimiter(limit=1, queue_size=1, timeout=0.05)
+            assert await limiter.acquire() == ADMITTED
+            assert await limiter.acquire() == TIMEOUT
+
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            assert await limiter.acquire() == QUEUE_FULL
+            limiter.release()
+            assert await waiter == QUEUED
+            # A vaga passou direto para quem esperava
+            assert limiter.active == 1
+
+        asyncio.run(scenario())
+
+
+class TestAdmissionControl:
+    #Com as escritas saturadas a requisição recebe 503 sem executar a view
+    def test_sheds_writes_with_retry_after(self, admission_app):
+        limiter = admission_app.extensions['admission'].limiters[WRITE]
+        limiter.acquire()
+        try:
+            response = create_user(admission_app)
+        finally:
+            limiter.release()
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert json.loads(response.data)['success'] is False
+        assert limiter.active == 0
+
+        assert admission_app.test_client().get(f"/api/users/{NEW_USER['phone']}").status_code == 404
+
+    #A vaga liberada durante a espera admite a requisição da fila
+    def test_queued_write_is_admitted(self, admission_app):
+        limiter = admission_app.extensions['admission'].limiters[WRITE]
+        limiter.timeout = 1
+        limiter.acquire()
+        threading.Timer(0.02, limiter.release).start()
+
+        assert create_user(admission_app).status_code == 201
+        assert limiter.active == 0
+
+    #Leituras têm o seu próprio limite e seguem atendidas com as escritas saturadas
+    def test_reads_unaffected_by_write_saturation(self, admission_app):
+        state = admission_app.extensions['admission']
+        state.limiters[WRITE].acquire()
+        try:
+            response = admission_app.test_client().get('/api/users')
+        finally:
+            state.limiters[WRITE].release()
+
+        assert response.status_code == 200
+        assert state.limiters[READ].active == 0
+
+    def test_counters_in_metrics(self, admission_app):
+        limiter = admission_app.extensions['admission'].limiters[WRITE]
+        limiter.acquire()
+        try:
+            create_user(admission_app)
+        finally:
+            limiter.release()
+
+        body = admission_app.test_client().get('/metrics').get_data(as_text=True)
+        assert 'admission_requests_queued_total{route_class="write"} 1' in body
+        assert 'admission_requests_shed_total{route_class="write",reason="timeout"} 1' in body
+        assert 'http_requests_total{route="/api/users",method="POST",status="503"} 1' in body
+
+    def test_disabled(self):
+        app = create_app('testing', {'ADMISSION_CONTROL': False})
+        assert app.extensions['admission'] is None
+        assert create_user(app).status_code == 201
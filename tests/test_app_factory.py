@@ -0,0 +1,54 @@
+"""
+Testes do create_app e dos perfis de configuração
+"""
+from sqlalchemy import text
+
+from app import create_app, db
+from config import TestingConfig
+
+
+class TestAppFactory:
+    #O perfil de testes usa SQLite em memória
+    def test_testing_config(self, app):
+        assert app.config['TESTING'] == True
+        assert TestingConfig.SQLALCHEMY_DATABASE_URI == 'sqlite:///:memory:'
+        assert app.config['USERS_PER_PAGE'] == 25
+
+    #O perfil de produção aplica os PRAGMAs e as opções de pool
+    def test_production_engine_profile(self, tmp_path):
+        app = create_app('production', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}"
+        })
+
+        with app.app_context():
+            with db.engine.connect() as connection:
+                assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+                assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+                assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert db.engine.pool.size() == 10
+            db.engine.dispose()
+
+    #Valores de config_overrides têm precedência sobre o perfil
+    def test_config_overrides(self, tmp_path):
+        app = create_app('production', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+            'SQLITE_PRAGMAS': {'journal_mode': 'DELETE'},
+            'USERS_PER_PAGE': 10
+        })
+
+        assert app.config['USERS_PER_PAGE'] == 10
+        with app.app_context():
+            with db.engine.connect() as connection:
+                assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
+            db.engine.dispose()
+
+    #O perfil padrão (development) não loga cada instrução SQL sem SQLALCHEMY_ECHO
+    def test_development_echo_is_opt_in(self, tmp_path, monkeypatch):
+        monkeypatch.delenv('SQLALCHEMY_ECHO', raising=False)
+        app = create_app('development', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}"
+        })
+
+        with app.app_context():
+            assert db.engine.echo is False
+            db.engine.dispose()
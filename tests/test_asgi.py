@@ -0,0 +1,225 @@
+"""
+Modo ASGI: handlers assíncronos (aiosqlite) e repasse das demais rotas ao WSGI
+"""
+import asyncio
+import json
+import shutil
+
+import pytest
+
+from app import group_commit
+
+pytest.importorskip('aiosqlite')
+
+from app.asgi import create_asgi_app  # noqa: E402
+
+
+class ASGIClient:
+    """Chama a aplicação ASGI diretamente, sem servidor"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None, headers=None):
+        path, _, query = path.partition('?')
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        raw_headers = [(b'content-type', b'application/json')] if body is not None else []
+        raw_headers += [(name.encode(), value.encode()) for name, value in (headers or {}).items()]
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'query_string': query.encode(), 'root_path': '',
+            'headers': raw_headers, 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)
+        }
+        received = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+        async def send(message):
+            received.append(message)
+
+        await self.app(scope, receive, send)
+        start = received[0]
+        response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+        content = b''.join(message.get('body', b'') for message in received[1:])
+        data = json.loads(content) if response_headers.get('content-type', '').startswith('application/json') \
+            and content else content
+        return start['status'], response_headers, data
+
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    return create_asgi_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}"})
+
+
+#Executa o cenário em um event loop e fecha os engines assíncronos no mesmo loop
+def run(app, scenario):
+    async def main():
+        try:
+            await scenario(ASGIClient(app))
+        finally:
+            await app.dispose()
+    asyncio.run(main())
+
+
+NEW_USER = {'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'}
+
+
+class TestAsgiApp:
+    #Ciclo de vida completo pelos handlers assíncronos
+    def test_crud_flow(self, asgi_app):
+        async def scenario(client):
+            status, _, data = await client.request('POST', '/api/users', NEW_USER)
+            assert status == 201
+            assert data['data']['email'] == 'maria@example.com'
+
+            status, _, data = await client.request('POST', '/api/users', {**NEW_USER, 'phone': '11977777777'})
+            assert (status, data['message']) == (409, 'Email já está em uso')
+            status, _, data = await client.request('POST', '/api/users', {'name': 'Maria'})
+            assert status == 400
+
+            status, headers, data = await client.request('GET', '/api/users/11988888888')
+            assert status == 200 and data['data']['name'] == 'Maria Santos'
+            status, _, _ = await client.request('GET', '/api/users/11988888888',
+                                                headers={'If-None-Match': headers['etag']})
+            assert status == 304
+
+            status, _, data = await client.request('PUT', '/api/users/11988888888', {'name': 'Maria Souza'})
+            assert status == 200 and data['data']['name'] == 'Maria Souza'
+            status, _, data = await client.request('GET', '/api/users/11988888888')
+            assert data['data']['name'] == 'Maria Souza'
+
+            status, _, data = await client.request('PUT', '/api/users/11966666666?upsert=1',
+                                                   {'name': 'Ana Lima', 'email': 'ana@example.com'})
+            assert status == 201
+
+            status, _, data = await client.request('GET', '/api/users?limit=1')
+            assert data['count'] == 1 and data['next_cursor']
+            status, _, data = await client.request('GET', f"/api/users?cursor={data['next_cursor']}")
+            assert [user['phone'] for user in data['data']] == ['11966666666']
+
+            status, _, data = await client.request('GET', '/api/users/search?q=souza')
+            assert [user['phone'] for user in data['data']] == ['11988888888']
+            status, _, data = await client.request('GET', '/api/users/changes')
+            assert data['count'] == 2
+
+            assert (await client.request('DELETE', '/api/users/11988888888'))[0] == 200
+            assert (await client.request('DELETE', '/api/users/11900000000'))[0] == 404
+            status, _, data = await client.request('PATCH', '/api/users/11988888888/restore')
+            assert status == 200 and data['data']['enabled'] is True
+            status, _, data = await client.request('PATCH', '/api/users/11988888888/restore')
+            assert (status, data['message']) == (400, 'Usuário já está ativo')
+
+        run(asgi_app, scenario)
+
+    def test_invalid_parameters(self, asgi_app):
+        async def scenario(client):
+            assert (await client.request('GET', '/api/users?limit=abc'))[0] == 400
+            assert (await client.request('GET', '/api/users?cursor=invalido'))[0] == 400
+            assert (await client.request('GET', '/api/users/search'))[0] == 400
+
+        run(asgi_app, scenario)
+
+    #Rotas sem handler assíncrono são atendidas pela aplicação WSGI
+    def test_delegates_to_wsgi(self, asgi_app):
+        async def scenario(client):
+            status, _, data = await client.request('POST', '/api/users/bulk', [NEW_USER])
+            assert status == 200 and data['created'] == 1
+
+            status, headers, body = await client.request('GET', '/api/users/export')
+            assert status == 200
+            assert headers['content-type'].startswith('application/x-ndjson')
+            assert json.loads(body.decode().splitlines()[0])['phone'] == '11988888888'
+
+            status, _, data = await client.request('POST', '/api/users/lookup', {'phones': ['11988888888']})
+            assert status == 200
+            assert (await client.request('GET', '/nao-existe'))[0] == 404
+
+        run(asgi_app, scenario)
+
+    #A admissão roda no event loop: escritas saturadas recebem 503 sem chegar ao handler
+    def test_admission_sheds_in_event_loop(self, tmp_path):
+        app = create_asgi_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+            'ADMISSION_WRITE_LIMIT': 1,
+            'ADMISSION_WRITE_QUEUE_SIZE': 0
+        })
+
+        async def scenario(client):
+            limiter = app.limiters['write']
+            await limiter.acquire()
+            status, headers, data = await client.request('POST', '/api/users', NEW_USER)
+            assert status == 503 and headers['retry-after'] == '1'
+            assert data['success'] is False
+            status, _, _ = await client.request('POST', '/api/users/bulk', [NEW_USER])
+            assert status == 503
+
+            limiter.release()
+            assert (await client.request('POST', '/api/users', NEW_USER))[0] == 201
+            assert (await client.request('POST', '/api/users/bulk', [NEW_USER]))[0] == 200
+            assert limiter.active == 0
+            # A requisição repassada já foi admitida: o limite do WSGI não é usado
+            assert app.flask_app.extensions['admission'].limiters['write'].active == 0
+
+        run(app, scenario)
+
+    def test_requires_file_database(self):
+        with pytest.raises(ValueError):
+            create_asgi_app('testing')
+
+    #Mesma instrumentação do WSGI: consultas da operação no Server-Timing
+    def test_server_timing_header(self, asgi_app):
+        async def scenario(client):
+            await client.request('POST', '/api/users', NEW_USER)
+            _, headers, _ = await client.request('GET', '/api/users/11988888888')
+            assert headers['server-timing'].startswith('db;dur=')
+            assert 'desc="1 queries"' in headers['server-timing']
+
+            # Segunda leitura vem do cache: nenhuma consulta
+            _, headers, _ = await client.request('GET', '/api/users/11988888888')
+            assert 'desc="0 queries"' in headers['server-timing']
+
+        run(asgi_app, scenario)
+
+    #Com WRITE_GROUP_COMMIT as escritas vão para a thread escritora, como no WSGI
+    def test_writes_use_group_commit(self, tmp_path):
+        app = create_asgi_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+            'WRITE_GROUP_COMMIT': True
+        })
+
+        async def scenario(client):
+            assert (await client.request('POST', '/api/users', NEW_USER))[0] == 201
+            status, _, data = await client.request('POST', '/api/users', {**NEW_USER, 'phone': '11977777777'})
+            assert (status, data['message']) == (409, 'Email já está em uso')
+            status, _, data = await client.request('PUT', '/api/users/11988888888', {'name': 'Maria Souza'})
+            assert status == 200 and data['data']['name'] == 'Maria Souza'
+            assert (await client.request('DELETE', '/api/users/11988888888'))[0] == 200
+
+        run(app, scenario)
+        with app.flask_app.app_context():
+            writer = group_commit.writer
+            assert writer.operations == 4
+            writer.close()
+
+    #Rotas @read_replica leem do bind 'replica'; as escritas vão para o primário
+    def test_reads_from_replica(self, tmp_path):
+        primary_path = tmp_path / 'primary.db'
+        replica_path = tmp_path / 'replica.db'
+        overrides = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary_path}'}
+        create_asgi_app('testing', overrides)
+        # Réplica "sincronizada" por cópia do arquivo (ainda sem usuários)
+        shutil.copyfile(primary_path, replica_path)
+
+        app = create_asgi_app('testing', {**overrides, 'SQLALCHEMY_BINDS': {'replica': f'sqlite:///{replica_path}'}})
+
+        async def scenario(client):
+            assert (await client.request('POST', '/api/users', NEW_USER))[0] == 201
+            assert (await client.request('GET', '/api/users/11988888888'))[0] == 404
+            assert (await client.request('GET', '/api/users'))[2]['count'] == 0
+
+            # A escrita foi para o primário (409 lido no primário)
+            status, _, _ = await client.request('POST', '/api/users', NEW_USER)
+            assert status == 409
+
+        run(app, scenario)
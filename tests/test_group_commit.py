@@ -0,0 +1,127 @@
+"""
+Group commit: escritas concorrentes aplicadas em transações agrupadas
+"""
+import json
+import threading
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app, db
+from app.group_commit import GroupCommitWriter
+from app.models.user import User
+
+
+@pytest.fixture
+def group_app(tmp_path):
+    # Banco em arquivo: a thread escritora usa a sua própria conexão
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+        'WRITE_GROUP_COMMIT': True,
+        'WRITE_GROUP_MAX_DELAY_MS': 20
+    })
+    yield app
+    with app.app_context():
+        writer = app.extensions['group_commit'].writer
+        if writer is not None:
+            writer.close()
+        db.engine.dispose()
+
+
+def user_row(i):
+    return User.normalize({'name': 'Usuario Teste', 'email': f'user{i}@example.com', 'phone': f'{11900000000 + i}'})
+
+
+class TestGroupCommitWriter:
+    #O erro de uma operação desfaz só ela; as demais do grupo são confirmadas
+    def test_failed_operation_does_not_abort_group(self, group_app):
+        with group_app.app_context():
+            writer = GroupCommitWriter(db.engine, max_ops=10, max_delay=0.05)
+            table = User.__table__
+            try:
+                futures = [
+                    writer.submit(lambda connection: connection.execute(insert(table).values(user_row(1)))),
+                    writer.submit(lambda connection: connection.execute(insert(table).values(user_row(1)))),
+                    writer.submit(lambda connection: connection.execute(insert(table).values(user_row(2)))),
+                ]
+                futures[0].result(timeout=5)
+                with pytest.raises(IntegrityError):
+                    futures[1].result(timeout=5)
+                futures[2].result(timeout=5)
+            finally:
+                writer.close()
+
+            assert writer.batches == 1
+            assert db.session.execute(select(func.count()).select_from(table)).scalar() == 2
+
+
+class TestGroupCommitAPI:
+    #Criações concorrentes são agrupadas em menos transações que operações
+    def test_concurrent_creates_are_grouped(self, group_app):
+        statuses = []
+        lock = threading.Lock()
+
+        def create(i):
+            client = group_app.test_client()
+            response = client.post('/api/users', data=json.dumps({
+                'name': 'Usuario Teste', 'email': f'user{i}@example.com', 'phone': f'{11900000000 + i}'
+            }), content_type='application/json')
+            with lock:
+                statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=create, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [201] * 16
+        with group_app.app_context():
+            writer = group_app.extensions['group_commit'].writer
+            assert writer.operations == 16
+            assert writer.batches < 16
+
+    #Os endpoints de escrita têm o mesmo comportamento no modo group commit
+    def test_write_endpoints(self, group_app):
+        client = group_app.test_client()
+        payload = {'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'}
+
+        assert client.post('/api/users', data=json.dumps(payload), content_type='application/json').status_code == 201
+        response = client.post('/api/users', data=json.dumps(payload), content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)['message'] == 'Email já está em uso'
+
+        response = client.put('/api/users/11988888888', data=json.dumps({'name': 'Maria Souza'}),
+                              content_type='application/json')
+        assert json.loads(response.data)['data']['name'] == 'Maria Souza'
+
+        assert client.delete('/api/users/11988888888').status_code == 200
+        assert client.patch('/api/users/11988888888/restore').status_code == 200
+        assert client.patch('/api/users/11988888888/restore').status_code == 400
+        assert client.delete('/api/users/11900000000').status_code == 404
+
+    #Esgotado WRITE_GROUP_TIMEOUT a requisição recebe 503 e a operação ainda na
+    #fila é cancelada: não grava depois que ninguém mais espera por ela
+    def test_timeout_cancels_queued_operation(self, group_app):
+        group_app.config['WRITE_GROUP_TIMEOUT'] = 0.05
+        group_app.extensions['group_commit'].timeout = 0.05
+        release = threading.Event()
+        with group_app.app_context():
+            # Operação que ocupa a thread escritora até o fim do teste
+            writer = group_app.extensions['group_commit'].get_writer(db.engine)
+            blocker = writer.submit(lambda connection: release.wait(5))
+
+        try:
+            response = group_app.test_client().post('/api/users', data=json.dumps({
+                'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'
+            }), content_type='application/json')
+        finally:
+            release.set()
+
+        assert response.status_code == 503
+        assert json.loads(response.data)['success'] is False
+        blocker.result(timeout=5)
+        with group_app.app_context():
+            writer.close()
+            assert db.session.execute(select(func.count()).select_from(User.__table__)).scalar() == 0
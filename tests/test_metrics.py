@@ -0,0 +1,90 @@
+"""
+Testes do endpoint /metrics e das métricas particionadas por thread
+"""
+import threading
+from app import db
+from app.metrics import Counter, Histogram
+
+
+class TestShardedMetrics:
+    #Incrementos de várias threads são somados na coleta
+    def test_counter_across_threads(self):
+        counter = Counter('test_total', 'Teste.', ('route',))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(('/api/users',))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.values() == {('/api/users',): 4000}
+
+    #Uma thread por conexão: as partições das threads encerradas voltam para o total base
+    def test_finished_threads_are_folded(self):
+        counter = Counter('test_total', 'Teste.')
+        histogram = Histogram('test_seconds', 'Teste.', buckets=(0.1,))
+
+        def work():
+            counter.inc()
+            histogram.observe(0.05)
+
+        for _ in range(50):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        counter.inc()
+
+        assert counter.values() == {(): 51}
+        assert len(counter._shards) == 1
+        (counts, total), = histogram.values().values()
+        assert counts == [50, 0] and abs(total - 2.5) < 1e-9
+        assert histogram._shards == []
+
+    #Buckets cumulativos, soma e contagem do histograma
+    def test_histogram_render(self):
+        histogram = Histogram('test_seconds', 'Teste.', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(5)
+
+        lines = histogram.render()
+        assert 'test_seconds_bucket{le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{le="1.0"} 2' in lines
+        assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+        assert 'test_seconds_count 3' in lines
+        assert 'test_seconds_sum 5.15' in lines
+
+
+class TestMetricsEndpoint:
+    def test_metrics_endpoint(self, app, client, sample_user):
+        client.get('/api/users')
+        client.get(f'/api/users/{sample_user.phone}')
+        client.get(f'/api/users/{sample_user.phone}')
+        client.get('/api/users/11999999999')
+        # As sessões do teste usam a conexão da transação externa: um checkout do pool
+        with db.engine.connect():
+            pass
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        body = response.data.decode('utf-8')
+
+        assert 'http_requests_total{route="/api/users",method="GET",status="200"} 1' in body
+        assert 'http_requests_total{route="/api/users/<string:phone>",method="GET",status="200"} 2' in body
+        assert 'http_requests_total{route="/api/users/<string:phone>",method="GET",status="404"} 1' in body
+        assert 'http_request_duration_seconds_count{route="/api/users",method="GET"} 1' in body
+        assert 'http_requests_in_flight 0' in body
+        assert 'db_pool_checkout_wait_seconds_count' in body
+        assert 'user_cache_hits_total 1' in body
+        assert 'user_cache_hit_ratio' in body
+
+    #O próprio /metrics não é contabilizado
+    def test_metrics_only_cover_user_routes(self, client):
+        client.get('/metrics')
+        body = client.get('/metrics').data.decode('utf-8')
+        assert 'route="/metrics"' not in body
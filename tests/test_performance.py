@@ -0,0 +1,58 @@
+"""
+Testes de desempenho sobre a base populada (fixture seeded_app, --seed-users):
+orçamento de consultas e de tempo dos endpoints com muitos usuários
+"""
+import json
+import time
+
+from app import db
+from app.models.user import User
+from app.pagination import encode_cursor
+
+# Tempo máximo por requisição na base populada (folga para CI lento)
+REQUEST_BUDGET_MS = 250
+
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    return response, (time.perf_counter() - start) * 1000
+
+
+class TestSeededPerformance:
+    #Uma página no fim da base custa o mesmo que a primeira (keyset, sem OFFSET)
+    def test_deep_page_within_budget(self, seeded_app, seeded_client, assert_max_queries):
+        count = seeded_app.config['SEED_USERS']
+        cursor = encode_cursor({'id': count - 50})
+
+        with assert_max_queries(1):
+            response, elapsed = timed_get(seeded_client, f'/api/users?cursor={cursor}&limit=100')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']
+        assert elapsed < REQUEST_BUDGET_MS, f'{elapsed:.0f} ms (orçamento: {REQUEST_BUDGET_MS} ms)'
+
+    def test_search_within_budget(self, seeded_app, seeded_client, assert_max_queries):
+        number = seeded_app.config['SEED_USERS'] - 1
+
+        with assert_max_queries(1):
+            response, elapsed = timed_get(seeded_client, f'/api/users/search?q=user{number}')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['data'][0]['email'] == f'user{number}@example.com'
+        assert elapsed < REQUEST_BUDGET_MS, f'{elapsed:.0f} ms (orçamento: {REQUEST_BUDGET_MS} ms)'
+
+    #Escritas em massa ficam na transação do teste e são desfeitas no final
+    def test_bulk_disable_is_rolled_back(self, seeded_app, seeded_client):
+        cutoff = '2025-01-01T00:16:40'  # os 1000 primeiros usuários
+        response = seeded_client.patch('/api/users/bulk-disable', data=json.dumps({'created_before': cutoff}),
+                                       content_type='application/json')
+
+        assert response.status_code == 200
+        assert User.query.filter_by(enabled=False).count() > seeded_app.config['SEED_USERS'] // 10
+
+    #Nenhuma escrita do teste anterior sobrevive
+    def test_seeded_base_is_intact(self, seeded_app):
+        count = seeded_app.config['SEED_USERS']
+        assert db.session.query(User).count() == count
+        assert User.query.filter_by(enabled=False).count() == len(range(0, count, 10))
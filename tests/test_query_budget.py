@@ -0,0 +1,137 @@
+"""
+Orçamento de consultas por endpoint: regressões N+1 fazem os testes falharem
+"""
+import json
+import logging
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.instrumentation import count_queries
+
+
+def post_json(client, url, payload):
+    return client.post(url, data=json.dumps(payload), content_type='application/json')
+
+
+class TestQueryBudget:
+    def test_list_users(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            assert client.get('/api/users').status_code == 200
+
+    def test_export_users(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            assert client.get('/api/users/export').status_code == 200
+
+    def test_changes_feed(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            assert client.get('/api/users/changes').status_code == 200
+
+    def test_get_user_by_phone(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            assert client.get(f'/api/users/{sample_user.phone}').status_code == 200
+        # Segunda leitura vem do cache
+        with assert_max_queries(0):
+            assert client.get(f'/api/users/{sample_user.phone}').status_code == 200
+
+    #Um IN (...) por pedaço de 999 telefones; a segunda consulta vem toda do cache
+    def test_lookup_users(self, client, assert_max_queries):
+        users = [
+            {'name': 'Usuario Teste', 'email': f'user{i}@example.com', 'phone': f'{11900000000 + i}'}
+            for i in range(2000)
+        ]
+        post_json(client, '/api/users/bulk', users)
+        phones = [user['phone'] for user in users]
+
+        with assert_max_queries(3):
+            response = post_json(client, '/api/users/lookup', {'phones': phones})
+        assert json.loads(response.data)['count'] == 2000
+        with assert_max_queries(0):
+            response = post_json(client, '/api/users/lookup', {'phones': phones})
+        assert json.loads(response.data)['count'] == 2000
+
+    def test_create_user(self, client, assert_max_queries):
+        with assert_max_queries(1):
+            response = post_json(client, '/api/users', {
+                'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'
+            })
+        assert response.status_code == 201
+
+    #O número de consultas do lote não cresce com o número de linhas
+    def test_bulk_create_users(self, client, assert_max_queries):
+        users = [
+            {'name': 'Usuario Teste', 'email': f'user{i}@example.com', 'phone': f'{11900000000 + i}'}
+            for i in range(200)
+        ]
+        with assert_max_queries(3):
+            response = post_json(client, '/api/users/bulk', users)
+        assert json.loads(response.data)['created'] == 200
+
+    def test_update_user(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            response = client.put(f'/api/users/{sample_user.phone}',
+                                  data=json.dumps({'name': 'João Santos', 'email': 'joao@example.com'}),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+    def test_upsert_user(self, client, sample_user, assert_max_queries):
+        for phone, status in (('11988888888', 201), (sample_user.phone, 200)):
+            with assert_max_queries(1):
+                response = client.put(f'/api/users/{phone}?upsert=1',
+                                      data=json.dumps({'name': 'Maria Santos', 'email': f'{phone}@example.com'}),
+                                      content_type='application/json')
+            assert response.status_code == status
+
+    #Um UPDATE por pedaço de telefones, sem carregar objetos
+    def test_bulk_disable_users(self, client, assert_max_queries):
+        users = [
+            {'name': 'Usuario Teste', 'email': f'user{i}@example.com', 'phone': f'{11900000000 + i}'}
+            for i in range(1500)
+        ]
+        post_json(client, '/api/users/bulk', users)
+
+        with assert_max_queries(2):
+            response = client.patch('/api/users/bulk-disable',
+                                    data=json.dumps({'phones': [user['phone'] for user in users]}),
+                                    content_type='application/json')
+        assert json.loads(response.data)['updated'] == 1500
+
+    def test_delete_and_restore_user(self, client, sample_user, assert_max_queries):
+        with assert_max_queries(1):
+            assert client.delete(f'/api/users/{sample_user.phone}').status_code == 200
+        with assert_max_queries(1):
+            assert client.patch(f'/api/users/{sample_user.phone}/restore').status_code == 200
+
+
+class TestServerTiming:
+    #O header Server-Timing informa o tempo e o número de consultas
+    def test_server_timing_header(self, client, sample_user):
+        response = client.get('/api/users')
+
+        header = response.headers['Server-Timing']
+        assert 'db;dur=' in header
+        assert 'desc="1 queries"' in header
+        assert 'app;dur=' in header
+
+    #Cada requisição gera um log estruturado
+    def test_structured_log(self, client, sample_user, caplog):
+        with caplog.at_level(logging.INFO, logger='app.requests'):
+            client.get(f'/api/users/{sample_user.phone}')
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['endpoint'] == 'users.get_user'
+        assert record['status'] == 200
+        assert record['db_queries'] == 1
+
+    #Instrução que falha não deixa estado de medição na conexão do pool
+    def test_failed_statement_leaves_no_state(self, app):
+        with app.app_context():
+            with db.engine.connect() as connection:
+                with pytest.raises(OperationalError):
+                    connection.exec_driver_sql('SELECT * FROM missing_table')
+                connection.rollback()
+                with count_queries() as stats:
+                    connection.exec_driver_sql('SELECT 1')
+                assert stats.count == 1
+                assert 'query_start' not in connection.info
@@ -0,0 +1,112 @@
+"""
+Regressão de planos de consulta: nenhuma consulta dos controllers pode
+fazer varredura completa da tabela users
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_migrate import upgrade
+from sqlalchemy import event, inspect
+
+from app import db, migrate
+from app.pagination import encode_cursor
+from app.services.archive import archive_disabled_users
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+#Executa os endpoints e guarda as instruções enviadas ao banco
+def capture_statements(app, client, sample_user):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith('INSERT'):
+            statements.append((statement, parameters))
+
+    phone = sample_user.phone
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        first_page = json.loads(client.get('/api/users?limit=1').data)
+        client.get(f"/api/users?limit=1&cursor={first_page['next_cursor']}")
+        client.get('/api/users/export?enabled=true')
+        client.get('/api/users/export?enabled=false')
+        client.get(f'/api/users/{phone}')
+        client.post('/api/users/lookup', data=json.dumps({
+            'phones': ['11900000000'], 'emails': ['maria@example.com']
+        }), content_type='application/json')
+        client.get('/api/users/search?q=joao&limit=1')
+        changes = json.loads(client.get('/api/users/changes?limit=1').data)
+        client.get(f"/api/users/changes?since={changes['next_cursor']}")
+        client.get(f"/api/users/search?q=joao&cursor={encode_cursor({'rank': -1.0, 'id': 0})}")
+        client.post('/api/users', data=json.dumps({
+            'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'
+        }), content_type='application/json')
+        client.post('/api/users/bulk', data=json.dumps([
+            {'name': 'Pedro Lima', 'email': 'pedro@example.com', 'phone': '11977777777'}
+        ]), content_type='application/json')
+        client.put(f'/api/users/{phone}', data=json.dumps({
+            'name': 'João Santos', 'email': 'joao.santos@example.com'
+        }), content_type='application/json')
+        client.put('/api/users/11966666666?upsert=1', data=json.dumps({
+            'name': 'Ana Lima', 'email': 'ana@example.com'
+        }), content_type='application/json')
+        client.patch('/api/users/bulk-disable', data=json.dumps({
+            'phones': ['11988888888', '11900000000']
+        }), content_type='application/json')
+        client.patch('/api/users/bulk-restore', data=json.dumps({
+            'created_before': '2999-01-01T00:00:00'
+        }), content_type='application/json')
+        client.delete(f'/api/users/{phone}')
+        client.patch(f'/api/users/{phone}/restore')
+        # Arquivamento e as operações que consultam users_archive
+        client.delete(f'/api/users/{phone}')
+        archive_disabled_users(datetime.utcnow() + timedelta(days=1), 100)
+        client.delete(f'/api/users/{phone}')
+        client.patch('/api/users/bulk-disable', data=json.dumps({'phones': [phone]}),
+                     content_type='application/json')
+        client.patch(f'/api/users/{phone}/restore')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return statements
+
+
+class TestQueryPlans:
+    #Nenhuma consulta pode cair em SCAN da tabela users
+    def test_controller_queries_use_indexes(self, app, client, sample_user):
+        statements = capture_statements(app, client, sample_user)
+        assert statements
+
+        connection = db.session.connection().connection.dbapi_connection
+        for statement, parameters in statements:
+            plan = connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            details = [row[-1] for row in plan]
+            full_scans = [
+                detail for detail in details
+                if detail.startswith('SCAN') and 'VIRTUAL TABLE' not in detail
+            ]
+            assert not full_scans, f'Varredura completa em: {statement}\n{details}'
+
+    #As migrações criam os mesmos índices declarados no modelo
+    def test_migrations_match_model_indexes(self, app, tmp_path):
+        model_schema = inspect(db.session.connection())
+        model_indexes = {index['name'] for index in model_schema.get_indexes('users')}
+        model_archive_indexes = {index['name'] for index in model_schema.get_indexes('users_archive')}
+
+        migrated_app = Flask(__name__)
+        migrated_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'migrated.db'}"
+        db.init_app(migrated_app)
+        migrate.init_app(migrated_app, db, directory=MIGRATIONS_DIR)
+
+        with migrated_app.app_context():
+            upgrade()
+            migrated_indexes = {index['name'] for index in inspect(db.engine).get_indexes('users')}
+            migrated_archive_indexes = {index['name'] for index in inspect(db.engine).get_indexes('users_archive')}
+            migrated_tables = set(inspect(db.engine).get_table_names())
+            db.engine.dispose()
+
+        assert model_indexes <= migrated_indexes
+        assert model_archive_indexes <= migrated_archive_indexes
+        assert 'users_fts' in migrated_tables
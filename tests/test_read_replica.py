@@ -0,0 +1,87 @@
+"""
+Roteamento de leituras para a réplica (bind 'replica') com dois arquivos SQLite
+"""
+import json
+import shutil
+
+import pytest
+from flask import g
+from sqlalchemy import insert, select, update
+
+from app import create_app, db
+from app.models.user import User
+
+
+def add_user(name, email, phone):
+    db.session.execute(insert(User.__table__).values(User.normalize(
+        {'name': name, 'email': email, 'phone': phone}
+    )))
+    db.session.commit()
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    primary_path = tmp_path / 'primary.db'
+    replica_path = tmp_path / 'replica.db'
+
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary_path}'})
+    with app.app_context():
+        add_user('João Samartino', 'joao@example.com', '16997113777')
+        db.engine.dispose()
+    # Réplica "sincronizada" por cópia do arquivo
+    shutil.copyfile(primary_path, replica_path)
+
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary_path}',
+        'SQLALCHEMY_BINDS': {'replica': f'sqlite:///{replica_path}'}
+    })
+    with app.app_context():
+        # Escrita que ainda não chegou à réplica
+        add_user('Maria Santos', 'maria@example.com', '11988888888')
+
+    # Sem app context aberto: cada requisição tem a sua própria sessão
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+class TestReadReplica:
+    #As rotas GET leem da réplica; as escritas vão para o primário
+    def test_get_routes_read_from_replica(self, replica_app):
+        client = replica_app.test_client()
+
+        data = json.loads(client.get('/api/users').data)
+        assert [user['phone'] for user in data['data']] == ['16997113777']
+        assert client.get('/api/users/11988888888').status_code == 404
+        assert json.loads(client.get('/api/users/search?q=maria').data)['count'] == 0
+
+        response = client.post('/api/users', data=json.dumps({
+            'name': 'Pedro Lima', 'email': 'pedro@example.com', 'phone': '11977777777'
+        }), content_type='application/json')
+        assert response.status_code == 201
+        response = client.put('/api/users/11988888888', data=json.dumps({'name': 'Maria Souza'}),
+                              content_type='application/json')
+        assert response.status_code == 200
+
+        with replica_app.app_context():
+            phones = db.session.execute(select(User.phone).order_by(User.id)).scalars().all()
+        assert phones == ['16997113777', '11988888888', '11977777777']
+
+    #Depois de uma escrita, a mesma requisição continua lendo do primário
+    def test_read_after_write_stays_on_primary(self, replica_app):
+        stmt = select(User.phone).where(User.phone == '11988888888')
+        with replica_app.test_request_context('/api/users'):
+            g.use_replica = True
+            assert db.session.execute(stmt).first() is None
+
+            db.session.execute(update(User.__table__).where(User.phone == '11988888888').values(name='Maria Souza'))
+            assert db.session.execute(stmt).first() is not None
+            db.session.rollback()
+            db.session.remove()
+
+    #A réplica recusa escritas (PRAGMA query_only)
+    def test_replica_is_read_only(self, replica_app):
+        with replica_app.app_context(), db.engines['replica'].connect() as connection:
+            with pytest.raises(Exception, match='readonly'):
+                connection.exec_driver_sql("UPDATE users SET name = 'Outro Nome'")
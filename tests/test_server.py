@@ -0,0 +1,169 @@
+"""
+Servidor com pre-fork (serve.py / app/server.py): warmup, reload no SIGHUP e
+encerramento gracioso
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app import create_app, db, user_cache
+from app.cache import CacheBackend, LRUCache
+from app.server import PreforkServer, warmup
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='requer fork()')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def children(pid):
+    #Lê o pai de cada processo em /proc (pids dos workers do mestre)
+    found = set()
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+                found.add(int(entry))
+    return found
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def wait_until(predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'users.db'}", SERVER_WORKERS='2',
+               SCHEMA_AUTO_CREATE='1')
+    process = subprocess.Popen([sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def ready():
+        try:
+            return request(port, 'GET', '/api/users')[0] == 200
+        except OSError:
+            return False
+
+    assert wait_until(ready), 'servidor não subiu'
+    yield process, port
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+class TestPreforkServer:
+    #SIGHUP troca todos os workers sem derrubar nenhuma requisição
+    def test_reload_replaces_workers_without_errors(self, server):
+        process, port = server
+        assert request(port, 'POST', '/api/users', {
+            'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'
+        })[0] == 201
+        old_workers = children(process.pid)
+        assert len(old_workers) == 2
+
+        statuses = []
+        stop = threading.Event()
+
+        def client():
+            while not stop.is_set():
+                try:
+                    statuses.append(request(port, 'GET', '/api/users/11988888888')[0])
+                except OSError as e:
+                    statuses.append(repr(e))
+
+        threads = [threading.Thread(target=client) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.3)
+            process.send_signal(signal.SIGHUP)
+            replaced = wait_until(lambda: len(children(process.pid)) == 2
+                                  and not children(process.pid) & old_workers)
+            time.sleep(0.3)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        assert replaced
+        assert statuses and set(statuses) == {200}
+
+    #SIGTERM encerra os workers e o mestre sai com código 0
+    def test_graceful_shutdown(self, server):
+        process, port = server
+        workers = children(process.pid)
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=20) == 0
+        assert not any(os.path.exists(f'/proc/{pid}') for pid in workers)
+
+
+#O warmup carrega no cache os usuários alterados mais recentemente
+def test_warmup_primes_user_cache(tmp_path):
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}"})
+    client = app.test_client()
+    client.post('/api/users', json={'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'})
+    with app.app_context():
+        user_cache.backend.clear()
+
+    warmup(app)
+
+    with app.app_context():
+        assert user_cache.backend.get(user_cache.key_prefix + '11988888888')['email'] == 'maria@example.com'
+        db.engine.dispose()
+
+
+class SharedCache(CacheBackend):
+    """Representa um backend fora do processo (ex.: Redis)"""
+
+
+#Com vários workers, só um cache compartilhado continua ligado
+def test_multiple_workers_disable_process_cache(tmp_path):
+    app = create_app('testing', {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}"})
+    PreforkServer(app, workers=1)
+    assert isinstance(app.extensions['user_cache'], LRUCache)
+
+    PreforkServer(app, workers=2)
+    assert app.extensions['user_cache'] is None
+
+    shared = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'users.db'}",
+        'USER_CACHE_BACKEND': SharedCache()
+    })
+    PreforkServer(shared, workers=2)
+    assert isinstance(shared.extensions['user_cache'], SharedCache)
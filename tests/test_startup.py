@@ -0,0 +1,61 @@
+"""
+Subida da aplicação: modo que confia nas migrações, imports adiados e
+orçamento de tempo do create_app
+"""
+import os
+
+from sqlalchemy import inspect
+
+from app import create_app, db
+from app.startup import measure_startup
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+# import app + create_app() em um processo novo (hoje ~350 ms; folga para CI lento)
+STARTUP_BUDGET_MS = 1500
+
+
+class TestStartup:
+    #Em produção a subida não toca no banco nem importa o Alembic, e cabe no orçamento
+    def test_production_startup_budget(self, tmp_path):
+        db_path = tmp_path / 'instance' / 'users.db'
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}')
+        env.pop('SCHEMA_AUTO_CREATE', None)
+
+        profile = measure_startup('production', runs=3, env=env)
+
+        assert profile['schema_auto_create'] is False
+        assert profile['loaded_deferred'] == []
+        # Sem makedirs, create_all nem conexão: a pasta do banco nem chega a existir
+        assert not db_path.parent.exists()
+        elapsed = profile['import_ms'] + profile['create_app_ms']
+        assert elapsed < STARTUP_BUDGET_MS, f'subida levou {elapsed:.0f} ms (orçamento: {STARTUP_BUDGET_MS} ms)'
+
+    #flask db carrega o Flask-Migrate sob demanda e cria o esquema em um banco novo
+    def test_db_upgrade_creates_schema(self, tmp_path):
+        db_path = tmp_path / 'instance' / 'users.db'
+        app = create_app('production', {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'SCHEMA_AUTO_CREATE': False
+        })
+        assert 'migrate' not in app.extensions
+
+        result = app.test_cli_runner().invoke(args=['db', '--directory', MIGRATIONS_DIR, 'upgrade'])
+
+        assert result.exit_code == 0, result.output
+        with app.app_context():
+            assert {'users', 'users_archive', 'users_fts'} <= set(inspect(db.engine).get_table_names())
+            response = app.test_client().get('/api/users')
+            db.engine.dispose()
+        assert response.status_code == 200
+
+    #O comando reporta os tempos medidos
+    def test_startup_profile_command(self, app):
+        result = app.test_cli_runner().invoke(args=['users', 'startup-profile', '--config', 'testing',
+                                                    '--runs', '1', '--top', '3'])
+
+        assert result.exit_code == 0, result.output
+        assert 'import app' in result.output
+        assert 'create_app()' in result.output
+        assert 'Importações mais lentas' in result.output
+        assert 'Adiados (não importados): alembic, flask_migrate' in result.output
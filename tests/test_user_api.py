@@ -1,6 +1,7 @@
 import pytest
 import json
 from app.models.user import User
+from app.pagination import encode_cursor
 
 class TestUserAPI:
     #Testando o get users com a lista vazia
@@ -25,6 +26,99 @@ class TestUserAPI:
         assert data['data'][0]['name'] == 'João Samartino'
         assert data['data'][0]['email'] == 'joaossamartinos@gmail.com'
     
+    #Testando a paginação por cursor
+    def test_get_all_users_cursor_pagination(self, client):
+        from app import db
+        with client.application.app_context():
+            for i in range(5):
+                db.session.add(User(name='Usuario Teste', email=f'user{i}@example.com', phone=f'1190000000{i}'))
+            db.session.commit()
+
+        response = client.get('/api/users?limit=2')
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['count'] == 2
+        assert data['next_cursor'] is not None
+        emails = [user['email'] for user in data['data']]
+
+        while data['next_cursor']:
+            response = client.get(f"/api/users?limit=2&cursor={data['next_cursor']}")
+            data = json.loads(response.data)
+            emails.extend(user['email'] for user in data['data'])
+
+        assert emails == [f'user{i}@example.com' for i in range(5)]
+        assert data['count'] == 1
+
+    #Testando cursor e limit inválidos
+    def test_get_all_users_invalid_pagination(self, client):
+        response = client.get('/api/users?cursor=invalido')
+        assert response.status_code == 400
+        assert 'Cursor inválido' in json.loads(response.data)['message']
+
+        # bool é subclasse de int, mas true/false não são ids
+        for after_id in (True, False):
+            response = client.get(f"/api/users?cursor={encode_cursor({'id': after_id})}")
+            assert response.status_code == 400
+
+        response = client.get('/api/users?limit=abc')
+        assert response.status_code == 400
+
+    #Testando a projeção de campos na listagem
+    def test_get_all_users_fields_projection(self, client, sample_user):
+        response = client.get('/api/users?fields=name,email')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data['data'] == [{'name': 'João Samartino', 'email': 'joaossamartinos@gmail.com'}]
+
+        # Sem projeção, a listagem é idêntica ao to_dict()
+        data = json.loads(client.get('/api/users').data)
+        assert data['data'] == [sample_user.to_dict()]
+
+        response = client.get('/api/users?fields=name,senha')
+        assert response.status_code == 400
+        assert 'senha' in json.loads(response.data)['message']
+
+    #Testando a exportação em NDJSON
+    def test_export_users_ndjson(self, client, sample_user):
+        from app import db
+        with client.application.app_context():
+            disabled = User(name='Maria Santos', email='maria@example.com', phone='11988888888', enabled=False)
+            db.session.add(disabled)
+            db.session.commit()
+
+        response = client.get('/api/users/export?format=ndjson')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        assert [user['email'] for user in lines] == ['joaossamartinos@gmail.com']
+
+        response = client.get('/api/users/export?enabled=all')
+        lines = response.data.decode('utf-8').splitlines()
+        assert len(lines) == 2
+
+    #Testando a exportação como array JSON
+    def test_export_users_json(self, client, sample_user):
+        response = client.get('/api/users/export?format=json&enabled=false')
+        assert response.status_code == 200
+        assert json.loads(response.data) == []
+
+        response = client.get('/api/users/export?format=json')
+        data = json.loads(response.data)
+        assert len(data) == 1
+        assert data[0]['phone'] == '16997113777'
+
+        response = client.get('/api/users/export?format=json&fields=phone')
+        assert json.loads(response.data) == [{'phone': '16997113777'}]
+
+    #Testando formato de exportação inválido
+    def test_export_users_invalid_format(self, client):
+        response = client.get('/api/users/export?format=xml')
+        assert response.status_code == 400
+
+        response = client.get('/api/users/export?enabled=talvez')
+        assert response.status_code == 400
+
     #Testando o get users de acordo com o telefone 
     def test_get_user_by_phone_success(self, client, sample_user):
         response = client.get(f'/api/users/{sample_user.phone}')
@@ -35,6 +129,79 @@ class TestUserAPI:
         assert data['data']['name'] == 'João Samartino'
         assert data['data']['email'] == 'joaossamartinos@gmail.com'
     
+    #Testando requisição condicional com ETag no get por telefone
+    def test_get_user_by_phone_etag(self, client, sample_user):
+        response = client.get(f'/api/users/{sample_user.phone}')
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        response = client.get(f'/api/users/{sample_user.phone}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+        response = client.get(f'/api/users/{sample_user.phone}',
+                              headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+
+        # Atualizar o usuário muda o updated_at e, portanto, o ETag
+        client.put(f'/api/users/{sample_user.phone}', data=json.dumps({'name': 'João Santos'}),
+                   content_type='application/json')
+        response = client.get(f'/api/users/{sample_user.phone}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    #Testando requisição condicional com ETag na listagem
+    def test_get_all_users_etag(self, client, sample_user):
+        response = client.get('/api/users')
+        etag = response.headers['ETag']
+
+        response = client.get('/api/users', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+        client.delete(f'/api/users/{sample_user.phone}')
+        response = client.get('/api/users', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert json.loads(response.data)['count'] == 0
+
+    #O 304 da listagem sai antes de serializar as linhas da página
+    def test_get_all_users_not_modified_skips_serialization(self, client, sample_user, monkeypatch):
+        etag = client.get('/api/users').headers['ETag']
+
+        serialized = []
+        row_serializer = User.row_serializer
+
+        def counting_serializer(fields, columns=None):
+            serialize = row_serializer(fields, columns)
+            return lambda row: serialized.append(row) or serialize(row)
+
+        monkeypatch.setattr(User, 'row_serializer', counting_serializer)
+        response = client.get('/api/users', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert serialized == []
+
+        response = client.get('/api/users')
+        assert response.status_code == 200
+        assert len(serialized) == 1
+
+    #A listagem só usa ETag: remover um usuário não muda o max(updated_at) da página
+    def test_get_all_users_conditional_after_delete(self, client, sample_user):
+        other = {'name': 'Maria de Souza', 'email': 'maria.souza@example.com', 'phone': '11888888888'}
+        client.post('/api/users', data=json.dumps(other), content_type='application/json')
+        response = client.get('/api/users')
+        assert 'Last-Modified' not in response.headers
+        etag = response.headers['ETag']
+
+        client.delete(f'/api/users/{sample_user.phone}')
+        response = client.get('/api/users', headers={
+            'If-None-Match': etag,
+            'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'
+        })
+        assert response.status_code == 200
+        assert [user['phone'] for user in json.loads(response.data)['data']] == ['11888888888']
+
+        response = client.get('/api/users', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+        assert response.status_code == 200
+
     #Testando com telefone não encontrado
     def test_get_user_by_phone_not_found(self, client):
         response = client.get('/api/phone/9999999999')
@@ -118,6 +285,135 @@ class TestUserAPI:
         assert data['success'] == False
         assert 'Email já está em uso' in data['message']
     
+    #Testando com telefone duplicado (detectado pela restrição UNIQUE)
+    def test_create_user_duplicate_phone(self, client, sample_user):
+        response = client.post('/api/users', data=json.dumps({
+            'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': sample_user.phone
+        }), content_type='application/json')
+
+        assert response.status_code == 409
+        assert json.loads(response.data)['message'] == 'Erro: Telefone já cadastrado'
+
+    #Testando a busca em lote por telefones e emails
+    def test_lookup_users(self, client, sample_user):
+        response = client.post('/api/users/lookup', data=json.dumps({
+            'phones': [sample_user.phone, '11900000000', sample_user.phone],
+            'emails': ['JOAOSSAMARTINOS@gmail.com', 'maria@example.com']
+        }), content_type='application/json')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['count'] == 2
+        assert data['data'] == {
+            sample_user.phone: sample_user.to_dict(),
+            'JOAOSSAMARTINOS@gmail.com': sample_user.to_dict()
+        }
+        assert data['missing'] == ['11900000000', 'maria@example.com']
+
+    #Testando a busca em lote com corpo inválido ou grande demais
+    def test_lookup_users_invalid(self, client, app):
+        for payload in ({}, {'phones': '16997113777'}, {'phones': [1, 2]}):
+            response = client.post('/api/users/lookup', data=json.dumps(payload), content_type='application/json')
+            assert response.status_code == 400
+
+        app.config['LOOKUP_MAX_KEYS'] = 2
+        response = client.post('/api/users/lookup', data=json.dumps({'phones': ['1', '2', '3']}),
+                               content_type='application/json')
+        assert response.status_code == 413
+
+    #Testando a criação em lote com erros por linha
+    def test_bulk_create_users(self, client, sample_user):
+        users = [
+            {'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'},
+            {'name': 'Pedro Lima', 'email': 'email-invalido', 'phone': '11977777777'},
+            {'name': 'Ana Souza', 'email': 'joaossamartinos@gmail.com', 'phone': '11966666666'},
+            {'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': '11988888888'},
+            {'name': 'Carlos Dias', 'email': 'carlos@example.com'}
+        ]
+
+        response = client.post(
+            '/api/users/bulk',
+            data=json.dumps(users),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['created'] == 1
+        assert data['failed'] == 4
+        results = data['results']
+        assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+        assert results[0]['success'] == True
+        assert 'Formato de email inválido' in results[1]['message']
+        assert results[2]['message'] == 'Email já está em uso'
+        assert results[3]['message'] == 'Telefone já cadastrado'
+        assert 'Campo phone é obrigatório' in results[4]['message']
+
+        response = client.get('/api/users/11988888888')
+        assert json.loads(response.data)['data']['id'] == results[0]['id']
+
+    #Testando a criação em lote com NDJSON
+    def test_bulk_create_users_ndjson(self, client):
+        lines = '\n'.join(json.dumps({
+            'name': 'Usuario Teste',
+            'email': f'user{i}@example.com',
+            'phone': f'1190000000{i}'
+        }) for i in range(3))
+
+        response = client.post('/api/users/bulk', data=lines, content_type='application/x-ndjson')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['created'] == 3
+        assert json.loads(client.get('/api/users').data)['count'] == 3
+
+    #enabled precisa ser booleano; a mensagem do validador chega em cada linha rejeitada
+    def test_bulk_create_users_enabled_validation(self, client):
+        users = [
+            {'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888', 'enabled': 'false'},
+            {'name': 'Pedro Lima', 'email': 'pedro@example.com', 'phone': '11977777777', 'enabled': None},
+            {'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': '11966666666', 'enabled': False}
+        ]
+        lines = '\n'.join(json.dumps(user) for user in users)
+
+        response = client.post('/api/users/bulk', data=lines, content_type='application/x-ndjson')
+
+        results = json.loads(response.data)['results']
+        assert [result['success'] for result in results] == [False, False, True]
+        assert results[0]['message'] == 'Campo enabled deve ser true ou false'
+        assert results[1]['message'] == 'Campo enabled deve ser true ou false'
+
+
+    #Campos que não são texto e linhas de NDJSON malformadas viram erros por linha
+    def test_bulk_create_users_invalid_rows(self, client):
+        lines = '\n'.join([
+            json.dumps({'name': 123, 'email': 'maria@example.com', 'phone': '11988888888'}),
+            '{"name": ',
+            json.dumps({'name': 'Pedro Lima', 'email': ['pedro@example.com'], 'phone': '11977777777'}),
+            json.dumps({'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': 11966666666}),
+            json.dumps({'name': 'Bia Lima', 'email': 'bia@example.com', 'phone': '11955555555'})
+        ])
+
+        response = client.post('/api/users/bulk', data=lines, content_type='application/x-ndjson')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert (data['created'], data['failed']) == (1, 4)
+        results = data['results']
+        assert results[0]['message'] == 'Campo name deve ser texto'
+        assert results[1]['message'].startswith('JSON inválido')
+        assert results[2]['message'] == 'Campo email deve ser texto'
+        assert results[3]['message'] == 'Campo phone deve ser texto'
+        assert results[4]['success'] is True
+
+    #Testando a criação em lote sem lista
+    def test_bulk_create_users_invalid_body(self, client):
+        response = client.post(
+            '/api/users/bulk',
+            data=json.dumps({'name': 'Maria'}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+
     #Testar user sem envio de dados
     def test_create_user_no_json(self, client):
         response = client.post('/api/users')
@@ -146,6 +442,7 @@ class TestUserAPI:
         assert data['message'] == 'Usuário atualizado com sucesso'
         assert data['data']['name'] == 'João Santos'
         assert data['data']['email'] == 'joaossamartinos@gmail.com'  # não alterado
+        assert data['data']['updated_at'] > data['data']['created_at']
     
     #Testar update sem encontrar o telefone do usuário
     def test_update_user_not_found(self, client):
@@ -182,6 +479,98 @@ class TestUserAPI:
         assert data['success'] == False
         assert 'E-mail já cadastrado' in data['message']
     
+    #Upsert: cria quando o telefone não existe e atualiza quando existe
+    def test_upsert_user(self, client, sample_user):
+        payload = {'name': 'Maria Santos', 'email': 'maria@example.com'}
+        response = client.put('/api/users/11988888888?upsert=1', data=json.dumps(payload),
+                              content_type='application/json')
+        assert response.status_code == 201
+        created = json.loads(response.data)['data']
+        assert created['phone'] == '11988888888'
+        assert created['enabled'] == True
+
+        payload = {'name': 'Maria Souza', 'email': 'maria.souza@example.com'}
+        response = client.put('/api/users/11988888888?upsert=1', data=json.dumps(payload),
+                              content_type='application/json')
+        assert response.status_code == 200
+        updated = json.loads(response.data)['data']
+        assert updated['id'] == created['id']
+        assert updated['name'] == 'Maria Souza'
+        assert updated['email'] == 'maria.souza@example.com'
+        assert updated['created_at'] == created['created_at']
+
+        data = json.loads(client.get('/api/users/11988888888').data)
+        assert data['data'] == updated
+
+    #Upsert com email de outro usuário ou dados inválidos
+    def test_upsert_user_conflicts(self, client, sample_user):
+        payload = {'name': 'Maria Santos', 'email': sample_user.email}
+        response = client.put('/api/users/11988888888?upsert=1', data=json.dumps(payload),
+                              content_type='application/json')
+        assert response.status_code == 409
+        assert json.loads(response.data)['message'] == 'E-mail já cadastrado'
+
+        response = client.put('/api/users/11988888888?upsert=1', data=json.dumps({'name': 'Maria Santos'}),
+                              content_type='application/json')
+        assert response.status_code == 400
+
+        payload = {'name': 'Maria Santos', 'email': 'maria@example.com'}
+        response = client.put('/api/users/abc?upsert=1', data=json.dumps(payload),
+                              content_type='application/json')
+        assert response.status_code == 400
+
+    #Desativação e reativação em lote por telefones
+    def test_bulk_disable_and_restore_by_phones(self, client, sample_user):
+        from app import db
+        with client.application.app_context():
+            db.session.add(User(name='Maria Santos', email='maria@example.com', phone='11988888888', enabled=False))
+            db.session.commit()
+
+        # Usuário no cache deve ser invalidado
+        client.get(f'/api/users/{sample_user.phone}')
+
+        response = client.patch('/api/users/bulk-disable', data=json.dumps({
+            'phones': [sample_user.phone, '11988888888', '11900000000']
+        }), content_type='application/json')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert (data['updated'], data['unchanged'], data['unknown']) == (1, 1, ['11900000000'])
+        assert json.loads(client.get(f'/api/users/{sample_user.phone}').data)['data']['enabled'] == False
+
+        response = client.patch('/api/users/bulk-restore', data=json.dumps({
+            'phones': [sample_user.phone, '11988888888']
+        }), content_type='application/json')
+        data = json.loads(response.data)
+        assert (data['updated'], data['unchanged'], data['unknown']) == (2, 0, [])
+        assert json.loads(client.get('/api/users').data)['count'] == 2
+
+    #Desativação em lote pelo filtro created_before
+    def test_bulk_disable_created_before(self, client, app, sample_user):
+        from datetime import datetime
+        from app import db
+        with app.app_context():
+            old = User(name='Maria Santos', email='maria@example.com', phone='11988888888')
+            old.created_at = datetime(2020, 1, 1)
+            db.session.add(old)
+            db.session.commit()
+
+        app.config['BULK_BATCH_SIZE'] = 1
+        response = client.patch('/api/users/bulk-disable', data=json.dumps({
+            'created_before': '2021-01-01T00:00:00'
+        }), content_type='application/json')
+        data = json.loads(response.data)
+        assert data['updated'] == 1
+        phones = [user['phone'] for user in json.loads(client.get('/api/users').data)['data']]
+        assert phones == [sample_user.phone]
+
+    #Parâmetros inválidos na operação em lote
+    def test_bulk_disable_invalid(self, client):
+        for payload in ({}, {'phones': '11988888888'}, {'created_before': 'ontem'},
+                        {'phones': [], 'created_before': '2021-01-01'}):
+            response = client.patch('/api/users/bulk-disable', data=json.dumps(payload),
+                                    content_type='application/json')
+            assert response.status_code == 400
+
     #Teste de delete no user
     def test_delete_user_success(self, client, sample_user):
         response = client.delete(f'/api/users/{sample_user.phone}')
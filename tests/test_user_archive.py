@@ -0,0 +1,192 @@
+"""
+Testes do arquivamento de usuários desabilitados (users_archive)
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_migrate import upgrade
+from sqlalchemy import event, update
+
+from app import db, migrate
+from app.models.user import User
+from app.models.user_archive import UserArchive
+from app.search import search_statement
+from app.services.archive import archive_disabled_users, retention_cutoff
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+def add_user(name, email, phone, enabled=True, days_ago=0):
+    user = User(name=name, email=email, phone=phone, enabled=enabled)
+    user.updated_at = datetime.utcnow() - timedelta(days=days_ago)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def archive(app, *args):
+    return app.test_cli_runner().invoke(args=['users', 'archive', *args])
+
+
+def put_json(client, url, data):
+    return client.put(url, data=json.dumps(data), content_type='application/json')
+
+
+class TestArchiveCommand:
+    #Só vai para o arquivo quem está desabilitado há mais tempo que a retenção
+    def test_archive_moves_long_disabled_users(self, app):
+        add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400)
+        add_user('Bia Lima', 'bia@example.com', '11900000002', enabled=False, days_ago=400)
+        add_user('Caio Lima', 'caio@example.com', '11900000003', enabled=False, days_ago=10)
+        add_user('Davi Lima', 'davi@example.com', '11900000004', enabled=True, days_ago=400)
+
+        result = archive(app, '--older-than-days', '365', '--batch-size', '1')
+
+        assert result.exit_code == 0, result.output
+        assert '1 usuários arquivados' in result.output
+        assert 'Arquivamento concluído: 2 usuários movidos' in result.output
+        assert sorted(user.phone for user in User.query.all()) == ['11900000003', '11900000004']
+        archived = UserArchive.query.order_by(UserArchive.phone).all()
+        assert [user.phone for user in archived] == ['11900000001', '11900000002']
+        assert all(user.archived_at is not None and not user.enabled for user in archived)
+
+    #Reativado entre o SELECT dos ids e a movimentação: continua em users
+    def test_archive_skips_user_reenabled_during_batch(self, app):
+        add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400)
+        add_user('Bia Lima', 'bia@example.com', '11900000002', enabled=False, days_ago=400)
+
+        def reenable(state):
+            if state.is_delete and not reenabled:
+                reenabled.append(True)
+                state.session.execute(update(User).where(User.phone == '11900000001')
+                                      .values(enabled=True, updated_at=datetime.utcnow()))
+
+        reenabled = []
+        event.listen(db.session, 'do_orm_execute', reenable)
+        try:
+            assert archive_disabled_users(retention_cutoff(365), 10) == 1
+        finally:
+            event.remove(db.session, 'do_orm_execute', reenable)
+
+        assert [user.phone for user in User.query.all()] == ['11900000001']
+        assert [user.phone for user in UserArchive.query.all()] == ['11900000002']
+
+    #O usuário arquivado sai do cache do GET por telefone
+    def test_archive_invalidates_cache(self, app, client):
+        add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400)
+        assert client.get('/api/users/11900000001').status_code == 200
+
+        archive(app)
+
+        assert client.get('/api/users/11900000001').status_code == 404
+
+    def test_archive_invalid_batch_size(self, app):
+        assert archive(app, '--batch-size', '0').exit_code != 0
+
+
+class TestArchivedUsersApi:
+    #restore traz o usuário de volta do arquivo, habilitado e com o mesmo id
+    def test_restore_from_archive(self, app, client):
+        user_id = add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400).id
+        archive(app)
+
+        response = client.patch('/api/users/11900000001/restore')
+        data = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert data['data']['id'] == user_id
+        assert data['data']['enabled'] is True
+        assert UserArchive.query.count() == 0
+        assert client.get('/api/users/search?q=ana').json['count'] == 1
+
+    #O id do usuário arquivado não vai para um novo usuário: o restore devolve o original
+    def test_archived_id_is_not_reused(self, app, client):
+        add_user('Ana Lima', 'ana@example.com', '11900000001')
+        user_id = add_user('Bia Lima', 'bia@example.com', '11900000002', enabled=False, days_ago=400).id
+        archive(app)
+        assert add_user('Caio Lima', 'caio@example.com', '11900000003').id > user_id
+
+        response = client.patch('/api/users/11900000002/restore')
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['data']['id'] == user_id
+
+    def test_delete_and_bulk_on_archived_users(self, app, client):
+        add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400)
+        archive(app)
+
+        assert client.delete('/api/users/11900000001').status_code == 200
+        response = client.patch('/api/users/bulk-disable', data=json.dumps({'phones': ['11900000001']}),
+                                content_type='application/json')
+        assert json.loads(response.data)['unchanged'] == 1
+
+        response = client.patch('/api/users/bulk-restore', data=json.dumps({'phones': ['11900000001', '11900000009']}),
+                                content_type='application/json')
+        data = json.loads(response.data)
+        assert data['updated'] == 1
+        assert data['unknown'] == ['11900000009']
+        assert User.query.filter_by(phone='11900000001').one().enabled is True
+
+    #Email e telefone de usuários arquivados continuam reservados
+    def test_uniqueness_covers_archived_users(self, app, client, sample_user):
+        add_user('Ana Lima', 'ana@example.com', '11900000001', enabled=False, days_ago=400)
+        archive(app)
+
+        response = client.post('/api/users', data=json.dumps({
+            'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': '11900000009'
+        }), content_type='application/json')
+        assert response.status_code == 409
+        assert 'Email' in json.loads(response.data)['message']
+
+        response = client.post('/api/users', data=json.dumps({
+            'name': 'Ana Souza', 'email': 'ana.souza@example.com', 'phone': '11900000001'
+        }), content_type='application/json')
+        assert response.status_code == 409
+        assert 'Telefone' in json.loads(response.data)['message']
+
+        response = client.post('/api/users/bulk', data=json.dumps([
+            {'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': '11900000008'},
+            {'name': 'Ana Souza', 'email': 'ana.souza@example.com', 'phone': '11900000001'}
+        ]), content_type='application/json')
+        assert [result['success'] for result in json.loads(response.data)['results']] == [False, False]
+
+        assert put_json(client, f'/api/users/{sample_user.phone}', {'email': 'ana@example.com'}).status_code == 409
+        assert put_json(client, '/api/users/11900000001?upsert=1',
+                        {'name': 'Ana Souza', 'email': 'ana.souza@example.com'}).status_code == 409
+        assert User.query.count() == 1
+
+
+class TestAutoincrementMigration:
+    #A migração 0005 recria users sem perder dados, triggers nem o índice de busca,
+    #e a sequência começa depois dos ids já arquivados
+    def test_upgrade_reserves_archived_ids(self, tmp_path):
+        migrated_app = Flask(__name__)
+        migrated_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'migrated.db'}"
+        db.init_app(migrated_app)
+        migrate.init_app(migrated_app, db, directory=MIGRATIONS_DIR)
+
+        with migrated_app.app_context():
+            upgrade(revision='0004')
+            connection = db.session.connection()
+            connection.exec_driver_sql(
+                "INSERT INTO users (id, name, email, phone, enabled) VALUES "
+                "(1, 'Ana Lima', 'ana@example.com', '11900000001', 1)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO users_archive (id, name, email, phone, enabled) VALUES "
+                "(2, 'Bia Lima', 'bia@example.com', '11900000002', 0)"
+            )
+            db.session.commit()
+
+            upgrade()
+
+            add_user('Caio Lima', 'caio@example.com', '11900000003')
+            assert [user.id for user in User.query.order_by(User.id)] == [1, 3]
+            for text, user_id in (('ana', 1), ('caio', 3)):
+                rows = db.session.execute(search_statement(User.__table__, [User.id], text)).all()
+                assert [row.id for row in rows] == [user_id]
+            db.session.rollback()
+            db.session.remove()
+            db.engine.dispose()
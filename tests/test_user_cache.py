@@ -0,0 +1,159 @@
+"""
+Testes do cache de usuários por telefone
+"""
+import json
+import pytest
+from app import user_cache
+from app.cache import CacheBackend, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    #Remove o item menos usado ao atingir o tamanho máximo
+    def test_lru_eviction(self):
+        cache = LRUCache(max_size=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        stats = cache.stats()
+        assert stats['evictions'] == 1
+        assert stats['size'] == 2
+        assert stats['hits'] == 3
+        assert stats['misses'] == 1
+
+    #Entradas expiram após o TTL
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = LRUCache(max_size=10, ttl=30, clock=clock)
+        cache.set('a', 1)
+
+        clock.now = 29
+        assert cache.get('a') == 1
+        clock.now = 30
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+
+    #get_many/set_many seguem as mesmas regras de LRU, TTL e estatísticas
+    def test_get_many_and_set_many(self):
+        clock = FakeClock()
+        cache = LRUCache(max_size=3, ttl=30, clock=clock)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        assert cache.get_many(['a', 'x']) == {'a': 1}
+
+        cache.set_many({'d': 4})
+        assert cache.get_many(['a', 'b', 'c', 'd']) == {'a': 1, 'c': 3, 'd': 4}
+
+        clock.now = 30
+        assert cache.get_many(['a', 'c']) == {}
+        stats = cache.stats()
+        assert stats['evictions'] == 1
+        assert stats['expirations'] == 2
+        assert stats['hits'] == 4
+        assert stats['misses'] == 4
+
+    def test_invalid_max_size(self):
+        with pytest.raises(ValueError):
+            LRUCache(max_size=0)
+
+
+class DictBackend(CacheBackend):
+    def __init__(self, app):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+class TestUserCacheAPI:
+    #A segunda leitura do mesmo telefone vem do cache
+    def test_get_user_uses_cache(self, client, sample_user):
+        client.get(f'/api/users/{sample_user.phone}')
+        client.get(f'/api/users/{sample_user.phone}')
+
+        stats = user_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+    #Telefones inexistentes não são guardados
+    def test_not_found_is_not_cached(self, client):
+        assert client.get('/api/users/11999999999').status_code == 404
+        assert user_cache.stats()['size'] == 0
+
+    #Update, delete e restore invalidam a entrada do telefone
+    def test_writes_invalidate_cache(self, client, sample_user):
+        phone = sample_user.phone
+        client.get(f'/api/users/{phone}')
+
+        client.put(f'/api/users/{phone}', data=json.dumps({'name': 'João Santos'}),
+                   content_type='application/json')
+        data = json.loads(client.get(f'/api/users/{phone}').data)
+        assert data['data']['name'] == 'João Santos'
+
+        client.delete(f'/api/users/{phone}')
+        data = json.loads(client.get(f'/api/users/{phone}').data)
+        assert data['data']['enabled'] == False
+
+        client.patch(f'/api/users/{phone}/restore')
+        data = json.loads(client.get(f'/api/users/{phone}').data)
+        assert data['data']['enabled'] == True
+
+    #Uma escrita confirmada durante a leitura impede que o payload lido volte ao cache
+    def test_invalidation_during_load_is_not_overwritten(self, app, sample_user):
+        phone = sample_user.phone
+        stale = sample_user.to_dict()
+
+        def load_then_concurrent_write():
+            payload = dict(stale)
+            user_cache.invalidate(phone)  # a escrita confirma e invalida antes da gravação
+            return payload
+
+        assert user_cache.get_or_load(phone, load_then_concurrent_write) == stale
+        assert user_cache.backend.get(user_cache.key_prefix + phone) is None
+
+        # Sem invalidação no meio, a leitura seguinte volta a preencher o cache
+        user_cache.get_or_load(phone, lambda: dict(stale))
+        assert user_cache.backend.get(user_cache.key_prefix + phone) == stale
+
+    def test_invalidation_during_batch_load(self, app):
+        prefix = user_cache.key_prefix
+        stripe = user_cache.generations._stripe
+        # Um telefone em outra faixa de geração (faixas são compartilhadas por hash)
+        other = next(phone for phone in (f'119000000{i:02}' for i in range(2, 100))
+                     if stripe(prefix + phone) != stripe(prefix + '11900000001'))
+
+        def load(missing):
+            user_cache.invalidate('11900000001')
+            return {phone: {'phone': phone} for phone in missing}
+
+        user_cache.get_many_or_load(['11900000001', other], load)
+        assert user_cache.backend.get(prefix + '11900000001') is None
+        assert user_cache.backend.get(prefix + other) == {'phone': other}
+
+    #Backend compartilhado configurado por factory
+    def test_custom_backend(self, app, client, sample_user):
+        app.config['USER_CACHE_BACKEND'] = DictBackend
+        user_cache.init_app(app)
+
+        client.get(f'/api/users/{sample_user.phone}')
+        assert f'user:phone:{sample_user.phone}' in user_cache.backend.data
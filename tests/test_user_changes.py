@@ -0,0 +1,124 @@
+import json
+import os
+from datetime import datetime
+
+from flask import Flask
+from flask_migrate import upgrade
+from sqlalchemy import select, update
+
+from app import db, migrate
+from app.models.user import User
+from app.pagination import encode_cursor
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+
+def changes(client, query=''):
+    response = client.get(f'/api/users/changes?{query}')
+    return response.status_code, json.loads(response.data)
+
+
+def sync(client, cursor=None, limit=2):
+    #Percorre o feed a partir do cursor até não haver mais páginas
+    phones = []
+    while True:
+        query = f'limit={limit}' + (f'&since={cursor}' if cursor else '')
+        data = changes(client, query)[1]
+        phones.extend((user['phone'], user['enabled']) for user in data['data'])
+        cursor = data['next_cursor']
+        if not data['has_more']:
+            return phones, cursor
+
+
+class TestUserChanges:
+    #Primeira sincronização traz todos os usuários, inclusive os desativados
+    def test_changes_full_sync(self, client, sample_user):
+        with client.application.app_context():
+            db.session.add(User(name='Maria Santos', email='maria@example.com', phone='11988888888', enabled=False))
+            db.session.commit()
+
+        phones, cursor = sync(client)
+        assert phones == [(sample_user.phone, True), ('11988888888', False)]
+        assert cursor is not None
+
+    #Depois do cursor vêm só as alterações: criação, atualização, remoção e reativação
+    def test_changes_delta_after_cursor(self, client, sample_user):
+        _, cursor = sync(client)
+        assert sync(client, cursor) == ([], cursor)
+
+        client.post('/api/users', data=json.dumps({
+            'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'
+        }), content_type='application/json')
+        client.delete(f'/api/users/{sample_user.phone}')
+        phones, cursor = sync(client, cursor)
+        assert phones == [('11988888888', True), (sample_user.phone, False)]
+
+        client.patch(f'/api/users/{sample_user.phone}/restore')
+        client.put('/api/users/11988888888', data=json.dumps({'name': 'Maria Souza'}),
+                   content_type='application/json')
+        phones, _ = sync(client, cursor)
+        assert phones == [(sample_user.phone, True), ('11988888888', True)]
+
+    #A posição no feed é dada pelo commit, não pelo updated_at: uma escrita que
+    #esperou pelo lock e chega com updated_at anterior ao cursor não é perdida
+    def test_changes_late_commit_with_old_updated_at(self, client, sample_user):
+        _, cursor = sync(client)
+
+        with client.application.app_context():
+            db.session.execute(update(User.__table__).where(User.phone == sample_user.phone)
+                               .values(name='João Atrasado', updated_at=datetime(2000, 1, 1)))
+            db.session.commit()
+
+        phones, cursor = sync(client, cursor)
+        assert phones == [(sample_user.phone, True)]
+        assert sync(client, cursor) == ([], cursor)
+
+    #Upsert de um usuário existente também volta ao feed
+    def test_changes_include_upsert_update(self, client, sample_user):
+        _, cursor = sync(client)
+        client.put(f'/api/users/{sample_user.phone}?upsert=1', data=json.dumps({
+            'name': 'João Souza', 'email': 'joao.souza@example.com'
+        }), content_type='application/json')
+
+        assert sync(client, cursor)[0] == [(sample_user.phone, True)]
+
+    #Cursor inválido
+    def test_changes_invalid_cursor(self, client):
+        status, data = changes(client, 'since=invalido')
+        assert status == 400
+        assert data['message'] == 'Cursor inválido'
+
+        # Cursores no formato antigo (updated_at, id) e posições não inteiras
+        for values in ({'updated_at': '2025-01-01T00:00:00', 'id': 1}, {'seq': True}, {'seq': '1'}):
+            status, data = changes(client, f'since={encode_cursor(values)}')
+            assert status == 400
+            assert data['message'] == 'Cursor inválido'
+
+
+class TestChangeSeqMigration:
+    #A migração 0006 numera as linhas existentes na ordem (updated_at, id) e o
+    #contador continua a partir delas
+    def test_upgrade_backfills_change_seq(self, tmp_path):
+        migrated_app = Flask(__name__)
+        migrated_app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'migrated.db'}"
+        db.init_app(migrated_app)
+        migrate.init_app(migrated_app, db, directory=MIGRATIONS_DIR)
+
+        with migrated_app.app_context():
+            upgrade(revision='0005')
+            db.session.execute(User.__table__.insert().values([
+                {'name': 'Ana Lima', 'email': 'ana@example.com', 'phone': '11900000001',
+                 'updated_at': datetime(2025, 2, 1)},
+                {'name': 'Bia Lima', 'email': 'bia@example.com', 'phone': '11900000002',
+                 'updated_at': datetime(2025, 1, 1)},
+            ]))
+            db.session.commit()
+
+            upgrade()
+
+            db.session.execute(update(User.__table__).where(User.phone == '11900000001').values(name='Ana Souza'))
+            db.session.commit()
+            rows = db.session.execute(select(User.phone, User.change_seq).order_by(User.change_seq)).all()
+            assert [tuple(row) for row in rows] == [('11900000002', 1), ('11900000001', 3)]
+            db.session.remove()
+            db.engine.dispose()
@@ -0,0 +1,98 @@
+"""
+Testes dos comandos de CLI (flask users ...)
+"""
+import json
+from app.models.user import User
+
+
+def write_csv(path, count, start=0):
+    lines = ['name,email,phone,enabled']
+    for i in range(start, start + count):
+        lines.append(f'Usuario Teste,user{i}@example.com,{11900000000 + i},true')
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+class TestImportCommand:
+    #Importando um CSV em lotes
+    def test_import_csv(self, app, tmp_path):
+        source = tmp_path / 'users.csv'
+        write_csv(source, 5)
+
+        result = app.test_cli_runner().invoke(args=['users', 'import', str(source), '--batch-size', '2'])
+
+        assert result.exit_code == 0, result.output
+        assert 'linhas/s' in result.output
+        assert 'Importação concluída: 5 criados, 0 rejeitados' in result.output
+        assert User.query.count() == 5
+        assert not (tmp_path / 'users.csv.checkpoint').exists()
+
+    #Linhas inválidas são rejeitadas sem interromper a importação
+    def test_import_ndjson_with_errors(self, app, tmp_path):
+        source = tmp_path / 'users.ndjson'
+        errors = tmp_path / 'errors.ndjson'
+        source.write_text('\n'.join([
+            json.dumps({'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'}),
+            json.dumps({'name': 'Pedro Lima', 'email': 'email-invalido', 'phone': '11977777777'}),
+            json.dumps({'name': 'Ana Souza', 'email': 'maria@example.com', 'phone': '11966666666'})
+        ]), encoding='utf-8')
+
+        result = app.test_cli_runner().invoke(
+            args=['users', 'import', str(source), '--errors', str(errors)]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert 'Importação concluída: 1 criados, 2 rejeitados' in result.output
+        rejected = [json.loads(line) for line in errors.read_text(encoding='utf-8').splitlines()]
+        assert [row['row'] for row in rejected] == [1, 2]
+        assert rejected[1]['message'] == 'Email já está em uso'
+
+    #Uma linha que não é JSON vira uma rejeição; as válidas do lote são gravadas
+    def test_import_ndjson_malformed_line(self, app, tmp_path):
+        source = tmp_path / 'users.ndjson'
+        errors = tmp_path / 'errors.ndjson'
+        source.write_text('\n'.join([
+            json.dumps({'name': 'Maria Santos', 'email': 'maria@example.com', 'phone': '11988888888'}),
+            '{"name": "Pedro Lima", "email": ',
+            json.dumps({'name': 'Ana Souza', 'email': 'ana@example.com', 'phone': '11966666666'})
+        ]), encoding='utf-8')
+
+        result = app.test_cli_runner().invoke(
+            args=['users', 'import', str(source), '--errors', str(errors)]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert 'Importação concluída: 2 criados, 1 rejeitados' in result.output
+        rejected = [json.loads(line) for line in errors.read_text(encoding='utf-8').splitlines()]
+        assert [row['row'] for row in rejected] == [1]
+        assert rejected[0]['message'].startswith('JSON inválido')
+        assert User.query.count() == 2
+
+    #Célula enabled vazia mantém o padrão (habilitado)
+    def test_import_csv_blank_enabled(self, app, tmp_path):
+        source = tmp_path / 'users.csv'
+        source.write_text('name,email,phone,enabled\n'
+                          'Maria Santos,maria@example.com,11988888888,\n'
+                          'Ana Souza,ana@example.com,11966666666,false\n', encoding='utf-8')
+
+        result = app.test_cli_runner().invoke(args=['users', 'import', str(source)])
+
+        assert result.exit_code == 0, result.output
+        enabled = {user.email: user.enabled for user in User.query.all()}
+        assert enabled == {'maria@example.com': True, 'ana@example.com': False}
+
+    #Retomando a importação a partir do checkpoint
+    def test_import_resumes_from_checkpoint(self, app, tmp_path):
+        source = tmp_path / 'users.csv'
+        write_csv(source, 5)
+        checkpoint = tmp_path / 'users.csv.checkpoint'
+        checkpoint.write_text(json.dumps({
+            'source': str(source), 'rows': 3, 'created': 3, 'failed': 0
+        }), encoding='utf-8')
+
+        result = app.test_cli_runner().invoke(args=['users', 'import', str(source)])
+
+        assert result.exit_code == 0, result.output
+        assert 'Retomando a partir da linha 3' in result.output
+        assert 'Importação concluída: 5 criados, 0 rejeitados' in result.output
+        emails = sorted(user.email for user in User.query.all())
+        assert emails == ['user3@example.com', 'user4@example.com']
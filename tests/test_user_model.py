@@ -101,6 +101,37 @@ class TestUserModel:
             assert user.phone == '11888888888'
             assert user.updated_at is not None
     
+    #Validações aplicadas sem instanciar o objeto
+    def test_user_normalize(self, app):
+        row = User.normalize({'name': ' João Silva ', 'email': 'JOAO@Example.com', 'phone': '11999999999'})
+
+        assert row['name'] == 'João Silva'
+        assert row['email'] == 'joao@example.com'
+        assert row['enabled'] == True
+        assert row['created_at'] == row['updated_at']
+
+        with pytest.raises(ValueError, match='Telefone deve conter apenas números'):
+            User.normalize({'name': 'João', 'email': 'joao@example.com', 'phone': '11-9999-9999'})
+
+        for enabled in ('false', None, 1):
+            with pytest.raises(ValueError, match='Campo enabled deve ser true ou false'):
+                User.normalize({'name': 'João', 'email': 'joao@example.com', 'phone': '11999999999',
+                                'enabled': enabled})
+
+    #Serialização de tuplas de colunas igual ao to_dict
+    def test_user_row_serializer(self, app):
+        user = User(name='João Silva', email='joao@example.com', phone='11999999999')
+        row = tuple(getattr(user, field) for field in User.SERIALIZABLE_FIELDS)
+
+        serialize = User.row_serializer(User.SERIALIZABLE_FIELDS)
+        assert serialize(row) == user.to_dict()
+
+        serialize = User.row_serializer(('email', 'created_at'), User.SERIALIZABLE_FIELDS)
+        assert serialize(row) == {'email': 'joao@example.com', 'created_at': user.created_at.isoformat()}
+
+        with pytest.raises(ValueError, match='Campos inválidos'):
+            User.parse_fields('name,senha')
+
     def test_user_repr(self, app):
         """Testa representação string do usuário"""
         with app.app_context():
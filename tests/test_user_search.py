@@ -0,0 +1,66 @@
+import json
+
+from app import db
+from app.models.user import User
+
+
+def search(client, query):
+    response = client.get(f'/api/users/search?{query}')
+    return response.status_code, json.loads(response.data)
+
+
+class TestUserSearch:
+    #Busca por prefixo de nome e de email, sem acentos
+    def test_search_by_name_and_email_prefix(self, client, sample_user):
+        status, data = search(client, 'q=joao')
+        assert status == 200
+        assert data['success'] == True
+        assert [user['phone'] for user in data['data']] == [sample_user.phone]
+        assert data['data'][0] == sample_user.to_dict()
+
+        assert search(client, 'q=SAMART')[1]['count'] == 1
+        assert search(client, 'q=joaossamartinos@gmail')[1]['count'] == 1
+        assert search(client, 'q=joao samart')[1]['count'] == 1
+        assert search(client, 'q=maria')[1]['count'] == 0
+
+    #O índice acompanha atualização, desativação e reativação
+    def test_search_index_follows_writes(self, client, sample_user):
+        phone = sample_user.phone
+
+        client.put(f'/api/users/{phone}', data=json.dumps({'name': 'Maria Souza'}),
+                   content_type='application/json')
+        assert search(client, 'q=samartino')[1]['count'] == 0
+        assert search(client, 'q=souza')[1]['count'] == 1
+
+        client.delete(f'/api/users/{phone}')
+        assert search(client, 'q=souza')[1]['count'] == 0
+
+        client.patch(f'/api/users/{phone}/restore')
+        assert search(client, 'q=souza')[1]['count'] == 1
+
+    #Resultados ordenados por relevância e paginados por cursor
+    def test_search_ranking_and_pagination(self, client):
+        with client.application.app_context():
+            db.session.add(User(name='Ana Lima', email='ana.silva@example.com', phone='11900000001'))
+            for i in range(4):
+                db.session.add(User(name='Silva Santos', email=f'user{i}@example.com', phone=f'1190000001{i}'))
+            db.session.commit()
+
+        status, data = search(client, 'q=silva&limit=2&fields=name')
+        assert status == 200
+        names = [user['name'] for user in data['data']]
+        while data['next_cursor']:
+            data = search(client, f"q=silva&limit=2&fields=name&cursor={data['next_cursor']}")[1]
+            names.extend(user['name'] for user in data['data'])
+
+        # Nome pesa mais que email no ranking
+        assert names == ['Silva Santos'] * 4 + ['Ana Lima']
+
+    #Parâmetros inválidos
+    def test_search_invalid_parameters(self, client):
+        status, data = search(client, 'q=')
+        assert status == 400
+        assert data['message'] == 'Parâmetro q é obrigatório'
+
+        assert search(client, 'q=%22%2A%28')[0] == 400
+        assert search(client, 'q=joao&cursor=invalido')[0] == 400